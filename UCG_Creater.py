@@ -6,14 +6,20 @@ import os
 from PIL import Image
 import sys, traceback
 import json
+import copy
 
 # --- 他のファイルからクラスや関数をインポート ---
 import constants as const
 from dialogs import (QuantityInputWindow, FontSelectorWindow, DesignConfigWindow, 
-                     ImagePreviewAndSaveDialog, NonModalInfo, ParamSelectorWindow)
+                     ImagePreviewAndSaveDialog, NonModalInfo, ParamSelectorWindow, DesignVariantGridWindow,
+                     LayoutLintWindow)
 from ui_panels import CardPreview, InputPanel
 import utils
 from renderer import CardRenderer
+from jobs import LatestOnlyWorker
+import layout_lint
+
+PREVIEW_FULL_RENDER_DELAY_MS = 350 # 入力が止まってから高品質なプレビューに差し替えるまでの時間
 
 
 class App(tk.Tk):
@@ -55,6 +61,7 @@ class App(tk.Tk):
         menubar.add_cascade(label="デザイン", menu=design_menu)
         design_menu.add_command(label="使用フォント指定...", command=self.open_font_selector)
         design_menu.add_command(label="レイアウト詳細設定...", command=self.open_design_config_window)
+        design_menu.add_command(label="レイアウトチェック (全カード)...", command=self.open_layout_lint_window)
 
         # キーバインドの設定
         self.bind('<Control-s>', lambda event: self.overwrite_save_data())
@@ -72,6 +79,10 @@ class App(tk.Tk):
 
         self.preview = CardPreview(self.left_frame)
         self.preview.pack(padx=20, pady=20)
+        # プレビューの描画はワーカースレッドで行い、最新の入力内容の結果だけを表示する
+        self.preview_worker = LatestOnlyWorker(self, self.preview.draw_card)
+        self._full_preview_job = None # 高品質描画の予約 (afterのID)
+        self.variant_render_cache = None # デザイン比較の描画結果 (初めて比較したときに作る)
 
         # reset_card メソッドを InputPanel に渡す
         self.input_panel = InputPanel(self.right_frame, self.update_preview, self.load_data, self.reset_card, self.save_as_data, self.overwrite_save_data, self.generate_current_card_image, self.open_param_selector, self.generate_centered_name_image)
@@ -117,18 +128,45 @@ class App(tk.Tk):
             self, 
             initial_config,
             self._preview_design_config, # プレビュー用コールバック
-            self._update_design_config
+            self._update_design_config,
+            self._open_design_variants
         )
 
-    def _preview_design_config(self, temp_config):
-        """設定を保存せずにプレビューのみ更新する"""
-        # 一時的な設定オブジェクトを作成
+    def _merge_design_config(self, temp_config):
+        """現在の設定に、デザイン設定ウィンドウで編集中の値を重ねた一時的な設定を返す"""
         preview_config = json.loads(json.dumps(self.app_config))
         preview_config["offsets"].update(temp_config.get("offsets", {}))
         preview_config["font_sizes"].update(temp_config.get("font_sizes", {}))
         preview_config["layout_options"].update(temp_config.get("layout_options", {}))
+        return preview_config
+
+    def _open_design_variants(self, parent, temp_config):
+        """設定のバリエーションを、編集中のカードとdatas内の見本カードで比較するウィンドウを開く"""
+        if self.variant_render_cache is None:
+            from design_preview import VariantRenderCache
+            self.variant_render_cache = VariantRenderCache()
+        current = self.input_panel.get_data_as_dict()
+        extra_cards = [current] if current.get("name") else []
+        DesignVariantGridWindow(parent, self._merge_design_config(temp_config), extra_cards, self.variant_render_cache)
+
+    def _preview_design_config(self, temp_config):
+        """設定を保存せずにプレビューのみ更新する"""
+        # 一時的な設定オブジェクトを作成
+        preview_config = self._merge_design_config(temp_config)
         self.update_preview(self.input_panel.current_card, self.input_panel.card_type_name, [line.strip() for line in self.input_panel.current_card.name.split('\n') if line.strip()], temp_config=preview_config)
 
+    def open_layout_lint_window(self):
+        LayoutLintWindow(self, lambda: json.loads(json.dumps(self.app_config)), self.load_file)
+
+    def _layout_warning(self, data):
+        """保存するカードのレイアウトを確認し、問題があれば通知に付け加える文を返す"""
+        try:
+            issues = layout_lint.lint_card(data, self.app_config, self.renderer)
+        except Exception as e:
+            print(f"Warning: レイアウトの確認に失敗しました: {e}")
+            return ""
+        return f"\n\n⚠ レイアウトの問題:\n{layout_lint.format_issues(issues)}" if issues else ""
+
     def _update_design_config(self, new_config):
         # 新しい設定でapp_configを更新
         self.app_config["offsets"].update(new_config.get("offsets", {}))
@@ -190,6 +228,9 @@ class App(tk.Tk):
     def _on_closing(self):
         """アプリケーション終了時の処理。"""
         self._save_params()
+        if self._full_preview_job:
+            self.after_cancel(self._full_preview_job)
+        self.preview_worker.discard()
         self.destroy()
 
     def _scan_all_params(self):
@@ -244,9 +285,25 @@ class App(tk.Tk):
         # プレビュー用の設定が渡された場合はそれを使用し、なければ通常の設定を使用
         self.update_title() # ウィンドウタイトルを更新
         config_to_use = temp_config if temp_config is not None else self.app_config
-        # renderer.CardRendererを使って描画し、結果のImageをCardPreviewに渡す
-        image = self.renderer.draw_single_card(card_obj, card_type_str, name_lines, config_to_use)
-        self.preview.draw_card(image)
+        # 描画中に入力で書き換わらないよう、カードと設定はこの時点の内容を複製してワーカーに渡す
+        # (描画待ちの古い依頼は捨てられ、完成した画像はafter()経由でCardPreviewに渡される)
+        args = (copy.deepcopy(card_obj), card_type_str, list(name_lines), copy.deepcopy(config_to_use))
+
+        # 入力中は軽い下書き描画をすぐに行い、入力が止まったら同じ内容を高品質で描画し直す
+        self.preview_worker.submit(self._render_preview, *args, True)
+        if self._full_preview_job:
+            self.after_cancel(self._full_preview_job)
+        self._full_preview_job = self.after(PREVIEW_FULL_RENDER_DELAY_MS, self._submit_full_preview, args)
+
+    def _submit_full_preview(self, args):
+        self._full_preview_job = None
+        self.preview_worker.submit(self._render_preview, *args, False)
+
+    def _render_preview(self, card_obj, card_type_str, name_lines, config, draft):
+        """ワーカースレッドで、プレビューの描画先 (使い回しの画像) にカードを描画する"""
+        with self.preview.surface_lock:
+            return self.renderer.draw_single_card(card_obj, card_type_str, name_lines, config,
+                                                  target=self.preview.surface, draft=draft)
 
 
     def save_as_data(self):
@@ -276,7 +333,7 @@ class App(tk.Tk):
             with open(filepath, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=4)
             self.current_filepath = filepath # 保存後、このパスを記憶する
-            NonModalInfo(self, "保存完了", f"カード情報を保存しました:\n{os.path.basename(filepath)}")
+            NonModalInfo(self, "保存完了", f"カード情報を保存しました:\n{os.path.basename(filepath)}{self._layout_warning(data)}")
         except Exception as e:
             messagebox.showerror("保存エラー", f"ファイルの保存中にエラーが発生しました:\n{e}")
         
@@ -293,7 +350,7 @@ class App(tk.Tk):
         try:
             with open(self.current_filepath, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=4)
-            NonModalInfo(self, "上書き保存完了", f"カード情報を上書き保存しました:\n{os.path.basename(self.current_filepath)}")
+            NonModalInfo(self, "上書き保存完了", f"カード情報を上書き保存しました:\n{os.path.basename(self.current_filepath)}{self._layout_warning(data)}")
         except Exception as e:
             messagebox.showerror("上書き保存エラー", f"ファイルの上書き保存中にエラーが発生しました:\n{e}")
         
@@ -352,7 +409,10 @@ class App(tk.Tk):
         )
         if not filepath:
             return 
-        
+        self.load_file(filepath)
+
+    def load_file(self, filepath):
+        """カードJSONを読み込んで編集画面に表示する"""
         data = self._load_card_data_from_file(filepath)
         if data:
             # 読込時に未知の特徴があれば、全体リストに自動で追加する
@@ -0,0 +1,119 @@
+"""
+カードのイラスト (カードJSONの "art") を、描画先のサイズに切り抜き・縮小した状態でキャッシュする。
+
+- "art" は art フォルダからの相対パス (または絶対パス)
+- 元画像はサイズごとに一度だけ読み込み、中央を切り抜いて縮小した画像をメモリとディスク (art/.cache) に保存する
+- JPEGはdraftモードで必要なサイズに近い縮小デコードを行い、大きな元画像を丸ごとデコードしない
+- 元画像が更新されると (更新時刻・サイズが変わると) 作り直す
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+import constants as const
+
+ART_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif")
+MEMORY_LIMIT = 64 # メモリに保持する縮小済みイラストの最大数
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def resolve_art_path(art):
+    """カードJSONの "art" の値から画像ファイルのパスを返す"""
+    if not art:
+        return None
+    return art if os.path.isabs(art) else os.path.join(const.ART_DIR, art)
+
+
+def to_art_reference(path):
+    """画像ファイルのパスを "art" に保存する値にする (artフォルダ内なら相対パス)"""
+    try:
+        rel_path = os.path.relpath(path, const.ART_DIR)
+    except ValueError: # Windowsで別ドライブの場合
+        return path
+    return path if rel_path.startswith("..") else rel_path.replace("\\", "/")
+
+
+def source_signature(art):
+    """元画像の (パス, 更新時刻, サイズ)。ファイルがなければNone"""
+    path = resolve_art_path(art)
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+class ArtStore:
+    """(元画像, 描画先のサイズ) → 切り抜き・縮小済みのRGB画像 のキャッシュ"""
+    def __init__(self, cache_dir=const.ART_CACHE_DIR, memory_limit=MEMORY_LIMIT):
+        self.cache_dir = cache_dir
+        self.memory_limit = memory_limit
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self._failed = set() # 読み込みに失敗した元画像 (同じ警告を繰り返さない)
+
+    def get(self, art, size):
+        """artを size (幅, 高さ) に切り抜き・縮小した画像を返す。画像がなければNone"""
+        signature = source_signature(art)
+        if signature is None:
+            if art not in self._failed:
+                self._failed.add(art)
+                print(f"Warning: イラストが見つかりません: {art}")
+            return None
+        key = signature + tuple(size)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+        if key in self._failed:
+            return None
+
+        try:
+            image = self._load_or_create(signature, size)
+        except Exception as e:
+            self._failed.add(key)
+            print(f"Warning: イラストを読み込めませんでした ({art}): {e}")
+            return None
+        with self._lock:
+            self._images[key] = image
+            while len(self._images) > self.memory_limit:
+                self._images.popitem(last=False)
+        return image
+
+    def _cache_path(self, signature, size):
+        source = f"{signature[0]}|{signature[1]}|{signature[2]}|{size[0]}x{size[1]}"
+        return os.path.join(self.cache_dir, hashlib.sha1(source.encode("utf-8")).hexdigest() + ".png")
+
+    def _load_or_create(self, signature, size):
+        cache_path = self._cache_path(signature, size)
+        if os.path.exists(cache_path):
+            with Image.open(cache_path) as cached:
+                return cached.convert("RGB")
+
+        with Image.open(signature[0]) as src:
+            # JPEGはここで指定したサイズ以上の範囲で縮小デコードされる (切り抜き分を考え、短辺を基準にする)
+            scale = max(size[0] / src.width, size[1] / src.height)
+            src.draft("RGB", (max(1, int(src.width * scale)), max(1, int(src.height * scale))))
+            image = ImageOps.fit(src.convert("RGB"), tuple(size), Image.LANCZOS, centering=(0.5, 0.5))
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = cache_path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        image.save(tmp_path, format="PNG")
+        os.replace(tmp_path, cache_path) # 書きかけのファイルを読まないように置き換える
+        return image
+
+
+def get_default_store():
+    """プロセスで共有するArtStore"""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = ArtStore()
+    return _default_store
@@ -0,0 +1,223 @@
+import os
+import threading
+
+import constants as const
+import utils
+
+# インデックスを持つカテゴリ項目 (クエリ言語のフィールド名と対応)
+INDEX_FIELDS = ("type", "color", "param", "effect.place", "effect.type")
+NO_COLOR = "無"
+
+# --- ソート順の定義 (モジュール読込時に一度だけ構築) ---
+TYPE_ORDER = {
+    const.CARD_TYPE_CHARACTER: 0,
+    const.CARD_TYPE_SPELLCARD: 1,
+    const.CARD_TYPE_ITEM: 2,
+    const.CARD_TYPE_MOVE: 3,
+    const.CARD_TYPE_TERRITORY: 4,
+}
+COLOR_ORDER = {name: i for i, name in enumerate(const.COLORS)}
+
+
+def card_sort_key(card):
+    """タイプ順・属性順・コスト降順・POW降順のソートキーをタプルで返す"""
+    type_order = TYPE_ORDER.get(card.get('card_type', ''), 99)
+
+    active_colors = [k for k, v in (card.get('color') or {}).items() if v > 0]
+    color_order = COLOR_ORDER.get(active_colors[0], 99) if active_colors else 99
+
+    cost = -card.get('cost', 0) # マイナスを付けて昇順ソート
+
+    try: pow_val = -int(card.get('pow', ''))
+    except (ValueError, TypeError): pow_val = 0 # POWが数値でない場合は0として扱う
+
+    return (type_order, color_order, cost, pow_val)
+
+
+# 並び順の表示名 → (カタログ, 添字) からソートキーを返す関数
+# 名前順は正規化済みの名前(ひらがなをカタカナに寄せ、括弧等を除いたもの)で並べるため、かなの名前は五十音順になる
+SORT_MODE_DEFAULT = "タイプ・属性・コスト"
+SORT_MODES = {
+    SORT_MODE_DEFAULT: lambda cat, i: (cat.sort_keys[i], cat.name_keys[i]),
+    "名前 (読み順)": lambda cat, i: (cat.name_keys[i], cat.sort_keys[i]),
+    "POW (高い順)": lambda cat, i: (cat.pows[i] is None, -(cat.pows[i] or 0), cat.sort_keys[i]),
+    "コスト (低い順)": lambda cat, i: (cat.costs[i], cat.sort_keys[i]),
+}
+
+
+def _split_path(path):
+    """OSに関係なく \\ と / の両方を区切りとしてパスを分割する"""
+    return [p for p in path.replace("\\", "/").split("/") if p]
+
+
+def _legacy_rel_path(path):
+    """パスの datas フォルダより後ろの部分を小文字・/区切りで返す (datasを含まなければ空文字)"""
+    parts = _split_path(path)
+    lowered = [p.lower() for p in parts]
+    data_dir_name = os.path.basename(const.DATA_DIR).lower()
+    if data_dir_name not in lowered:
+        return ""
+    start = len(lowered) - 1 - lowered[::-1].index(data_dir_name) # 最後に現れたdatas
+    return "/".join(lowered[start + 1:])
+
+
+class CardCatalog:
+    """
+    カードデータと検索用インデックスをまとめて保持するクラス。
+    カードはリストの添字(インデックス番号)で管理し、各インデックスは {正規化キー: 添字のset} の辞書。
+    別スレッドから検索する場合は lock を取得してから参照すること (登録・破棄も lock の中で行う)。
+    """
+    def __init__(self):
+        self.cards = [] # すべてのカードデータ (辞書リスト)
+        self.by_path = {} # パスをキーにしたカードデータの辞書
+        self.indexes = {field: {} for field in INDEX_FIELDS}
+        self.costs = [] # 添字ごとのコスト (int)
+        self.pows = [] # 添字ごとのPOW (数値でなければNone)
+        self.search_keys = [] # 添字ごとの正規化済み検索キー
+        self.name_keys = [] # 添字ごとの正規化済みカード名
+        self.sort_keys = [] # 添字ごとのソートキー (card_sort_key)
+        self.index_by_path = {} # パス → 添字
+        self.by_id = {} # カードID (utils.make_card_id) → カードデータ
+        self.by_rel_path = {} # datasフォルダからの相対パス(小文字・/区切り) → カードデータ (旧形式のデッキ用)
+        self.by_filename = {} # ファイル名(小文字) → カードデータのリスト (旧形式のデッキ用)
+        self.by_name = {} # 正規化済みカード名 → カードデータのリスト (テキストのデッキリスト用)
+        self._orders = {} # 並び順 → (添字の並び, 添字ごとの順位)。カード追加時に破棄して遅延再計算する
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.cards)
+
+    def clear(self):
+        """登録済みのカードとインデックスをすべて破棄する (リスト・辞書オブジェクトは使い回す)"""
+        with self.lock:
+            self._clear()
+
+    def _clear(self):
+        self.cards.clear()
+        self.by_path.clear()
+        for index in self.indexes.values():
+            index.clear()
+        self.costs.clear()
+        self.pows.clear()
+        self.search_keys.clear()
+        self.name_keys.clear()
+        self.sort_keys.clear()
+        self.index_by_path.clear()
+        self.by_id.clear()
+        self.by_rel_path.clear()
+        self.by_filename.clear()
+        self.by_name.clear()
+        self._orders.clear()
+
+    def add_cards(self, cards):
+        """カードデータのリストをまとめて登録する"""
+        with self.lock:
+            for card in cards:
+                self.add_card(card)
+
+    def add_card(self, card):
+        """カードデータを1枚登録し、各インデックスを更新する。登録した添字を返す。"""
+        with self.lock:
+            return self._add_card(card)
+
+    def _add_card(self, card):
+        idx = len(self.cards)
+        self.cards.append(card)
+        if card.get('__filepath'):
+            self.by_path[card['__filepath']] = card
+            self.index_by_path[card['__filepath']] = idx
+            rel_path = _legacy_rel_path(card['__filepath'])
+            if rel_path:
+                self.by_rel_path.setdefault(rel_path, card)
+            self.by_filename.setdefault(_split_path(card['__filepath'])[-1].lower(), []).append(card)
+
+        card_id = card.setdefault('__id', utils.make_card_id(card))
+        if card_id in self.by_id:
+            print(f"警告: カードIDが重複しています: {card_id} ({card.get('__filepath', '')})")
+        else:
+            self.by_id[card_id] = card
+
+        self._index("type", card.get('card_type', ''), idx)
+
+        active_colors = [c for c, v in (card.get('color') or {}).items() if v > 0]
+        for color in active_colors or [NO_COLOR]:
+            self._index("color", color, idx)
+
+        params = card.get('param', [])
+        if isinstance(params, list):
+            for param in params:
+                self._index("param", param, idx)
+
+        effects = card.get('effe', [])
+        if isinstance(effects, list):
+            for effect in effects:
+                self._index("effect.place", effect.get('place', ''), idx)
+                self._index("effect.type", effect.get('type', ''), idx)
+
+        cost = card.get('cost', 0)
+        self.costs.append(cost if isinstance(cost, int) else 0)
+        try: pow_val = int(card.get('pow', ''))
+        except (ValueError, TypeError): pow_val = None
+        self.pows.append(pow_val)
+
+        self.search_keys.append(card.get('_search_text', ''))
+        self.name_keys.append(utils.normalize_search_text(card.get('name', '')))
+        self.by_name.setdefault(self.name_keys[-1], []).append(card)
+        self.sort_keys.append(card_sort_key(card))
+        self._orders.clear()
+        return idx
+
+    def _index(self, field, value, idx):
+        key = utils.normalize_search_text(value)
+        if key:
+            self.indexes[field].setdefault(key, set()).add(idx)
+
+    def resolve(self, ref):
+        """
+        デッキファイル等のカード参照 (カードID、またはパス) からカードデータを返す。見つからなければNone。
+        旧形式のデッキに保存された別環境の絶対パスは、datas以下の相対パス → ファイル名 の順に照合する。
+        """
+        if not ref:
+            return None
+        card = self.by_id.get(ref) or self.by_path.get(ref)
+        if card is not None:
+            return card
+        rel_path = _legacy_rel_path(ref)
+        if rel_path and rel_path in self.by_rel_path:
+            return self.by_rel_path[rel_path]
+        candidates = self.by_filename.get(_split_path(ref)[-1].lower(), [])
+        return candidates[0] if len(candidates) == 1 else None
+
+    def lookup(self, field, value):
+        """
+        カテゴリ項目の値(正規化済み)に一致するカードの添字setを返す。
+        完全一致がなければ前方一致したキーの和集合を返す。
+        """
+        index = self.indexes[field]
+        if value in index:
+            return index[value]
+        matched = [ids for key, ids in index.items() if key.startswith(value)]
+        if len(matched) == 1:
+            return matched[0]
+        return set().union(*matched)
+
+    def order(self, mode=SORT_MODE_DEFAULT):
+        """指定した並び順の (添字の並び, 添字ごとの順位) を返す。並び順ごとに一度だけ計算する。"""
+        cached = self._orders.get(mode)
+        if cached is None:
+            key_func = SORT_MODES.get(mode, SORT_MODES[SORT_MODE_DEFAULT])
+            permutation = sorted(range(len(self.cards)), key=lambda i: key_func(self, i))
+            rank = [0] * len(permutation)
+            for position, idx in enumerate(permutation):
+                rank[idx] = position
+            cached = self._orders[mode] = (permutation, rank)
+        return cached
+
+    def sort_indices(self, indices, mode=SORT_MODE_DEFAULT):
+        """添字のリストを保存済みの並び順に並べ替えて返す"""
+        permutation, rank = self.order(mode)
+        if len(indices) * 8 < len(permutation):
+            # 件数が少ないときは順位(int)をキーにした並べ替えの方が速い
+            return sorted(indices, key=rank.__getitem__)
+        selected = set(indices)
+        return [i for i in permutation if i in selected]
@@ -14,6 +14,7 @@ class Card:
     def __init__(self):
         self.name = ""
         self.effe = []
+        self.art = "" # イラストの画像ファイル (artフォルダからの相対パス)
 
 class PlayableCard(Card):
     """コストや色を持つ、プレイ可能なカードの基底クラス"""
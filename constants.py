@@ -6,15 +6,24 @@ APP_DIR = os.path.dirname(os.path.abspath(__file__))
 # --- ディレクトリパス ---
 CONFIG_FILE = os.path.join(APP_DIR, "config.json")
 PARAMS_FILE = os.path.join(APP_DIR, "params.json")
+TEMPLATES_FILE = os.path.join(APP_DIR, "templates.json") # カードタイプごとのレイアウトテンプレート
 DEFAULT_FONT_DIR = os.path.join(APP_DIR, "fonts")
 DATA_DIR = os.path.join(APP_DIR, "datas")
 PICTURES_DIR = os.path.join(APP_DIR, "card")
+THUMBNAIL_DIR = os.path.join(PICTURES_DIR, ".thumbs")
+ART_DIR = os.path.join(APP_DIR, "art") # カードのイラスト (カードJSONの "art" はここからの相対パス)
+ART_CACHE_DIR = os.path.join(ART_DIR, ".cache") # 切り抜き・縮小済みのイラスト
 
 # --- カードの基本仕様 ---
 CARD_W, CARD_H = 223,325
 COLORS = ["赤", "青", "緑", "黄", "紫"]
 MAX_EFFECTS = 4
 
+# --- 確率計算・シミュレーションの既定値 (画面上で変更できる) ---
+OPENING_HAND_SIZE = 5 # 初期手札の枚数
+DRAWS_PER_TURN = 1 # 毎ターンのドロー枚数
+MAX_COPIES = 4 # デッキに入れられる同名カードの最大枚数
+
 # --- カードタイプ定数 ---
 CARD_TYPE_CHARACTER = "キャラクター"
 CARD_TYPE_SPELLCARD = "スペルカード"
@@ -31,22 +40,3 @@ CARD_TYPE_LIST = [
 # --- 効果の選択肢 ---
 EFFECT_TYPELIST = ("", "誘発", "起動", "常時")
 EFFECT_PLACELIST = ("", "手札", "場", "墓地", "デッキ")
-
-# --- デザインレイアウト定数 ---
-LAYOUT = {
-    "PADDING": 5,
-    "BORDER_WIDTH": 3,
-    "MID_LINE_Y": 175,
-    "COST_CIRCLE_CX": 25,
-    "COST_CIRCLE_CY": 25,
-    "COST_CIRCLE_R": 12,
-    "NAME_AREA_Y": 12,
-    "NAME_MAX_WIDTH": CARD_W - 50,
-    "POW_PARAM_Y_OFFSET": -22,
-    "EFFECT_AREA_Y_START": 8,
-    "FOOTER_Y_OFFSET": -28,
-    "FOOTER_X_PADDING": 15,
-    "SPELL_MANA_START_Y": 40,
-    "SPELL_MANA_SIZE": 18,
-    "SPELL_MANA_PADDING": 3,
-}
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""
+フォルダ内の大量のデッキファイル (.ucgdeck) をまとめて集計する。
+
+- 採用率: そのカードを1枚以上入れているデッキの割合
+- 平均枚数: 採用しているデッキでの平均枚数
+- 同時採用: 2種類のカードを両方入れているデッキ数 (デッキ×カードの採用行列 B に対する B^T B)
+- 属性の組み合わせ: デッキに含まれる属性の組ごとのデッキ数
+
+ファイルの読込はスレッドプールで並列に行い、カード参照の解決は同じ参照につき1回だけ行う。
+集計はNumPyがあれば行列演算で、なければ辞書による疎な集計で行う。
+"""
+import csv
+import json
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+
+import constants as const
+from deckfile import resolve_deck_data
+
+try:
+    import numpy as np
+except ImportError: # NumPyがない環境では辞書で集計する
+    np = None
+
+DECK_EXTENSION = ".ucgdeck"
+
+
+class _CachedResolver:
+    """同じカード参照の解決結果を使い回すラッパー (CardCatalog.resolveと同じ使い方ができる)"""
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.cache = {}
+
+    def resolve(self, ref):
+        if ref not in self.cache:
+            self.cache[ref] = self.catalog.resolve(ref)
+        return self.cache[ref]
+
+
+def find_deck_files(directory):
+    """フォルダ以下のデッキファイルのパスを再帰的に集める"""
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(DECK_EXTENSION))
+    return sorted(paths)
+
+
+def _is_valid_deck_data(data):
+    """デッキファイルの形 ({"boss": 参照 or null, "deck": {参照: 枚数}}) になっているか"""
+    if not isinstance(data, dict):
+        return False
+    boss = data.get("boss")
+    if boss is not None and not isinstance(boss, str):
+        return False
+    deck = data.get("deck")
+    if deck is None:
+        return True
+    return isinstance(deck, dict) and all(
+        isinstance(qty, int) and not isinstance(qty, bool) and qty >= 0 for qty in deck.values())
+
+
+def _read_deck_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"Error loading {path}: {e}")
+        return path, None
+    if not _is_valid_deck_data(data):
+        print(f"Error loading {path}: デッキファイルの形式ではありません。")
+        return path, None
+    return path, data
+
+
+def _card_colors(card):
+    return [c for c in const.COLORS if (card.get('color') or {}).get(c, 0) > 0]
+
+
+def analyze_deck_archive(directory, catalog, report=None, cancel_check=None):
+    """
+    フォルダ内のデッキファイルを読み込んで集計し、結果を辞書で返す。
+    reportは (処理済み件数, 総件数, メッセージ) で呼ばれ、cancel_checkは定期的に呼ばれる。
+    """
+    paths = find_deck_files(directory)
+    total = len(paths)
+
+    # --- 1. ファイルを並列に読み込む ---
+    raw_decks, failed = [], []
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as pool:
+        for done, (path, data) in enumerate(pool.map(_read_deck_json, paths), 1):
+            if data is None:
+                failed.append(path)
+            else:
+                raw_decks.append(data)
+            if done % 200 == 0 or done == total:
+                if cancel_check:
+                    cancel_check()
+                if report:
+                    report(done, total, f"デッキを読込中... ({done}/{total})")
+
+    if not raw_decks:
+        raise ValueError("読み込めるデッキファイルがありません。")
+
+    # --- 2. カード参照を解決し、カードごとに列番号を振る ---
+    resolver = _CachedResolver(catalog)
+    columns = {} # id(カードデータ) → 列番号
+    column_cards = []
+    decks = [] # [(BOSSのカードデータ, [(列番号, 枚数)])]
+    unresolved = Counter()
+    for deck_data in raw_decks:
+        boss_card, deck_cards, missing = resolve_deck_data(deck_data, resolver)
+        unresolved.update(missing)
+        entries = []
+        for card, qty in deck_cards:
+            col = columns.get(id(card))
+            if col is None:
+                col = columns[id(card)] = len(column_cards)
+                column_cards.append(card)
+            entries.append((col, qty))
+        decks.append((boss_card, entries))
+    if cancel_check:
+        cancel_check()
+    if report:
+        report(total, total, "集計中...")
+
+    # --- 3. 集計 ---
+    aggregate = _aggregate_numpy if np is not None else _aggregate_sparse
+    included, copies, pair_counts, color_pair_counts = aggregate(decks, column_cards)
+
+    deck_count = len(decks)
+    card_stats = [{
+        'card': card,
+        'decks': included[col],
+        'inclusion': included[col] / deck_count,
+        'avg_copies': copies[col] / included[col] if included[col] else 0.0,
+        'total_copies': copies[col],
+    } for col, card in enumerate(column_cards)]
+    card_stats.sort(key=lambda s: (-s['decks'], -s['avg_copies'], s['card'].get('name', '')))
+
+    pairs = sorted(((column_cards[a], column_cards[b], n) for (a, b), n in pair_counts.items()),
+                   key=lambda p: -p[2])
+    boss_counts = Counter(id(boss) for boss, _ in decks if boss is not None)
+    boss_cards = {id(boss): boss for boss, _ in decks if boss is not None}
+
+    return {
+        'directory': directory,
+        'deck_count': deck_count,
+        'failed': failed,
+        'unresolved': unresolved,
+        'cards': card_stats,
+        'pairs': [(a, b, n, n / deck_count) for a, b, n in pairs],
+        'color_pairs': [(a, b, n, n / deck_count) for (a, b), n in sorted(color_pair_counts.items(), key=lambda x: -x[1])],
+        'bosses': [(boss_cards[key], n, n / deck_count) for key, n in boss_counts.most_common()],
+    }
+
+
+def _aggregate_numpy(decks, column_cards):
+    """デッキ×カードの枚数行列を作り、行列演算で集計する"""
+    rows, cols, qtys = [], [], []
+    for row, (_, entries) in enumerate(decks):
+        for col, qty in entries:
+            rows.append(row)
+            cols.append(col)
+            qtys.append(qty)
+    counts = np.zeros((len(decks), len(column_cards)), dtype=np.int32)
+    counts[rows, cols] = qtys
+    adopted = (counts > 0).astype(np.int32)
+
+    included = adopted.sum(axis=0)
+    copies = counts.sum(axis=0)
+    co_occurrence = adopted.T @ adopted # (カード, カード) の同時採用デッキ数
+    upper_a, upper_b = np.triu_indices(len(column_cards), k=1)
+    pair_values = co_occurrence[upper_a, upper_b]
+    nonzero = pair_values > 0
+    pair_counts = dict(zip(zip(upper_a[nonzero].tolist(), upper_b[nonzero].tolist()), pair_values[nonzero].tolist()))
+
+    # デッキごとの属性の有無 (デッキ, 属性) → 属性の組ごとのデッキ数
+    card_colors = np.array([[c in _card_colors(card) for c in const.COLORS] for card in column_cards], dtype=np.int32).reshape(-1, len(const.COLORS))
+    deck_colors = ((adopted @ card_colors) > 0).astype(np.int32)
+    color_matrix = deck_colors.T @ deck_colors
+    color_pair_counts = {}
+    for i, j in zip(*np.triu_indices(len(const.COLORS))):
+        if color_matrix[i, j]:
+            color_pair_counts[(const.COLORS[i], const.COLORS[j])] = int(color_matrix[i, j])
+    return included.tolist(), copies.tolist(), pair_counts, color_pair_counts
+
+
+def _aggregate_sparse(decks, column_cards):
+    """NumPyがない場合の集計。デッキごとの採用カードの組だけを数える"""
+    included = [0] * len(column_cards)
+    copies = [0] * len(column_cards)
+    pair_counts = Counter()
+    color_pair_counts = Counter()
+    colors_by_col = [set(_card_colors(card)) for card in column_cards]
+    for _, entries in decks:
+        adopted = sorted(col for col, qty in entries if qty > 0)
+        for col, qty in entries:
+            if qty > 0:
+                included[col] += 1
+                copies[col] += qty
+        pair_counts.update(combinations(adopted, 2))
+        deck_colors = [c for c in const.COLORS if any(c in colors_by_col[col] for col in adopted)]
+        color_pair_counts.update((c, c) for c in deck_colors)
+        color_pair_counts.update(combinations(deck_colors, 2))
+    return included, copies, dict(pair_counts), dict(color_pair_counts)
+
+
+def export_csv(result, output_dir):
+    """集計結果をCSVファイル (Excelで開けるようBOM付きUTF-8) に書き出し、書き出したパスのリストを返す"""
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+
+    def write(filename, header, rows):
+        path = os.path.join(output_dir, filename)
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        written.append(path)
+
+    write("cards.csv", ["カードID", "カード名", "タイプ", "採用デッキ数", "採用率", "平均枚数", "総枚数"],
+          [(s['card'].get('__id', ''), s['card'].get('name', ''), s['card'].get('card_type', ''),
+            s['decks'], f"{s['inclusion']:.4f}", f"{s['avg_copies']:.3f}", s['total_copies']) for s in result['cards']])
+    write("co_occurrence.csv", ["カードA", "カードB", "同時採用デッキ数", "割合"],
+          [(a.get('name', ''), b.get('name', ''), n, f"{rate:.4f}") for a, b, n, rate in result['pairs']])
+    write("color_pairs.csv", ["属性A", "属性B", "デッキ数", "割合"],
+          [(a, b, n, f"{rate:.4f}") for a, b, n, rate in result['color_pairs']])
+    write("bosses.csv", ["BOSS", "デッキ数", "割合"],
+          [(boss.get('name', ''), n, f"{rate:.4f}") for boss, n, rate in result['bosses']])
+    return written
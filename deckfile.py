@@ -0,0 +1,58 @@
+"""
+デッキファイル (.ucgdeck) の読み書き。
+
+version 2: {"version": 2, "boss": カードID, "deck": {カードID: 枚数}}
+version 1 (旧形式): BOSSとデッキのカードを保存した環境の絶対パスで参照している。
+どちらの形式もCardCatalog.resolve()でカードデータに解決する。
+"""
+import json
+
+DECK_FILE_VERSION = 2
+
+
+def read_deck_file(filepath, catalog):
+    """
+    デッキファイルを読み込み、カード参照を解決する。
+
+    Returns:
+        tuple: (BOSSのカードデータ or None, [(カードデータ, 枚数)], 解決できなかった参照のリスト)
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        deck_data = json.load(f)
+    return resolve_deck_data(deck_data, catalog)
+
+
+def resolve_deck_data(deck_data, catalog):
+    """デッキデータ(dict)のカード参照を解決する。戻り値はread_deck_fileと同じ。"""
+    unresolved = []
+    boss_ref = deck_data.get("boss")
+    boss_card = catalog.resolve(boss_ref) if boss_ref else None
+    if boss_ref and boss_card is None:
+        unresolved.append(boss_ref)
+
+    quantities = {} # 旧形式で別々のパスが同じカードに解決された場合は枚数を合算する
+    for ref, qty in (deck_data.get("deck") or {}).items():
+        card = catalog.resolve(ref)
+        if card is None:
+            unresolved.append(ref)
+            continue
+        entry = quantities.setdefault(id(card), [card, 0])
+        entry[1] += qty
+    return boss_card, [tuple(entry) for entry in quantities.values()], unresolved
+
+
+def write_deck_file(filepath, boss_ref, deck_refs):
+    """
+    デッキをカードID形式で保存する。
+
+    Args:
+        boss_ref (str or None): BOSSのカードID
+        deck_refs (dict): {カードID: 枚数}。カタログにないカードはパスのままでもよい。
+    """
+    deck_data = {
+        "version": DECK_FILE_VERSION,
+        "boss": boss_ref,
+        "deck": deck_refs
+    }
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(deck_data, f, ensure_ascii=False, indent=4)
@@ -0,0 +1,119 @@
+"""
+テキスト形式のデッキリストの読み書き。
+
+    BOSS: レミリア・スカーレット
+    4 大妖精
+    3x チルノ
+    2×ルーミア
+    紅美鈴 x2
+    # コメント行
+
+カード名は検索と同じ正規化 (全角/半角・かな・記号の違いを無視) をしてから名前の索引で探す。
+見つからない場合はカードID → 前方一致 → 類似した名前 (difflib) の順に探し、
+推定で決めたものや候補が複数あるものは、まとめて報告する。
+"""
+import difflib
+import re
+
+import constants as const
+import utils
+
+_QTY_FIRST_X = re.compile(r"^(?P<qty>\d+)\s*[x×]\s*(?P<name>.+)$", re.IGNORECASE) # 4x 大妖精 / 4×大妖精
+_QTY_FIRST = re.compile(r"^(?P<qty>\d+)\s+(?P<name>.+)$") # 4 大妖精
+_QTY_LAST = re.compile(r"^(?P<name>.+?)\s*[x×]\s*(?P<qty>\d+)$", re.IGNORECASE) # 大妖精 x2 / 大妖精x2
+_BOSS_LINE = re.compile(r"^boss\s*[:：]\s*(?P<name>.+)$", re.IGNORECASE)
+FUZZY_CUTOFF = 0.75
+
+
+class DecklistResult:
+    """デッキリストの解析結果"""
+    def __init__(self):
+        self.boss_card = None
+        self.quantities = {} # id(カードデータ) → [カードデータ, 枚数]
+        self.errors = [] # 見つからなかった行など (デッキには入らない)
+        self.warnings = [] # 推定で解決した行など (デッキには入る)
+
+    @property
+    def deck_cards(self):
+        """[(カードデータ, 枚数)]"""
+        return [tuple(entry) for entry in self.quantities.values()]
+
+
+def parse_decklist(text, catalog):
+    """テキストのデッキリストを解析し、カタログのカードに解決したDecklistResultを返す"""
+    result = DecklistResult()
+    for line_no, raw_line in enumerate(text.splitlines(), 1):
+        line = raw_line.strip()
+        if not line or line.startswith(("#", "//")):
+            continue
+
+        boss_match = _BOSS_LINE.match(line)
+        if boss_match:
+            card = _resolve_line(boss_match.group("name"), catalog, True, line_no, result)
+            if card is not None:
+                if result.boss_card is not None:
+                    result.warnings.append(f"{line_no}行目: BOSSが複数指定されています。後の指定を使います。")
+                result.boss_card = card
+            continue
+
+        match = _QTY_FIRST_X.match(line) or _QTY_FIRST.match(line) or _QTY_LAST.match(line)
+        name, qty = (match.group("name"), int(match.group("qty"))) if match else (line, 1)
+        if qty <= 0:
+            continue
+        card = _resolve_line(name, catalog, False, line_no, result)
+        if card is None:
+            continue
+        entry = result.quantities.setdefault(id(card), [card, 0])
+        entry[1] += qty
+        if entry[1] > const.MAX_COPIES:
+            result.warnings.append(f"{line_no}行目: {card.get('name', '')} は {const.MAX_COPIES} 枚までです。{const.MAX_COPIES} 枚にしました。")
+            entry[1] = const.MAX_COPIES
+    return result
+
+
+def _resolve_line(name, catalog, want_boss, line_no, result):
+    """1行分のカード名を解決する。見つからなければエラーを記録してNoneを返す。"""
+    name = name.strip()
+    card = catalog.by_id.get(name) # カードIDで書かれている場合
+    if card is not None:
+        return card
+
+    key = utils.normalize_search_text(name)
+    candidates = catalog.by_name.get(key, [])
+    how = None
+    if not candidates and key:
+        prefixed = [k for k in catalog.by_name if k.startswith(key)]
+        if len(prefixed) == 1:
+            candidates, how = catalog.by_name[prefixed[0]], "前方一致"
+        else:
+            close = difflib.get_close_matches(key, list(catalog.by_name), n=1, cutoff=FUZZY_CUTOFF)
+            if close:
+                candidates, how = catalog.by_name[close[0]], "類似した名前"
+
+    # BOSSとキャラクターで同名のカードがあるため、行の種類でタイプを絞り込む
+    typed = [c for c in candidates if (c.get('card_type') == const.CARD_TYPE_BOSS) == want_boss]
+    if not typed:
+        kind = "BOSSカード" if want_boss else "カード"
+        result.errors.append(f"{line_no}行目: {kind}「{name}」が見つかりません。")
+        return None
+
+    card = typed[0]
+    if how:
+        result.warnings.append(f"{line_no}行目: 「{name}」を{how}の「{card.get('name', '')}」としました。")
+    if len(typed) > 1:
+        ids = ", ".join(c.get('__id', '') for c in typed)
+        result.warnings.append(f"{line_no}行目: 「{name}」の候補が複数あります ({ids})。{card.get('__id', '')} を使います。")
+    return card
+
+
+def format_decklist(boss_card, deck_cards):
+    """デッキをテキストのデッキリストにする。deck_cards は表示順に並べた [(カードデータ, 枚数)]"""
+    lines = []
+    if boss_card:
+        lines.append(f"BOSS: {_display_name(boss_card)}")
+    lines.extend(f"{qty} {_display_name(card)}" for card, qty in deck_cards)
+    return "\n".join(lines) + "\n"
+
+
+def _display_name(card):
+    return " ".join(part.strip() for part in card.get('name', '').split('\n') if part.strip())
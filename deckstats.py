@@ -0,0 +1,105 @@
+"""
+デッキのドロー確率計算 (超幾何分布)。
+
+山札から引いた枚数のうち、条件に当てはまるカードが何枚含まれるかの確率を厳密に計算する。
+二項係数の表と計算結果はキャッシュするので、デッキを1枚変えたときの再計算はほぼ表の参照だけで済む。
+"""
+from collections import defaultdict
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _binomial_row(n):
+    """パスカルの三角形の n 段目 (C(n, 0) ～ C(n, n)) を返す"""
+    if n == 0:
+        return (1,)
+    prev = _binomial_row(n - 1)
+    return (1,) + tuple(prev[i] + prev[i + 1] for i in range(n - 1)) + (1,)
+
+
+def comb(n, k):
+    """二項係数 C(n, k)。範囲外は0"""
+    if k < 0 or n < 0 or k > n:
+        return 0
+    return _binomial_row(n)[k]
+
+
+def cards_seen(turn, hand_size, draws_per_turn, on_play):
+    """Nターン目のドロー後までに見たカードの枚数 (先攻は1ターン目にドローしない)"""
+    draw_turns = turn - 1 if on_play else turn
+    return hand_size + draws_per_turn * max(draw_turns, 0)
+
+
+@lru_cache(maxsize=8192)
+def prob_at_least(population, successes, sample, k):
+    """
+    population枚(うち当たりsuccesses枚)の山札からsample枚引いたとき、当たりをk枚以上引く確率。
+    """
+    if k <= 0:
+        return 1.0
+    sample = min(sample, population)
+    if successes < k or sample < k:
+        return 0.0
+    total = comb(population, sample)
+    misses = population - successes
+    # k枚未満を引く場合の数を全体から引く (kは小さいので項数が少ない)
+    below = sum(comb(successes, i) * comb(misses, sample - i) for i in range(k))
+    return 1.0 - below / total
+
+
+@lru_cache(maxsize=8192)
+def prob_all(population, cells, requirements, sample):
+    """
+    複数の条件を同時に満たす確率 (多変量超幾何分布)。
+
+    Args:
+        population (int): 山札の枚数
+        cells (tuple): ((どの条件に当てはまるかのビットマスク, 枚数), ...)。
+                       どの条件にも当てはまらないカードは含めなくてよい。
+        requirements (tuple): 条件ごとの必要枚数 (ビット i が requirements[i] に対応)
+        sample (int): 引く枚数
+    """
+    sample = min(sample, population)
+    total = comb(population, sample)
+    if total == 0:
+        return 0.0
+    others = population - sum(count for _, count in cells)
+
+    # 状態: (引いた枚数, 条件ごとの達成枚数(必要枚数で頭打ち)) → 場合の数
+    states = {(0, (0,) * len(requirements)): 1}
+    for mask, count in cells:
+        next_states = defaultdict(int)
+        for (drawn, progress), ways in states.items():
+            for x in range(min(count, sample - drawn) + 1):
+                new_progress = tuple(min(req, got + x) if mask >> i & 1 else got
+                                     for i, (req, got) in enumerate(zip(requirements, progress)))
+                next_states[(drawn + x, new_progress)] += ways * comb(count, x)
+        states = next_states
+
+    hits = sum(ways * comb(others, sample - drawn)
+               for (drawn, progress), ways in states.items() if progress == requirements)
+    return hits / total
+
+
+def build_cells(deck_cards, predicates):
+    """
+    デッキのカードを、どの条件に当てはまるかでグループ分けする。
+
+    Args:
+        deck_cards (list): [(カードデータ, 枚数)]
+        predicates (list): カードデータを受け取り、条件に当てはまるかを返す関数のリスト
+
+    Returns:
+        tuple: (山札の枚数, prob_allに渡すcells)
+    """
+    population = 0
+    counts = defaultdict(int)
+    for card, qty in deck_cards:
+        population += qty
+        mask = 0
+        for i, predicate in enumerate(predicates):
+            if predicate(card):
+                mask |= 1 << i
+        if mask:
+            counts[mask] += qty
+    return population, tuple(sorted(counts.items()))
@@ -1,17 +1,253 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
-from dialogs import NonModalInfo # NonModalInfoをインポート
+from dialogs import NonModalInfo, JobProgressWindow, DrawProbabilityWindow, GoldfishWindow, OptimizerWindow, DeckArchiveWindow, DecklistTextWindow # NonModalInfoをインポート
 import json
 import constants as const
 from PIL import Image, ImageTk
 from tkinter.font import Font
 import utils
 from renderer import CardRenderer
+from catalog import CardCatalog, SORT_MODES, SORT_MODE_DEFAULT
+from query import compile_query, QueryError
+from thumbnails import ThumbnailService
+from jobs import run_job, LatestOnlyWorker
+from deckfile import read_deck_file, write_deck_file
+import decklist
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import sys, traceback
+import bisect
+import queue
+import threading
+import time
+from collections import Counter
+
+class VirtualCardList(tk.Frame):
+    """
+    カード検索結果を表示する仮想スクロールリスト。
+    表示領域を埋める分だけ行ウィジェットを作成し、スクロールに合わせて行にカードデータを割り当て直す。
+    """
+    ROW_HEIGHT = 96 # 1行の高さ(px)。効果テキストがはみ出す分は切り詰めて表示する
+
+    def __init__(self, master, color_styles, qty_getter, adjust_callback, show_image_callback,
+                 drag_start_callback, drag_motion_callback, drag_end_callback, menu_callback, thumbnail_service=None):
+        super().__init__(master)
+        self.color_styles = color_styles
+        self.thumbnail_service = thumbnail_service # Noneの場合はサムネイルを表示しない
+        self.qty_getter = qty_getter # カードデータ → デッキ内の枚数
+        self.adjust_callback = adjust_callback
+        self.show_image_callback = show_image_callback
+        self.drag_start_callback = drag_start_callback
+        self.drag_motion_callback = drag_motion_callback
+        self.drag_end_callback = drag_end_callback
+        self.menu_callback = menu_callback
+
+        self.items = [] # 表示するカードデータのリスト
+        self.rows = [] # 使い回す行ウィジェット
+
+        # 全角30文字分を効果テキストの折り返し幅とする
+        self.effect_font = Font(family="TkDefaultFont", size=9)
+        self.wrap_width = self.effect_font.measure('Ｍ' * 30)
+
+        self.canvas = tk.Canvas(self, highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_canvas_scrolled)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.canvas.bind("<Configure>", self._on_canvas_configure)
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+
+    def set_items(self, items, keep_scroll=False):
+        """
+        表示するカードデータを差し替え、先頭までスクロールを戻す (keep_scrollなら表示位置を保つ)。
+        差し替え前後で見えているカードが同じ行は描き直さず、枚数表示だけを更新する。
+        """
+        top = self.canvas.canvasy(0)
+        self.items = items
+        self.canvas.configure(scrollregion=(0, 0, 0, len(items) * self.ROW_HEIGHT))
+        if keep_scroll and items:
+            self.canvas.yview_moveto(top / (len(items) * self.ROW_HEIGHT))
+        else:
+            self.canvas.yview_moveto(0)
+        self._layout()
+        self.refresh_visible()
+
+    def refresh_card(self, card):
+        """指定したカードを表示中の行があれば、その枚数表示を更新する"""
+        for row in self.rows:
+            if row.card is card:
+                self._update_qty_label(row)
+
+    def refresh_thumbnails(self, paths):
+        """サムネイルの生成が完了したカードを表示中の行に反映する"""
+        paths = set(paths)
+        for row in self.rows:
+            if row.card is not None and row.card.get('__filepath') in paths:
+                self._update_thumbnail(row)
+
+    def refresh_visible(self):
+        """表示中のすべての行の枚数表示を更新する"""
+        for row in self.rows:
+            if row.card is not None:
+                self._update_qty_label(row)
+
+    def _on_canvas_scrolled(self, first, last):
+        self.scrollbar.set(first, last)
+        self._layout()
+
+    def _on_canvas_configure(self, event):
+        for row in self.rows:
+            self.canvas.itemconfigure(row.window_id, width=event.width)
+        self._layout()
+
+    def _on_mousewheel(self, event):
+        """マウスホイールイベントを処理してCanvasをスクロールする"""
+        # Windows/macOS
+        scroll_val = -1 * (event.delta // 120)
+        self.canvas.yview_scroll(scroll_val, "units")
+
+    def _layout(self):
+        """現在のスクロール位置で見えている範囲に行ウィジェットを割り当てる"""
+        top = max(0, int(self.canvas.canvasy(0)))
+        visible_count = self.canvas.winfo_height() // self.ROW_HEIGHT + 2
+        while len(self.rows) < visible_count:
+            self.rows.append(self._create_row())
+
+        first = top // self.ROW_HEIGHT
+        visible_items = self.items[first:first + visible_count]
+        if self.thumbnail_service:
+            # 表示範囲外になったカードのサムネイル生成は後回しにさせる
+            self.thumbnail_service.set_wanted(card.get('__filepath') for card in visible_items)
+
+        # すでに同じカードを表示している行はそのまま使い、新しく見えるカードだけを空いた行に割り当てる
+        rows_by_card = {id(row.card): row for row in self.rows if row.card is not None}
+        assigned = [rows_by_card.pop(id(card), None) for card in visible_items]
+        free_rows = iter([row for row in self.rows if row.card is None or id(row.card) in rows_by_card])
+        for offset, (card, row) in enumerate(zip(visible_items, assigned)):
+            if row is None:
+                row = next(free_rows)
+                self._bind_row(row, card)
+            self.canvas.coords(row.window_id, 0, (first + offset) * self.ROW_HEIGHT)
+            self.canvas.itemconfigure(row.window_id, state="normal")
+        for row in free_rows:
+            row.card = None
+            self.canvas.itemconfigure(row.window_id, state="hidden")
+
+    def _create_row(self):
+        """行ウィジェットを1つ作成する。イベントのバインドは作成時に一度だけ行う。"""
+        row = tk.Frame(self.canvas, relief="solid", bd=1, height=self.ROW_HEIGHT - 2)
+        row.pack_propagate(False) # 中身に関わらず高さを固定する
+        row.card = None
+
+        # --- 左側: デッキ操作エリア ---
+        row.control_frame = tk.Frame(row, width=110)
+        row.control_frame.pack_propagate(False) # 幅を110pxに固定
+        row.control_frame.pack(side="left", fill="y", padx=5, pady=5)
+        row.qty_label = tk.Label(row.control_frame, font=("", 10, "bold"), width=5)
+        row.qty_label.pack(side="left")
+        tk.Button(row.control_frame, text="－", width=2, command=lambda r=row: r.card and self.adjust_callback(r.card, -1)).pack(side="left", padx=(5, 2))
+        tk.Button(row.control_frame, text="＋", width=2, command=lambda r=row: r.card and self.adjust_callback(r.card, 1)).pack(side="left")
+
+        # --- サムネイル (生成完了まで空欄) ---
+        row.thumb_label = None
+        if self.thumbnail_service:
+            thumb_w, thumb_h = self.thumbnail_service.size
+            thumb_frame = tk.Frame(row, width=thumb_w, height=thumb_h)
+            thumb_frame.pack_propagate(False)
+            thumb_frame.pack(side="left", padx=(0, 5))
+            row.thumb_label = tk.Label(thumb_frame, bd=0)
+            row.thumb_label.pack(fill="both", expand=True)
+
+        # --- 右側: カード情報エリア ---
+        row.info_frame = tk.Frame(row)
+        row.info_frame.pack(side="left", fill="both", expand=True, pady=5)
+
+        # 1行目: 名前 (左寄せ) と コスト・POW・タイプ・属性 (右寄せ)
+        row.top_info = tk.Frame(row.info_frame)
+        row.top_info.pack(fill="x")
+        row.summary_label = tk.Label(row.top_info, anchor="e")
+        row.summary_label.pack(side="right", padx=5)
+        row.name_label = tk.Label(row.top_info, font=("", 11, "bold"), anchor="w")
+        row.name_label.pack(side="left")
+
+        # 2行目: 特徴
+        row.param_label = tk.Label(row.info_frame, font=("", 9), anchor="w", justify="left")
+        row.param_label.pack(fill="x")
+
+        # 3行目: 効果 (画像表示ボタン付き)
+        row.effect_frame = tk.Frame(row.info_frame)
+        row.effect_frame.pack(fill="x")
+        tk.Button(row.effect_frame, text="🖼️", command=lambda r=row: r.card and self.show_image_callback(r.card)).pack(side="right", padx=5)
+        row.effect_label = tk.Label(row.effect_frame, font=self.effect_font, anchor="nw", justify="left", wraplength=self.wrap_width)
+        row.effect_label.pack(side="left", fill="x")
+
+        row.bg_widgets = [w for w in (row, row.control_frame, row.qty_label, row.thumb_label, row.info_frame, row.top_info,
+                                      row.summary_label, row.name_label, row.param_label, row.effect_frame, row.effect_label) if w is not None]
+        self._bind_row_events(row, row)
+
+        row.window_id = self.canvas.create_window(0, 0, window=row, anchor="nw", width=self.canvas.winfo_width(), state="hidden")
+        return row
+
+    def _bind_row_events(self, row, widget):
+        """行ウィジェットにドラッグ・右クリック・スクロールのイベントを再帰的にバインドする"""
+        widget.bind("<MouseWheel>", self._on_mousewheel)
+        if not isinstance(widget, (tk.Button, ttk.Button)):
+            # イベント発生時に行へ割り当て中のカードを参照するので、再割り当て時のバインドし直しは不要
+            widget.bind("<ButtonPress-1>", lambda e, r=row: r.card and self.drag_start_callback(e, r.card))
+            widget.bind("<B1-Motion>", self.drag_motion_callback)
+            widget.bind("<ButtonRelease-1>", self.drag_end_callback)
+            widget.bind("<Button-3>", lambda e, r=row: r.card and self.menu_callback(e, r.card))
+        for child in widget.winfo_children():
+            self._bind_row_events(row, child)
+
+    def _bind_row(self, row, card):
+        """行ウィジェットの表示内容をカードデータで更新する"""
+        row.card = card
+        card_type = card.get('card_type', '')
+        active_colors = [k for k, v in card.get('color', {}).items() if v > 0]
+        bg_color = self.color_styles.get(active_colors[0] if active_colors else "無", "#FFFFFF")
+        for widget in row.bg_widgets:
+            widget.config(bg=bg_color)
+
+        summary = []
+        if card.get('cost') is not None:
+            summary.append(f"Cost: {card.get('cost', 0)}")
+        if card.get('pow'):
+            summary.append(f"POW: {card.get('pow')}")
+        summary.append(card_type)
+        summary.append("／".join(active_colors) or "無")
+        row.summary_label.config(text="   ".join(summary))
+        row.name_label.config(text=card.get('name', ''))
+
+        params = " ".join(card.get('param', []))
+        row.param_label.config(text=f"特徴: {params}" if params else "")
+
+        # 各効果テキストを改行で連結し、句点「。」の後にも改行を追加する
+        effects_text = "\n".join([e.get('text', '').replace('。', '。\n') for e in card.get('effe', []) if e.get('text')])
+        row.effect_label.config(text=f"効果: {effects_text}" if effects_text else "")
+
+        self._update_qty_label(row)
+        self._update_thumbnail(row)
+
+    def _update_thumbnail(self, row):
+        if not self.thumbnail_service:
+            return
+        photo = self.thumbnail_service.get(row.card) # 未生成の場合はバックグラウンドで生成が始まる
+        row.thumb_label.config(image=photo if photo is not None else "")
+
+    def _update_qty_label(self, row):
+        qty_in_deck = self.qty_getter(row.card)
+        row.qty_label.config(text=f"{qty_in_deck}枚" if qty_in_deck > 0 else "")
+
 
 class DeckToolApp(tk.Tk):
     """ デッキ構築ツールメインアプリケーション """
+    CARD_LOAD_BATCH = 64 # 読込スレッドが一度に渡すカード数
+    CARD_LOAD_POLL_MS = 100 # 読込結果を取り込む間隔 (ミリ秒)
+    CARD_LOAD_REFRESH_MS = 1000 # 読込中に検索結果を更新する最短の間隔 (更新のたびに全カードを並べ直すため)
+    SEARCH_DEBOUNCE_MS = 250 # 入力が止まってから検索を始めるまでの待ち時間 (ミリ秒)
+
     def __init__(self):
         super().__init__()
         self.title("UCG Deck Tool")
@@ -19,14 +255,26 @@ class DeckToolApp(tk.Tk):
         self.state('zoomed') # 全画面表示で起動
 
         # --- データ管理 ---
-        self.all_cards_data = [] # すべてのカードデータ (辞書リスト)
+        self.catalog = CardCatalog() # カードデータと検索用インデックス
+        self.all_cards_data = self.catalog.cards # すべてのカードデータ (辞書リスト)
         self.deck = {} # 現在のデッキ {card_name: quantity}
-        self.cards_by_path = {} # パスをキーにしたカードデータの辞書（高速化用）
+        self.cards_by_path = self.catalog.by_path # パスをキーにしたカードデータの辞書（高速化用）
         self.boss_card_path = None # BOSSカードのファイルパスを保持
         self.all_params = [] # すべての特徴リスト
         self.renderer = CardRenderer() # レンダラーのインスタンスを作成
         self.renderer_config = {} # 描画設定を保持
         self.drag_data = None # ドラッグ＆ドロップ用のデータ保持
+        self._deck_rows = {} # デッキリストの行 {path: {iid, qty, rank, values, ...}}
+        self._deck_order = [] # デッキリストの並び [(順位, path)] (Treeviewの行順と一致)
+        self.deck_totals = {'count': 0, 'colors': Counter(), 'costs': Counter()} # デッキの集計値 (差分で更新)
+        self._print_job = None # 実行中の印刷ジョブ
+        self.probability_window = None # ドロー確率ウィンドウ (デッキ変更時に再計算させる)
+        self._card_loading = False # カードをバックグラウンドで読込中か
+        self._load_generation = 0 # 再読込のたびに増やし、古い読込スレッドを打ち切る
+        self._search_after_id = None # 入力待ち中の検索のafter ID
+        self._last_load_refresh = 0.0 # 読込中に最後に検索結果を更新した時刻 (time.monotonic)
+        self._search_keep_scroll = False # 最後にワーカーに渡した検索がスクロール位置を保つものか
+        self.search_worker = LatestOnlyWorker(self, lambda result: self._apply_search_result(*result)) # 最新の検索だけを実行するワーカー
 
         # --- 絞り込み用変数 ---
         self.search_var = tk.StringVar()
@@ -38,13 +286,31 @@ class DeckToolApp(tk.Tk):
         self.cost_max_var = tk.StringVar()
         self.pow_min_var = tk.StringVar()
         self.pow_max_var = tk.StringVar()
+        self.sort_mode_var = tk.StringVar(value=SORT_MODE_DEFAULT)
 
         # --- 初期化処理 ---
         self.load_all_params() # カードより先に特徴リストを読み込む
         self.renderer_config = utils.load_config() # 共通関数で描画設定を読み込む
+        self.thumbnail_service = ThumbnailService(self.renderer, self.renderer_config) # サムネイルの非同期生成
         # --- UI ---
         self.create_widgets()
+        self._bind_live_search()
         self.load_all_cards()
+        self._poll_thumbnails()
+
+    def _bind_live_search(self):
+        """検索バーの入力や絞り込み条件が変わったら自動で検索する"""
+        filter_vars = [self.search_var, self.color_mode_var, self.param_var, self.card_type_var,
+                       self.cost_min_var, self.cost_max_var, self.pow_min_var, self.pow_max_var, self.sort_mode_var]
+        for var in filter_vars + list(self.color_vars.values()):
+            var.trace_add("write", self.schedule_search)
+
+    def _poll_thumbnails(self):
+        """生成が完了したサムネイルを定期的に受け取り、表示中の行に反映する"""
+        ready_paths = self.thumbnail_service.poll()
+        if ready_paths:
+            self.card_list.refresh_thumbnails(ready_paths)
+        self.after(50, self._poll_thumbnails)
 
     def _get_image_path_for_card(self, card_data):
         """カードデータから正しい画像パスを生成する"""
@@ -75,11 +341,23 @@ class DeckToolApp(tk.Tk):
         deck_button_frame.pack(fill=tk.X, padx=5, pady=5)
         tk.Button(deck_button_frame, text="デッキ保存", command=self.save_deck).pack(side=tk.LEFT)
         tk.Button(deck_button_frame, text="デッキ読込", command=self.load_deck).pack(side=tk.LEFT, padx=5)
+        tk.Button(deck_button_frame, text="テキスト", command=self.open_decklist_window).pack(side=tk.LEFT)
         tk.Button(deck_button_frame, text="Clear Deck", command=self.clear_deck).pack(side=tk.LEFT, padx=5)
 
+        # デッキ分析ツールのボタン
+        analysis_button_frame = tk.Frame(deck_frame)
+        analysis_button_frame.pack(fill=tk.X, padx=5)
+        tk.Label(analysis_button_frame, text="分析:").pack(side=tk.LEFT)
+        tk.Button(analysis_button_frame, text="ドロー確率", command=self.open_probability_window).pack(side=tk.LEFT, padx=5)
+        tk.Button(analysis_button_frame, text="1人回し", command=self.open_goldfish_window).pack(side=tk.LEFT)
+        tk.Button(analysis_button_frame, text="自動構築", command=self.open_optimizer_window).pack(side=tk.LEFT, padx=5)
+        tk.Button(analysis_button_frame, text="一括集計", command=self.open_archive_window).pack(side=tk.LEFT)
+
         # デッキ枚数表示
         self.deck_count_var = tk.StringVar(value="Total: 0 cards")
         tk.Label(deck_frame, textvariable=self.deck_count_var, anchor='e').pack(fill=tk.X, padx=5)
+        self.deck_breakdown_var = tk.StringVar(value="")
+        tk.Label(deck_frame, textvariable=self.deck_breakdown_var, anchor='e', fg="gray").pack(fill=tk.X, padx=5)
 
         # デッキリスト表示 (Treeview)
         self.deck_tree = ttk.Treeview(deck_frame, columns=("qty", "cost", "color", "type", "name", "path"), show="headings")
@@ -130,6 +408,10 @@ class DeckToolApp(tk.Tk):
 
         tk.Button(search_bar_frame, text="Reload Cards", command=self.load_all_cards).pack(side=tk.RIGHT)
 
+        # 検索件数・クエリエラーの表示
+        self.search_status_var = tk.StringVar(value="")
+        tk.Label(search_frame, textvariable=self.search_status_var, anchor='w', fg="gray").pack(fill=tk.X, padx=5)
+
         # --- 中段: 詳細検索フィルター ---
         filter_frame = ttk.LabelFrame(search_frame, text="詳細検索")
         filter_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -177,16 +459,22 @@ class DeckToolApp(tk.Tk):
         # フィルター操作ボタン
         filter_button_frame = tk.Frame(filter_frame)
         filter_button_frame.pack(fill=tk.X, pady=5)
+        tk.Label(filter_button_frame, text="並び順:", width=8).pack(side=tk.LEFT)
+        sort_combo = ttk.Combobox(filter_button_frame, textvariable=self.sort_mode_var, values=list(SORT_MODES), state="readonly", width=18)
+        sort_combo.pack(side=tk.LEFT)
         tk.Button(filter_button_frame, text="絞り込みリセット", command=self.reset_filters).pack(side=tk.RIGHT)
         tk.Button(filter_button_frame, text="絞り込み実行", command=self.perform_search).pack(side=tk.RIGHT, padx=5)
 
-        # --- 下段: 検索結果リスト ---
-        # TreeviewからCanvasベースのカスタムリストに変更
-        self.create_card_list_widgets(search_frame)
-
         # 属性色用のスタイルを定義
         self.color_styles = {"赤": "#FFEBEE", "青": "#E3F2FD", "緑": "#E8F5E9", "黄": "#FFFDE7", "紫": "#F3E5F5", "無": "#FAFAFA"}
-        
+
+        # --- 下段: 検索結果リスト ---
+        # 表示領域分の行だけを作成して使い回す仮想スクロールリスト
+        self.card_list = VirtualCardList(search_frame, self.color_styles, self.get_qty_in_deck, self.adjust_deck_qty, self.show_card_image,
+                                         self.start_drag, self.do_drag, self.end_drag, self.show_card_list_menu,
+                                         thumbnail_service=self.thumbnail_service)
+        self.card_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
     def load_all_params(self):
         """ params.jsonから特徴リストを読み込む """
         try:
@@ -196,61 +484,80 @@ class DeckToolApp(tk.Tk):
             self.all_params = []
             # UCG_Createrが未起動の場合もあるので、ここではスキャンはしない
 
-    def create_card_list_widgets(self, parent):
-        """カード検索結果を表示するためのカスタムリストウィジェットを作成"""
-        list_container = tk.Frame(parent)
-        list_container.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-
-        # インスタンス変数としてcanvasを保持
-        self.card_list_canvas = tk.Canvas(list_container)
-        scrollbar = ttk.Scrollbar(list_container, orient="vertical", command=self.card_list_canvas.yview)
-        self.scrollable_frame = tk.Frame(self.card_list_canvas)
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.card_list_canvas.configure(scrollregion=self.card_list_canvas.bbox("all"))
-        )
-
-        # Canvas内にFrameを配置し、そのIDを取得
-        canvas_window_id = self.card_list_canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.card_list_canvas.configure(yscrollcommand=scrollbar.set)
-
-        self.card_list_canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-
-        # Canvasのサイズが変更されたときに、中のFrameの幅も追従させる
-        def on_canvas_configure(event):
-            self.card_list_canvas.itemconfig(canvas_window_id, width=event.width)
-        self.card_list_canvas.bind("<Configure>", on_canvas_configure)
-
     def load_all_cards(self):
-        """ 'datas' ディレクトリからすべてのカードJSONを読み込み、検索用キャッシュを作成する """
-        self.all_cards_data = []
-        self.cards_by_path = {} # 初期化
+        """
+        'datas' ディレクトリからすべてのカードJSONをバックグラウンドで読み込む。
+        読み込んだ分から順にカタログへ登録するので、読込中でも読み込み済みのカードを検索できる。
+        """
+        self.catalog.clear() # all_cards_data / cards_by_path はカタログの中身を参照している
+        self._load_generation += 1 # 実行中の読込があれば打ち切らせる
         if not os.path.exists(const.DATA_DIR):
+            self._card_loading = False
             messagebox.showwarning("Warning", f"Card data directory not found:\n{const.DATA_DIR}")
             return
 
+        self._card_loading = True
+        load_queue = queue.Queue()
+        threading.Thread(target=self._card_loader, args=(self._load_generation, load_queue), daemon=True).start()
+        self.perform_search()
+        self.after(self.CARD_LOAD_POLL_MS, self._poll_card_loading, self._load_generation, load_queue)
+
+    def _card_loader(self, generation, load_queue):
+        """カードJSONを読み込み、一定枚数ごとにキューへ渡す (ワーカースレッドで実行)"""
+        batch = []
         for root, _, files in os.walk(const.DATA_DIR):
-            for filename in files:
+            for filename in sorted(files):
                 if not filename.endswith(".json"): continue
+                if generation != self._load_generation: return # 再読込が始まった
                 filepath = os.path.join(root, filename)
                 try:
                     with open(filepath, 'r', encoding='utf-8') as f:
                         data = json.load(f)
                     data['__filepath'] = filepath
                     data['_search_text'] = self._create_search_cache(data) # 検索用キャッシュを作成
-                    self.all_cards_data.append(data)
-                    self.cards_by_path[filepath] = data
+                    batch.append(data)
                 except Exception as e:
                     print(f"Error loading {filename}: {e}")
-
-        self.all_cards_data.sort(key=lambda x: x.get('name', ''))
-        self.perform_search()
-        NonModalInfo(self, "読込完了", f"{len(self.all_cards_data)} 枚のカードを読み込みました。")
+                if len(batch) >= self.CARD_LOAD_BATCH:
+                    load_queue.put(batch)
+                    batch = []
+        load_queue.put(batch)
+        load_queue.put(None) # 読込完了
+
+    def _poll_card_loading(self, generation, load_queue):
+        """読込スレッドから届いたカードをカタログに登録し、検索結果とデッキリストに反映する"""
+        if generation != self._load_generation:
+            return
+        finished = False
+        added = False
+        while True:
+            try:
+                batch = load_queue.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                finished = True
+                break
+            self.catalog.add_cards(batch)
+            added = True
+
+        if finished:
+            self._card_loading = False
+        now = time.monotonic()
+        if finished or (added and (now - self._last_load_refresh) * 1000 >= self.CARD_LOAD_REFRESH_MS):
+            # 届いたバッチはまとめて再検索する。入力待ちの検索があればそちらに任せる
+            self._last_load_refresh = now
+            if not self._search_after_id:
+                self._submit_search(keep_scroll=True)
+            if self._deck_rows:
+                self._refresh_deck_rows()
+        if finished:
+            NonModalInfo(self, "読込完了", f"{len(self.all_cards_data)} 枚のカードを読み込みました。")
+        else:
+            self.after(self.CARD_LOAD_POLL_MS, self._poll_card_loading, generation, load_queue)
 
     def _create_search_cache(self, card_data):
-        """カードデータから検索用のキャッシュ文字列を生成する"""
+        """カードデータから検索用のキャッシュ文字列を生成する (正規化済み)"""
         searchable_text = [
             card_data.get('name', ''),
             card_data.get('card_type', '')
@@ -264,7 +571,8 @@ class DeckToolApp(tk.Tk):
             for effect in effects:
                 searchable_text.append(effect.get('text', ''))
         
-        return " ".join(searchable_text).lower()
+        # 項目ごとに正規化し、項目をまたいだ誤ヒットを防ぐため改行で連結する
+        return "\n".join(utils.normalize_search_text(t) for t in searchable_text)
 
     def reload_all_cards(self):
         """ 'datas' ディレクトリからすべてのカードJSONを読み込む """
@@ -315,228 +623,106 @@ class DeckToolApp(tk.Tk):
         self.pow_max_var.set("")
         self.perform_search()
 
-    def perform_search(self, *args):
-        """ 検索クエリに基づいてカードをフィルタリングし、結果リストを更新 """
-        # 検索実行前にスクロールを一番上に戻す
-        self.card_list_canvas.yview_moveto(0)
-
-        # 既存のウィジェットをクリア
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-
-
-        # --- フィルター条件の取得 ---
-        query = self.search_var.get().lower().strip()
-        selected_colors = [c for c, v in self.color_vars.items() if v.get()]
-        color_mode = self.color_mode_var.get()
-        selected_param = self.param_var.get()
-        selected_type = self.card_type_var.get()
-        
-        try: cost_min = int(self.cost_min_var.get()) if self.cost_min_var.get() else None
-        except ValueError: cost_min = None
-        try: cost_max = int(self.cost_max_var.get()) if self.cost_max_var.get() else None
-        except ValueError: cost_max = None
-        try: pow_min = int(self.pow_min_var.get()) if self.pow_min_var.get() else None
-        except ValueError: pow_min = None
-        try: pow_max = int(self.pow_max_var.get()) if self.pow_max_var.get() else None
-        except ValueError: pow_max = None
-
-        # --- フィルタリング実行 ---
-        filtered_cards = []
-        for card in self.all_cards_data:
-            card_type = card.get('card_type', '')
-
-            # 0. BOSSカードの特別扱い
-            if selected_type == const.CARD_TYPE_BOSS:
-                # BOSSで絞り込んだ場合、BOSSのみを対象とする
-                if card_type != const.CARD_TYPE_BOSS:
-                    continue
-            else:
-                # それ以外の場合、BOSSは除外する
-                if card_type == const.CARD_TYPE_BOSS:
-                    continue
-
-            # 1. フリーワード検索
-            if query:
-                # キャッシュされた検索テキストに対して検索を実行
-                if query not in card.get('_search_text', ''):
-                    continue
-
-            # 2. 属性フィルター
-            if selected_colors:
-                card_colors = card.get('color', {})
-                if color_mode == "AND":
-                    if not all(card_colors.get(c, 0) > 0 for c in selected_colors):
-                        continue
-                else: # OR
-                    if not any(card_colors.get(c, 0) > 0 for c in selected_colors):
-                        continue
-            
-            # 3. 特徴フィルター
-            if selected_param and selected_param not in card.get('param', []):
-                continue
-
-            # 4. カードタイプフィルター
-            if selected_type and selected_type != "(すべて)" and card_type != selected_type:
-                continue
-
-            # 5. コストフィルター
-            card_cost = card.get('cost', 0)
-            if cost_min is not None and card_cost < cost_min:
-                continue
-            if cost_max is not None and card_cost > cost_max:
-                continue
-
-            # 6. POWフィルター
-            card_pow_str = card.get('pow', "")
-            if pow_min is not None or pow_max is not None:
-                try:
-                    card_pow = int(card_pow_str)
-                    if pow_min is not None and card_pow < pow_min:
-                        continue
-                    if pow_max is not None and card_pow > pow_max:
-                        continue
-                except (ValueError, TypeError):
-                    # POWが数値でないカードは範囲指定フィルターから除外
-                    continue
-
-            # ソート用の情報を付与して追加
-            sort_info = self.get_sort_keys(card)
-            filtered_cards.append((card, sort_info))
-
-        # --- ソート実行 ---
-        filtered_cards.sort(key=lambda x: x[1])
-
-        # --- 結果をリストに表示 ---
-        for i, (card, _) in enumerate(filtered_cards):
-            row_frame = self.create_card_row(self.scrollable_frame, card, i)
-            card['__widget_ref'] = row_frame # ウィジェットへの参照をカードデータに保存
-            self._bind_scroll_recursive(row_frame) # 作成された各行にスクロールイベントをバインド
-
-    def get_sort_keys(self, card):
-        """ソート用のキーをタプルで返す"""
-        # 1. カードタイプ順
-        type_order_map = {
-            const.CARD_TYPE_CHARACTER: 0,
-            const.CARD_TYPE_SPELLCARD: 1,
-            const.CARD_TYPE_ITEM: 2,
-            const.CARD_TYPE_MOVE: 3,
-            const.CARD_TYPE_TERRITORY: 4,
-        }
-        type_order = type_order_map.get(card.get('card_type', ''), 99)
-
-        # 2. 属性順
-        color_order_map = {name: i for i, name in enumerate(const.COLORS)}
-        active_colors = [k for k, v in card.get('color', {}).items() if v > 0]
-        color_order = color_order_map.get(active_colors[0], 99) if active_colors else 99
-
-        # 3. コスト降順 (マイナスを付けて昇順ソート)
-        cost = -card.get('cost', 0)
-        
-        # 4. POW降順 (マイナスを付けて昇順ソート)
-        try: pow_val = -int(card.get('pow', ''))
-        except (ValueError, TypeError): pow_val = 0 # POWが数値でない場合は0として扱う
-
-        return (type_order, color_order, cost, pow_val)
+    def perform_search(self, *args, keep_scroll=False):
+        """ 検索クエリに基づいてカードをフィルタリングし、結果リストを更新 (その場で実行する) """
+        self._cancel_scheduled_search()
+        plan = self._compile_search_query()
+        if plan is None:
+            return
+        self._apply_search_result(self._execute_search(plan, self.sort_mode_var.get()), keep_scroll=keep_scroll)
+
+    def schedule_search(self, *args):
+        """入力や絞り込みの変更時に呼ばれ、入力が落ち着いてからバックグラウンドで検索する"""
+        if self._search_after_id:
+            self.after_cancel(self._search_after_id)
+        self._search_after_id = self.after(self.SEARCH_DEBOUNCE_MS, self._submit_search)
+
+    def _cancel_scheduled_search(self):
+        """待機中・実行中のバックグラウンド検索を取り消す"""
+        if self._search_after_id:
+            self.after_cancel(self._search_after_id)
+            self._search_after_id = None
+        self.search_worker.discard()
+
+    def _submit_search(self, keep_scroll=False):
+        """
+        最新の検索条件をワーカーに渡す。未着手の古い検索は実行されずに置き換わる。
+        keep_scrollは読込中の追加反映用で、入力による検索が実行中ならそちらに合わせて先頭に戻す。
+        """
+        self._search_after_id = None
+        plan = self._compile_search_query()
+        if plan is None:
+            self.search_worker.discard()
+            return
+        keep_scroll = keep_scroll and (self._search_keep_scroll or not self.search_worker.busy)
+        self._search_keep_scroll = keep_scroll
+        self.search_worker.submit(self._search_task, plan, self.sort_mode_var.get(), keep_scroll)
 
-    def create_card_row(self, parent, card, index):
-        """検索結果の1行分のウィジェットを作成して配置する"""
-        card_name = card.get('name', '')
-        card_type = card.get('card_type', '')
-        active_colors = [k for k, v in card.get('color', {}).items() if v > 0]
-        bg_color = self.color_styles.get(active_colors[0] if active_colors else "無", "#FFFFFF")
+    def _search_task(self, plan, sort_mode, keep_scroll):
+        """ワーカーで実行する検索。結果は (カードデータのリスト, keep_scroll)"""
+        return self._execute_search(plan, sort_mode), keep_scroll
 
-        row_frame = tk.Frame(parent, relief="solid", bd=1, bg=bg_color)
-        row_frame.pack(fill="x", pady=(0, 2))
+    def _compile_search_query(self):
+        """検索バー + 詳細検索ウィジェットのクエリをコンパイルする。構文エラーの場合はNoneを返す。"""
+        try:
+            return compile_query(self._build_query_text())
+        except QueryError as e:
+            self.search_status_var.set(f"クエリエラー: {e}")
+            return None
 
-        # pack_propagate(False) を使うことで、中のウィジェットのサイズに影響されず、
-        # フレーム自体のwidth指定が有効になります。
+    def _execute_search(self, plan, sort_mode):
+        """カタログに対して検索とソートを行い、カードデータのリストを返す (ワーカースレッドからも呼ばれる)"""
+        catalog = self.catalog
+        with catalog.lock: # 読込中のカード追加と重ならないようにする
+            # BOSSカードの特別扱い: typeでBOSSを指定した場合のみ対象とし、それ以外は除外する
+            matched = plan.run(catalog)
+            if not plan.targets_type(const.CARD_TYPE_BOSS):
+                boss_ids = catalog.lookup("type", utils.normalize_search_text(const.CARD_TYPE_BOSS))
+                matched = [i for i in matched if i not in boss_ids]
+            # --- ソート実行 (読込時に計算済みの並び順を使う) ---
+            return [catalog.cards[i] for i in catalog.sort_indices(matched, sort_mode)]
+
+    def _apply_search_result(self, filtered_cards, keep_scroll=False):
+        """検索結果を件数表示とリストに反映する (リストは表示中の行のうち変わった行だけを更新する)"""
+        status = f"{len(filtered_cards)} 件"
+        if self._card_loading:
+            status += f" (カード読込中... {len(self.catalog)} 枚)"
+        self.search_status_var.set(status)
+
+        # --- 結果をリストに表示 (読込中の追加反映以外は先頭までスクロールを戻す) ---
+        self.card_list.set_items(filtered_cards, keep_scroll=keep_scroll)
+
+    def _build_query_text(self):
+        """検索バーの入力と詳細検索ウィジェットの状態を1つのクエリ文字列にまとめる"""
+        parts = [self.search_var.get()]
 
-        # --- 左側: デッキ操作エリア ---
-        control_frame = tk.Frame(row_frame, width=110, bg=bg_color)
-        control_frame.pack_propagate(False) # 幅を110pxに固定
-        control_frame.pack(side="left", fill="y", padx=5, pady=5)
-        
-        qty_in_deck = self.deck.get(card.get('__filepath'), 0) if card_type != const.CARD_TYPE_BOSS else (1 if self.boss_card_path == card.get('__filepath') else 0)
-        # ラベルに一意な名前を付けて、後でアクセスできるようにする
-        qty_label = tk.Label(control_frame, text=f"{qty_in_deck}枚" if qty_in_deck > 0 else "", font=("", 10, "bold"), width=5, bg=bg_color)
-        row_frame.qty_label = qty_label # フレームオブジェクトにラベルへの参照を保持させる
-        qty_label.pack(side="left")
-
-        minus_btn = tk.Button(control_frame, text="－", command=lambda c=card: self.adjust_deck_qty(c, -1), width=2)
-        # packの順序を調整して中央に寄せる
-        minus_btn.pack(side="left", padx=(5,2))
-        plus_btn = tk.Button(control_frame, text="＋", command=lambda c=card: self.adjust_deck_qty(c, 1), width=2)
-        plus_btn.pack(side="left")
+        selected_colors = [c for c, v in self.color_vars.items() if v.get()]
+        if selected_colors:
+            if self.color_mode_var.get() == "AND":
+                parts.extend(f"color:{c}" for c in selected_colors)
+            else: # OR
+                parts.append("color:" + "|".join(selected_colors))
 
-        # --- 右側: カード情報エリア ---
-        info_frame = tk.Frame(row_frame, bg=bg_color)
-        info_frame.pack(side="left", fill="both", expand=True, pady=5)
+        if self.param_var.get():
+            parts.append(f'param:"{self.param_var.get()}"')
 
-        # 1行目: 名前、コスト、POW、タイプ、属性
-        top_info = tk.Frame(info_frame, bg=bg_color)
-        top_info.pack(fill="x")
-        
-        # 右寄せ用のフレーム
-        right_aligned_frame = tk.Frame(top_info, bg=bg_color)
-        right_aligned_frame.pack(side="right")
+        selected_type = self.card_type_var.get()
+        if selected_type and selected_type != "(すべて)":
+            parts.append(f"type:{selected_type}")
 
-        # 左寄せの要素 (カード名)
-        tk.Label(top_info, text=card_name, font=("", 11, "bold"), anchor="w", bg=bg_color).pack(side="left")
-        
-        # 右寄せの要素 (属性、タイプ、Cost, POW)
-        tk.Label(right_aligned_frame, text="／".join(active_colors) or "無", anchor="e", bg=bg_color).pack(side="right", padx=5)
-        tk.Label(right_aligned_frame, text=card_type, width=8, anchor="e", bg=bg_color).pack(side="right", padx=5)
-        if card.get('pow'): 
-            tk.Label(right_aligned_frame, text=f"POW: {card.get('pow')}", anchor="e", bg=bg_color).pack(side="right", padx=5)
-        if card.get('cost') is not None:
-            tk.Label(right_aligned_frame, text=f"Cost: {card.get('cost', 0)}", anchor="e", bg=bg_color).pack(side="right", padx=5)
+        # 数値でない入力は従来どおり無視する
+        for field, var, op in (("cost", self.cost_min_var, ">="), ("cost", self.cost_max_var, "<="),
+                               ("pow", self.pow_min_var, ">="), ("pow", self.pow_max_var, "<=")):
+            try: parts.append(f"{field}{op}{int(var.get())}")
+            except ValueError: pass
 
+        return " ".join(p for p in parts if p)
 
-        # 2行目: 特徴
-        params = " ".join(card.get('param', []))
-        if params:
-            tk.Label(info_frame, text=f"特徴: {params}", font=("", 9), anchor="w", justify="left", bg=bg_color).pack(fill="x")
-
-        # 3行目: 効果
-        effects_list = card.get('effe', [])
-        # 各効果テキストを改行で連結し、テキスト内の改行も維持する
-        # これにより、複数行で表示されるようになる
-        # さらに、句点「。」の後にも改行を追加する
-        effects_text = "\n".join([e.get('text', '').replace('。', '。\n') for e in effects_list if e.get('text')])
-
-        if effects_text:
-            effect_frame = tk.Frame(info_frame, bg=bg_color)
-            effect_frame.pack(fill="x")
-
-            # 画像表示ボタン
-            img_button = tk.Button(effect_frame, text="🖼️", command=lambda c=card: self.show_card_image(c))
-            img_button.pack(side="right", padx=5)
-
-            # 全角40文字相当のピクセル幅を計算して折り返し幅とする
-            # フォントオブジェクトを作成して、'Ｍ'（全角文字の代表）45文字分の幅を測定
-            font_obj = Font(family="TkDefaultFont", size=9) # デフォルトフォントとサイズを指定
-            wrap_width = font_obj.measure('Ｍ' * 30) # 全角30文字分に調整
-
-            # ラベルのテキストの先頭に "効果: " を追加
-            tk.Label(effect_frame, text=f"効果: {effects_text}", font=font_obj, anchor="w", justify="left", wraplength=wrap_width, bg=bg_color).pack(side="left", fill="x")
-
-        # row_frame全体にドラッグイベントを再帰的にバインド
-        self.bind_drag_events(row_frame, card)
-
-        return row_frame # バインド用にフレームを返す
-
-    def bind_drag_events(self, widget, card_data):
-        """ウィジェットにドラッグ＆ドロップイベントを再帰的にバインドする"""
-        widget.bind("<ButtonPress-1>", lambda e, c=card_data: self.start_drag(e, c))
-        widget.bind("<B1-Motion>", self.do_drag)
-        widget.bind("<ButtonRelease-1>", self.end_drag)
-        widget.bind("<Button-3>", lambda e, c=card_data: self.show_card_list_menu(e, c)) # 右クリックメニュー
-        for child in widget.winfo_children():
-            # ボタンなど、既にクリックイベントが設定されているウィジェットは除外
-            if isinstance(child, (tk.Button, ttk.Button)):
-                continue
-            self.bind_drag_events(child, card_data)
+    def get_qty_in_deck(self, card):
+        """カードのデッキ内の枚数を返す (BOSSはスロットに設定されていれば1)"""
+        if card.get('card_type', '') == const.CARD_TYPE_BOSS:
+            return 1 if self.boss_card_path == card.get('__filepath') else 0
+        return self.deck.get(card.get('__filepath'), 0)
 
     def start_drag(self, event, card_data):
         """カード検索リストからのドラッグ開始"""
@@ -562,18 +748,6 @@ class DeckToolApp(tk.Tk):
         event.widget.config(cursor="")
         self.drag_data = None
 
-    def _on_mousewheel(self, event):
-        """マウスホイールイベントを処理してCanvasをスクロールする"""
-        # Windows/macOS
-        scroll_val = -1 * (event.delta // 120)
-        self.card_list_canvas.yview_scroll(scroll_val, "units")
-
-    def _bind_scroll_recursive(self, widget):
-        """指定されたウィジェットとその子孫に再帰的にスクロールイベントをバインドする"""
-        widget.bind("<MouseWheel>", self._on_mousewheel)
-        for child in widget.winfo_children():
-            self._bind_scroll_recursive(child)
-
     def _get_or_create_card_image(self, card_data):
         """
         カード画像のパスを取得する。存在しない場合は生成を試みる。
@@ -622,7 +796,7 @@ class DeckToolApp(tk.Tk):
         
         item_values = self.deck_tree.item(selection[0])['values']
         card_path = item_values[5] # 6番目のカラム(path)からパスを取得
-        card_data = next((c for c in self.all_cards_data if c.get('__filepath') == card_path), None)
+        card_data = self.cards_by_path.get(card_path)
         
         if card_data:
             self.show_card_image(card_data)
@@ -630,7 +804,7 @@ class DeckToolApp(tk.Tk):
     def show_boss_card_image(self, event=None):
         """BOSSスロットのカード画像を表示する"""
         if not self.boss_card_path: return
-        card_data = next((c for c in self.all_cards_data if c.get('__filepath') == self.boss_card_path), None)
+        card_data = self.cards_by_path.get(self.boss_card_path)
         if card_data: self.show_card_image(card_data)
         
     def adjust_deck_qty(self, card_data, amount):
@@ -660,7 +834,7 @@ class DeckToolApp(tk.Tk):
         new_qty = current_qty + amount
 
         # 4枚の上限チェック (警告なし)
-        if new_qty > 4:
+        if new_qty > const.MAX_COPIES:
             # 5枚以上になろうとした場合は何もしない
             return
 
@@ -717,35 +891,17 @@ class DeckToolApp(tk.Tk):
         self.update_deck_view()
 
     def update_deck_view(self, update_search_list=False, updated_card_path=None):
-        """ デッキリストの表示を更新 """
-        # Treeviewをクリア
-        for item in self.deck_tree.get_children():
-            self.deck_tree.delete(item)
-
-        # デッキの内容をソートして表示
-        # この時点での合計枚数を保持
-        total_cards = sum(self.deck.values())
-        
-        # パスからカード名を取得してソート
-        deck_with_names = []
-        for path, qty in self.deck.items(): # self.deckは {path: qty}
-            card_data = self.cards_by_path.get(path) # 高速化したルックアップ
-            if card_data:
-                card_name = card_data.get('name', 'Unknown')
-                cost = card_data.get('cost', '')
-                card_type = card_data.get('card_type', '')
-                active_colors = [k for k, v in card_data.get('color', {}).items() if v > 0]
-                color_str = "／".join(active_colors) or "無"
-                sort_keys = self.get_sort_keys(card_data) # ソートキーを取得
-                deck_with_names.append({'name': card_name, 'qty': qty, 'path': path, 'cost': cost, 'color': color_str, 'type': card_type, 'sort_keys': sort_keys})
-            else:
-                # データが見つからない場合（念のため）
-                deck_with_names.append({'name': 'Unknown', 'qty': qty, 'path': path, 'cost': '', 'color': '', 'type': '', 'sort_keys': (99,99,0,0)})
-        
-        for item in sorted(deck_with_names, key=lambda x: x['sort_keys']):
-            self.deck_tree.insert("", tk.END, values=(item['qty'], item['cost'], item['color'], item['type'], item['name'], item['path']))
-
-        self.deck_count_var.set(f"Total: {total_cards} cards")
+        """ デッキリストの表示を更新 (変更のあったカードの行だけを差分更新する) """
+        if updated_card_path:
+            self._apply_deck_change(updated_card_path)
+        else:
+            # デッキ読込・クリア時など: 現在の行とデッキ内容を突き合わせる
+            for path in list(self._deck_rows):
+                if path not in self.deck:
+                    self._apply_deck_change(path)
+            for path in self.deck:
+                self._apply_deck_change(path)
+        self._update_deck_totals_label()
 
         # BOSSスロットの表示を更新
         if self.boss_card_path:
@@ -754,22 +910,146 @@ class DeckToolApp(tk.Tk):
         else:
             self.boss_label_var.set("(None)")
 
-        # 検索結果リストの枚数表示が変更された可能性があるため、再描画
+        # 検索結果リストの枚数表示が変更された可能性があるため、表示中の行だけ更新する
         if update_search_list and updated_card_path:
-            # 全面再描画ではなく、該当カードのラベルのみを更新する
             card_data = self.cards_by_path.get(updated_card_path)
-            if card_data and '__widget_ref' in card_data:
-                widget = card_data['__widget_ref']
-                try:
-                    # ウィジェットに保持させた参照を使って直接ラベルを更新
-                    if widget.winfo_exists() and hasattr(widget, 'qty_label'):
-                        new_qty = self.deck.get(updated_card_path, 0)
-                        widget.qty_label.config(text=f"{new_qty}枚" if new_qty > 0 else "")
-                except (IndexError, AttributeError):
-                    # ウィジェットの構造が予期しない、または破棄済みの場合
-                    pass
-        elif update_search_list: # パス指定がない場合は全検索結果を更新
-            self.perform_search()
+            if card_data:
+                self.card_list.refresh_card(card_data)
+        else: # パス指定がない場合(BOSSの入れ替え等)は表示中の全行を更新
+            self.card_list.refresh_visible()
+
+        if self.probability_window is not None and self.probability_window.winfo_exists():
+            self.probability_window.refresh()
+
+    def get_deck_cards(self):
+        """BOSSを除くデッキの内容を [(カードデータ, 枚数)] で返す"""
+        return [(self.cards_by_path[path], qty) for path, qty in self.deck.items() if path in self.cards_by_path]
+
+    def open_probability_window(self):
+        """ドロー確率ウィンドウを開く (開いている場合は前面に出す)"""
+        if self.probability_window is not None and self.probability_window.winfo_exists():
+            self.probability_window.lift()
+            return
+        self.probability_window = DrawProbabilityWindow(self, self.get_deck_cards, self.all_params)
+
+    def open_goldfish_window(self):
+        """1人回しシミュレーションウィンドウを開く"""
+        GoldfishWindow(self, self.get_deck_cards)
+
+    def open_optimizer_window(self):
+        """デッキ自動構築ウィンドウを開く (候補は現在の検索結果のカード)"""
+        pool_getter = lambda: [card for card in self.card_list.items if card.get('card_type') != const.CARD_TYPE_BOSS]
+        OptimizerWindow(self, pool_getter, self.get_deck_cards, self.all_params, self.apply_optimized_deck)
+
+    def open_archive_window(self):
+        """デッキファイルの一括集計ウィンドウを開く"""
+        if self._card_loading:
+            NonModalInfo(self, "情報", "カードデータを読み込み中です。読込完了後に実行してください。")
+            return
+        DeckArchiveWindow(self, self.catalog)
+
+    def open_decklist_window(self):
+        """テキスト形式のデッキリストの読込・書き出しウィンドウを開く"""
+        if self._card_loading:
+            NonModalInfo(self, "情報", "カードデータを読み込み中です。読込完了後に実行してください。")
+            return
+        DecklistTextWindow(self, self.catalog, self.export_decklist_text, self.apply_decklist)
+
+    def export_decklist_text(self):
+        """現在のデッキをデッキリストと同じ並び順のテキストにする"""
+        boss_card = self.cards_by_path.get(self.boss_card_path) if self.boss_card_path else None
+        deck_cards = [(self.cards_by_path[path], self.deck[path]) for _, path in self._deck_order
+                      if path in self.cards_by_path and path in self.deck]
+        return decklist.format_decklist(boss_card, deck_cards)
+
+    def apply_decklist(self, boss_card, deck_cards):
+        """テキストから読み込んだ内容でデッキとBOSSスロットを置き換える"""
+        if (self.deck or self.boss_card_path) and not messagebox.askyesno("確認", "現在のデッキはクリアされます。読み込みますか？"):
+            return
+        self.boss_card_path = boss_card['__filepath'] if boss_card else None
+        self.deck = {card['__filepath']: qty for card, qty in deck_cards}
+        self.update_deck_view(update_search_list=True)
+        NonModalInfo(self, "読込完了", f"{sum(qty for _, qty in deck_cards)} 枚のデッキを読み込みました。")
+
+    def apply_optimized_deck(self, deck_cards):
+        """自動構築の結果でデッキを置き換える (BOSSスロットはそのまま)"""
+        if self.deck and not messagebox.askyesno("確認", "現在のデッキを自動構築の結果で置き換えますか？"):
+            return
+        self.deck = {card['__filepath']: qty for card, qty in deck_cards}
+        self.update_deck_view(update_search_list=True)
+
+    def _make_deck_row(self, path):
+        """デッキリスト1行分の表示値・ソート順位・集計用の値を計算する (カードごとに一度だけ)"""
+        card_data = self.cards_by_path.get(path)
+        if not card_data:
+            # データが見つからない場合（念のため）
+            return {'qty': 0, 'iid': None, 'rank': len(self.catalog), 'values': ('', '', '', 'Unknown'), 'colors': [], 'cost': None}
+        _, rank = self.catalog.order(SORT_MODE_DEFAULT) # 読込時に計算済みの順位
+        active_colors = [k for k, v in card_data.get('color', {}).items() if v > 0]
+        cost = card_data.get('cost', '')
+        values = (cost, "／".join(active_colors) or "無", card_data.get('card_type', ''), card_data.get('name', 'Unknown'))
+        return {'qty': 0, 'iid': None, 'rank': rank[self.catalog.index_by_path[path]], 'values': values,
+                'colors': active_colors or ["無"], 'cost': cost}
+
+    def _add_to_totals(self, row, delta):
+        """デッキの集計値 (合計枚数・属性別・コスト別) に枚数の増減を反映する"""
+        self.deck_totals['count'] += delta
+        for color in row['colors']:
+            self.deck_totals['colors'][color] += delta
+        if row['cost'] is not None:
+            self.deck_totals['costs'][row['cost']] += delta
+
+    def _apply_deck_change(self, path):
+        """1種類のカードの枚数変更をTreeviewと集計値に反映する"""
+        qty = self.deck.get(path, 0)
+        row = self._deck_rows.get(path)
+        old_qty = row['qty'] if row else 0
+        if qty == old_qty:
+            return
+        if row is None:
+            row = self._make_deck_row(path)
+        self._add_to_totals(row, qty - old_qty)
+        order_key = (row['rank'], path)
+
+        if qty <= 0: # 削除
+            self.deck_tree.delete(row['iid'])
+            self._deck_order.remove(order_key)
+            del self._deck_rows[path]
+        elif old_qty == 0: # 挿入 (ソート順を保つ位置に入れる)
+            position = bisect.bisect(self._deck_order, order_key)
+            self._deck_order.insert(position, order_key)
+            row['iid'] = self.deck_tree.insert("", position, values=(qty, *row['values'], path))
+            self._deck_rows[path] = row
+        else: # 枚数のみ更新
+            self.deck_tree.set(row['iid'], "qty", qty)
+        row['qty'] = qty
+
+    def _refresh_deck_rows(self):
+        """カード再読込後に、デッキリストの表示値と並び順を再計算して必要な行だけ移動する"""
+        self.deck_totals = {'count': 0, 'colors': Counter(), 'costs': Counter()}
+        self._deck_order = []
+        for path, old_row in self._deck_rows.items():
+            row = self._make_deck_row(path)
+            row['iid'], row['qty'] = old_row['iid'], old_row['qty']
+            self._deck_rows[path] = row
+            self._add_to_totals(row, row['qty'])
+            self._deck_order.append((row['rank'], path))
+            if row['values'] != old_row['values']:
+                self.deck_tree.item(row['iid'], values=(row['qty'], *row['values'], path))
+        self._deck_order.sort()
+        for position, (_, path) in enumerate(self._deck_order):
+            iid = self._deck_rows[path]['iid']
+            if self.deck_tree.index(iid) != position:
+                self.deck_tree.move(iid, "", position)
+        self._update_deck_totals_label()
+
+    def _update_deck_totals_label(self):
+        """集計値からデッキ枚数の表示を更新する"""
+        totals = self.deck_totals
+        self.deck_count_var.set(f"Total: {totals['count']} cards")
+        colors = " ".join(f"{c}{totals['colors'][c]}" for c in const.COLORS + ["無"] if totals['colors'][c] > 0)
+        costs = " ".join(f"{c}:{n}" for c, n in sorted(totals['costs'].items(), key=lambda x: str(x[0])) if n > 0)
+        self.deck_breakdown_var.set(f"属性 {colors or '-'}   コスト {costs or '-'}")
 
     def show_deck_menu(self, event):
         """ デッキリストの右クリックメニューを表示 """
@@ -802,20 +1082,38 @@ class DeckToolApp(tk.Tk):
         if not filepath:
             return
 
-        deck_data = {
-            "boss": self.boss_card_path,
-            "deck": self.deck
-        }
+        # どの環境でも読み込めるように、パスではなくカードIDで保存する
+        boss_ref = self._card_ref(self.boss_card_path) if self.boss_card_path else None
+        deck_refs = {self._card_ref(path): qty for path, qty in self.deck.items()}
 
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(deck_data, f, ensure_ascii=False, indent=4)
+            write_deck_file(filepath, boss_ref, deck_refs)
             NonModalInfo(self, "保存完了", f"デッキを保存しました:\n{os.path.basename(filepath)}")
         except Exception as e:
             messagebox.showerror("保存エラー", f"デッキの保存中にエラーが発生しました:\n{e}")
 
+    def _card_ref(self, path):
+        """
+        デッキファイルに保存するカード参照 (カードID) を返す。
+        カタログにないカードや、IDが他のカードと重複しているカードは (読み込み時に別のカードにならないよう) パスのまま返す。
+        """
+        card_data = self.cards_by_path.get(path)
+        if card_data and self.catalog.by_id.get(card_data['__id']) is card_data:
+            return card_data['__id']
+        return path
+
+    def _warn_unresolved_cards(self, unresolved):
+        """デッキファイル内の見つからなかったカード参照をまとめて通知する"""
+        if not unresolved:
+            return
+        listed = "\n".join(unresolved[:10]) + (f"\n...他 {len(unresolved) - 10} 件" if len(unresolved) > 10 else "")
+        messagebox.showwarning("警告", f"{len(unresolved)} 件のカードが見つからなかったため除外しました:\n{listed}")
+
     def load_deck(self):
-        """ .ucgdeckファイルからデッキ構成を読み込む """
+        """ .ucgdeckファイルからデッキ構成を読み込む (カードID形式と旧形式のパス指定の両方に対応) """
+        if self._card_loading:
+            NonModalInfo(self, "情報", "カードデータを読み込み中です。読込完了後に実行してください。")
+            return
         if self.deck or self.boss_card_path:
             if not messagebox.askyesno("確認", "現在のデッキはクリアされます。新しいデッキを読み込みますか？"):
                 return
@@ -829,21 +1127,30 @@ class DeckToolApp(tk.Tk):
             return
 
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                deck_data = json.load(f)
-            
-            self.boss_card_path = deck_data.get("boss", None)
-            self.deck = deck_data.get("deck", {})
-            # 読み込み後、検索結果リストの枚数表示も更新する
-            self.update_deck_view(update_search_list=True)
-            NonModalInfo(self, "読込完了", f"デッキを読み込みました:\n{os.path.basename(filepath)}")
+            boss_card, deck_cards, unresolved = read_deck_file(filepath, self.catalog)
         except Exception as e:
             messagebox.showerror("読込エラー", f"デッキの読み込み中にエラーが発生しました:\n{e}")
+            return
+
+        self.boss_card_path = boss_card['__filepath'] if boss_card else None
+        self.deck = {card['__filepath']: qty for card, qty in deck_cards}
+        # 読み込み後、検索結果リストの枚数表示も更新する
+        self.update_deck_view(update_search_list=True)
+        self._warn_unresolved_cards(unresolved)
+        NonModalInfo(self, "読込完了", f"デッキを読み込みました:\n{os.path.basename(filepath)}")
 
     def print_deck(self):
         """
         .ucgdeckファイルを選択し、その内容を印刷用のA4画像として出力する。
+        画像の読込・生成、レイアウトの合成、PNGの書き出しはワーカースレッドで行う。
         """
+        if self._print_job is not None:
+            NonModalInfo(self, "情報", "印刷処理を実行中です。")
+            return
+        if self._card_loading:
+            NonModalInfo(self, "情報", "カードデータを読み込み中です。読込完了後に実行してください。")
+            return
+
         # 1. デッキファイルを選択
         filepath = filedialog.askopenfilename(
             title="印刷するデッキを読み込む",
@@ -852,61 +1159,114 @@ class DeckToolApp(tk.Tk):
         if not filepath:
             return
 
-        # 2. デッキデータを読み込み
+        # 2. デッキデータを読み込み、カード参照を解決する
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                deck_data = json.load(f)
+            boss_card, deck_cards, unresolved = read_deck_file(filepath, self.catalog)
         except Exception as e:
             messagebox.showerror("読込エラー", f"デッキファイルの読み込みに失敗しました:\n{e}")
             return
+        self._warn_unresolved_cards(unresolved)
 
-        # 3. カード画像のパスリストを作成
-        card_paths_to_print = []
-        # BOSSカード
-        boss_path = deck_data.get("boss")
-        if boss_path:
-            card_paths_to_print.append(boss_path)
-
-        # デッキカード
-        deck_dict = deck_data.get("deck", {})
-        for path, qty in deck_dict.items():
-            card_paths_to_print.extend([path] * qty)
+        # 3. 印刷するカードデータのリストを作成
+        cards_to_print = [boss_card] if boss_card else []
+        for card_data, qty in deck_cards:
+            cards_to_print.extend([card_data] * qty)
 
-        if not card_paths_to_print:
+        if not cards_to_print:
             NonModalInfo(self, "情報", "デッキにカードがありません。")
             return
 
-        # 4. カード画像の準備（存在しない場合は生成）
-        image_objects = []
-        progress_win = NonModalInfo(self, "処理中", "カード画像を準備しています...", 30000) # タイムアウトを長めに設定
-        self.update()
-
-        for i, card_path in enumerate(card_paths_to_print):
-            progress_win.update_message(f"カード画像を準備中... ({i + 1}/{len(card_paths_to_print)})")
-            self.update_idletasks()
-
-            card_data = self.cards_by_path.get(card_path)
-            if not card_data:
-                print(f"警告: カードデータが見つかりません: {card_path}")
-                continue
-            
-            # 共通化された画像取得/生成関数を呼び出す
-            img = self._get_or_create_card_image(card_data)
-            if img:
-                image_objects.append(img)
-            else:
-                # 画像の取得/生成に失敗した場合は処理を中断
-                progress_win.destroy()
+        # 4. 画像がないカードは実行前にまとめて確認する
+        unique_cards = list({id(card): card for card in cards_to_print}.values())
+        missing = [card for card in unique_cards if not os.path.exists(self._get_image_path_for_card(card))]
+        if missing:
+            names = [utils.get_image_filename_for_card(card) for card in missing]
+            listed = "\n".join(names[:10]) + (f"\n...他 {len(names) - 10} 件" if len(names) > 10 else "")
+            if not messagebox.askyesno("確認", f"画像がないカードが {len(missing)} 種類あります:\n{listed}\n\nまとめて生成して印刷しますか？"):
                 return
 
-        progress_win.destroy()
-
-        # 5. 共通関数を呼び出してレイアウト生成と保存を行う
+        # 5. 保存先を決める (複数ページの場合は 名前(1).png, 名前(2).png ... で保存する)
         # 保存先は読み込んだデッキファイルと同じディレクトリとする
         deck_file_dir = os.path.dirname(filepath)
-        
         base_name = os.path.splitext(os.path.basename(filepath))[0]
-        utils.create_and_save_print_layouts(self, image_objects, initial_filename_base=base_name, initial_dir=deck_file_dir)
+        save_path = filedialog.asksaveasfilename(
+            initialdir=deck_file_dir,
+            title="プリントレイアウトを保存",
+            defaultextension=".png",
+            filetypes=(("PNGファイル", "*.png"),),
+            initialfile=f"{base_name}.png"
+        )
+        if not save_path:
+            return
+
+        # 6. ワーカースレッドで実行し、進捗ウィンドウで経過表示とキャンセルを受け付ける
+        progress_win = JobProgressWindow(self, "デッキ印刷", "カード画像を準備しています...",
+                                         cancel_callback=lambda: self._print_job and self._print_job.cancel())
+
+        def finish():
+            self._print_job = None
+            progress_win.destroy()
+
+        def on_done(saved_paths):
+            finish()
+            NonModalInfo(self, "保存完了", f"{len(saved_paths)} 枚の画像を保存しました。")
+
+        def on_error(e):
+            finish()
+            messagebox.showerror("印刷エラー", f"印刷用画像の作成中にエラーが発生しました:\n{e}")
+
+        def on_cancel():
+            finish()
+            NonModalInfo(self, "キャンセル", "処理を中断しました。")
+
+        self._print_job = run_job(
+            self, lambda job: self._run_print_job(job, cards_to_print, unique_cards, save_path),
+            on_progress=progress_win.update_progress, on_done=on_done, on_error=on_error, on_cancel=on_cancel)
+
+    def _load_card_image_for_print(self, card_data):
+        """
+        印刷用にカード画像を読み込む。画像がなければ描画してcardフォルダに保存する。
+        ダイアログを出さないのでワーカースレッドから呼べる。
+        """
+        image_path = self._get_image_path_for_card(card_data)
+        if not os.path.exists(image_path):
+            name_lines = [line.strip() for line in card_data.get("name", "").split('\n') if line.strip()]
+            card_img = self.renderer.draw_single_card(card_data, card_data.get("card_type", ""), name_lines, self.renderer_config)
+            if not card_img: raise Exception(f"カード画像の生成に失敗しました: {card_data.get('name', '')}")
+            os.makedirs(const.PICTURES_DIR, exist_ok=True)
+            tmp_path = image_path + ".tmp"
+            card_img.save(tmp_path, format="PNG")
+            os.replace(tmp_path, image_path) # サムネイル生成が書きかけのファイルを読まないように置き換える
+            return card_img
+        with Image.open(image_path) as img:
+            return img.convert("RGB")
+
+    def _run_print_job(self, job, cards_to_print, unique_cards, save_path):
+        """印刷ジョブの本体 (ワーカースレッドで実行)。保存したファイルのパスのリストを返す。"""
+        images_by_id = {}
+        total = len(unique_cards)
+        # 同じカードの複数枚は一度だけ読み込み、種類ごとに並列で読込・生成する
+        with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+            futures = {pool.submit(self._load_card_image_for_print, card): card for card in unique_cards}
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    job.check_cancelled()
+                    images_by_id[id(futures[future])] = future.result()
+                    job.report(done, total, f"カード画像を準備中... ({done}/{total})")
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        job.report(0, 1, "レイアウトを作成しています...")
+        image_objects = [images_by_id[id(card)] for card in cards_to_print]
+        pages = utils.compose_print_pages(image_objects, cancel_check=job.check_cancelled)
+
+        page_paths = utils.get_print_page_paths(save_path, len(pages))
+        for page_num, (page, page_path) in enumerate(zip(pages, page_paths), 1):
+            job.check_cancelled()
+            job.report(page_num - 1, len(pages), f"画像を保存中... ({page_num}/{len(pages)})")
+            page.save(page_path)
+        return page_paths
 
 if __name__ == '__main__':
     try:
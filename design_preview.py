@@ -0,0 +1,155 @@
+"""
+デザイン設定の比較用に、複数の設定バリエーション × 見本カードの画像をまとめて描画する。
+
+見本カードは datas/ 内からカードタイプごとに最もテキスト量の多いカードを選ぶ。
+描画結果は (カードの内容のハッシュ, 設定のハッシュ) ごとにキャッシュし、同じ組み合わせは描画し直さない。
+(編集中のカードも比較できるよう、カードIDではなく内容で区別する)
+描画が必要な組み合わせが多い場合はプロセスプールで並列に描画する。
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import art_store
+import constants as const
+import render_pool
+
+PARALLEL_MIN_RENDERS = 8 # これより少ない描画はプールを使わずにその場で行う
+CACHE_LIMIT = 256 # キャッシュするカード画像の最大数
+
+# 比較できる設定項目: (カテゴリ, キー) → 表示名
+VARIANT_KEYS = OrderedDict([
+    (("font_sizes", "effects_body"), "効果テキスト本体のフォントサイズ"),
+    (("font_sizes", "effects_header"), "効果ヘッダーのフォントサイズ"),
+    (("font_sizes", "name_1line"), "カード名 (1行) のフォントサイズ"),
+    (("font_sizes", "name_2line"), "カード名 (2行) のフォントサイズ"),
+    (("font_sizes", "pow_param"), "POW / 特徴のフォントサイズ"),
+    (("font_sizes", "footer"), "フッターのフォントサイズ"),
+    (("layout_options", "effects_max_width_px"), "効果テキストの最大幅 (px)"),
+    (("offsets", "name_y"), "カード名のYオフセット"),
+    (("offsets", "effects_y"), "効果テキストのYオフセット"),
+    (("offsets", "pow_y"), "POWのYオフセット"),
+    (("offsets", "param_y"), "特徴のYオフセット"),
+    (("offsets", "footer_y"), "フッターのYオフセット"),
+])
+
+
+def card_text_length(card):
+    """カード名と効果テキストの文字数の合計"""
+    effects = card.get('effe') or []
+    return len(card.get('name', '')) + sum(len(e.get('text', '')) + len(e.get('type', '')) + len(e.get('place', ''))
+                                           for e in effects if isinstance(e, dict))
+
+
+def load_sample_cards(data_dir=const.DATA_DIR):
+    """datas/ 内から、カードタイプごとに最もテキスト量の多いカードを1枚ずつ選んで返す"""
+    longest = {}
+    for root, _, files in os.walk(data_dir):
+        for filename in files:
+            if not filename.endswith(".json"):
+                continue
+            filepath = os.path.join(root, filename)
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    card = json.load(f)
+            except Exception as e:
+                print(f"Error loading {filepath}: {e}")
+                continue
+            if not isinstance(card, dict):
+                continue
+            card['__filepath'] = filepath
+            card_type = card.get('card_type', '')
+            if card_type not in longest or card_text_length(card) > card_text_length(longest[card_type]):
+                longest[card_type] = card
+    order = {t: i for i, t in enumerate(const.CARD_TYPE_LIST)}
+    return [longest[t] for t in sorted(longest, key=lambda t: order.get(t, len(order)))]
+
+
+def config_hash(config):
+    return hashlib.sha1(json.dumps(config, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def card_hash(card):
+    """
+    描画に関係する内容 (__で始まる管理用の項目を除く) のハッシュ。
+    イラストの画像や templates.json が更新された場合も別のキーになるようにする。
+    """
+    data = {k: v for k, v in card.items() if not k.startswith('__')}
+    if card.get('art'):
+        data['__art'] = art_store.source_signature(card['art'])
+    data['__templates'] = os.path.getmtime(const.TEMPLATES_FILE)
+    return config_hash(data)
+
+
+def make_variant_configs(base_config, key, values):
+    """base_configのkey (カテゴリ, 項目名) をvaluesの各値に置き換えた設定のリストを返す"""
+    category, name = key
+    configs = []
+    for value in values:
+        config = json.loads(json.dumps(base_config))
+        config.setdefault(category, {})[name] = value
+        configs.append(config)
+    return configs
+
+
+def _render_cards(tasks):
+    """[(キャッシュのキー, カードデータ, 設定)] を描画して画像のリストを返す。プロセスプールのワーカーでも実行される。"""
+    renderer = render_pool.worker_renderer()
+    images = []
+    for _, card, config in tasks:
+        name_lines = [line.strip() for line in card.get("name", "").split('\n') if line.strip()]
+        images.append(renderer.draw_single_card(card, card.get("card_type", ""), name_lines, config))
+    return images
+
+
+class VariantRenderCache:
+    """(カードのハッシュ, 設定のハッシュ) → カード画像 のキャッシュを持ち、足りない分だけ描画する"""
+    def __init__(self, limit=CACHE_LIMIT):
+        self.limit = limit
+        self._images = OrderedDict()
+
+    def render_grid(self, cards, configs, report=None, cancel_check=None):
+        """
+        configs × cards の画像を描画し、[設定ごとの [カードごとの画像]] を返す。
+        reportは (完了数, 総数, メッセージ) で、cancel_checkは描画したチャンクごとに呼ばれる。
+        """
+        card_keys = [card_hash(card) for card in cards]
+        config_keys = [config_hash(config) for config in configs]
+        total = len(cards) * len(configs)
+
+        # キャッシュにある組み合わせはそのまま使い、まだ描画していないものだけを集める
+        images = {}
+        todo = []
+        for config, ck in zip(configs, config_keys):
+            for card, kk in zip(cards, card_keys):
+                key = (kk, ck)
+                if key in images:
+                    continue
+                cached = self._images.get(key)
+                if cached is not None:
+                    self._images.move_to_end(key)
+                    images[key] = cached
+                else:
+                    images[key] = None
+                    todo.append((key, card, config))
+
+        done = total - len(todo)
+        if report:
+            report(done, total, f"描画中... ({done}/{total})")
+        for chunk, rendered in render_pool.map_chunks(_render_cards, todo, PARALLEL_MIN_RENDERS):
+            if cancel_check:
+                cancel_check()
+            for (key, _, _), image in zip(chunk, rendered):
+                images[key] = self._store(key, image)
+            done += len(chunk)
+            if report:
+                report(done, total, f"描画中... ({done}/{total})")
+
+        return [[images[(kk, ck)] for kk in card_keys] for ck in config_keys]
+
+    def _store(self, key, image):
+        self._images[key] = image
+        while len(self._images) > self.limit:
+            self._images.popitem(last=False)
+        return image
@@ -6,6 +6,7 @@ import os
 import json
 from PIL import ImageTk
 import constants as const
+import deckstats
 
 
 # カード枚数を一括入力するためのモーダルウィンドウ
@@ -223,7 +224,7 @@ class FontSelectorWindow(tk.Toplevel):
 
 # テキスト位置調整設定ウィンドウ (新規追加)
 class DesignConfigWindow(tk.Toplevel):
-    def __init__(self, master, initial_config, preview_callback, save_callback):
+    def __init__(self, master, initial_config, preview_callback, save_callback, compare_callback=None):
         super().__init__(master)
         self.title("デザイン・レイアウト設定")
         self.transient(master)
@@ -232,6 +233,7 @@ class DesignConfigWindow(tk.Toplevel):
         self.initial_config = initial_config # キャンセル用に初期設定を保持
         self.preview_callback = preview_callback
         self.save_callback = save_callback
+        self.compare_callback = compare_callback # (このウィンドウ, 設定) → 比較ウィンドウを開く
         
         # 変数をネストした辞書構造で管理
         current_config = json.loads(json.dumps(initial_config)) # ディープコピーして編集に使う
@@ -249,6 +251,12 @@ class DesignConfigWindow(tk.Toplevel):
         self.geometry(f'{width}x{height}+{x}+{y}')
         
         self.create_widgets()
+
+        # スピンボックスの操作中もプレビューを更新する (描画は下書き → 高品質の2段階で行われる)
+        self._live_preview_job = None
+        for group in self.config_vars.values():
+            for var in group.values():
+                var.trace_add("write", self.on_var_changed)
         self.master.wait_window(self)
 
     def create_widgets(self):
@@ -276,6 +284,8 @@ class DesignConfigWindow(tk.Toplevel):
         tk.Button(button_frame, text="キャンセル", command=self.cancel).pack(side="right")
         tk.Button(button_frame, text="適用 & 保存", command=self.apply_and_save).pack(side="right", padx=10)
         tk.Button(button_frame, text="適用", command=self.apply_preview).pack(side="right")
+        if self.compare_callback:
+            tk.Button(button_frame, text="比較...", command=self.open_compare).pack(side="left")
 
     def create_tab_frame(self, parent, title):
         frame = tk.Frame(parent, padx=10, pady=10)
@@ -343,6 +353,16 @@ class DesignConfigWindow(tk.Toplevel):
                 tk.Label(row, text=text, width=25, anchor="w").pack(side="left")
                 ttk.Spinbox(row, from_=10, to=const.CARD_W - 20, width=6, textvariable=self.config_vars["layout_options"][key]).pack(side="right", padx=(0,5))
 
+        # 効果テキストの自動縮小 (はみ出すカードだけ、収まる最大のサイズまでフォントを小さくする)
+        if "effects_auto_fit" in self.config_vars["layout_options"]:
+            ttk.Checkbutton(parent, text="はみ出す効果テキストのフォントを自動で縮小する",
+                            variable=self.config_vars["layout_options"]["effects_auto_fit"]).pack(anchor="w", pady=3)
+        if "effects_min_font_size" in self.config_vars["layout_options"]:
+            row = tk.Frame(parent)
+            row.pack(fill="x", pady=3)
+            tk.Label(row, text="自動縮小の最小フォントサイズ", width=25, anchor="w").pack(side="left")
+            ttk.Spinbox(row, from_=5, to=20, width=6, textvariable=self.config_vars["layout_options"]["effects_min_font_size"]).pack(side="right", padx=(0,5))
+
     def _get_current_config_from_vars(self):
         """UIの現在の値から設定辞書を生成する"""
         return {
@@ -351,23 +371,308 @@ class DesignConfigWindow(tk.Toplevel):
             "layout_options": {k: v.get() for k, v in self.config_vars["layout_options"].items()}
         }
 
+    def on_var_changed(self, *args):
+        """値が変わったら、まとめて1回だけプレビューを更新する"""
+        if self._live_preview_job is None:
+            self._live_preview_job = self.after_idle(self._live_preview)
+
+    def _live_preview(self):
+        self._live_preview_job = None
+        try:
+            current_config = self._get_current_config_from_vars()
+        except tk.TclError:
+            return # 入力途中 (空欄など) の値は反映しない
+        self.preview_callback(current_config)
+
+    def _cancel_live_preview(self):
+        if self._live_preview_job is not None:
+            self.after_cancel(self._live_preview_job)
+            self._live_preview_job = None
+
     def apply_preview(self):
         """プレビューのみ更新する"""
         current_config = self._get_current_config_from_vars()
         self.preview_callback(current_config)
 
+    def open_compare(self):
+        """現在の値を基準に、設定のバリエーションを見本カードで比較する"""
+        try:
+            current_config = self._get_current_config_from_vars()
+        except tk.TclError:
+            messagebox.showwarning("入力エラー", "数値を入力してください。", parent=self)
+            return
+        self.compare_callback(self, current_config)
+
     def apply_and_save(self):
         """設定を保存してウィンドウを閉じる"""
+        self._cancel_live_preview()
         current_config = self._get_current_config_from_vars()
         self.save_callback(current_config)
         self.destroy()
 
     def cancel(self):
         """変更を破棄して元の設定でプレビューを更新し、ウィンドウを閉じる"""
+        self._cancel_live_preview()
         self.preview_callback(self.initial_config) # ウィンドウを開いた時の設定に戻す
         # 各カテゴリの変数を辞書に変換
         self.destroy()
 
+# バックグラウンドのジョブを実行するウィンドウの基底クラス
+class JobWindow(tk.Toplevel):
+    """
+    サブクラスは run_button・progressbar・status_var (中止できる場合は cancel_button) を作り、
+    start_job() でジョブを始める。ジョブの終了時は _finish() がTrueのときだけ結果を表示する。
+    """
+    def __init__(self, master):
+        super().__init__(master)
+        self.job = None
+        self.cancel_button = None # 中止ボタンのないウィンドウはNoneのまま
+        self.bind("<Destroy>", self.on_destroy)
+
+    def start_job(self, work, on_done, status):
+        from jobs import run_job
+
+        self.run_button.config(state="disabled")
+        if self.cancel_button:
+            self.cancel_button.config(state="normal")
+        self.status_var.set(status)
+        # ウィンドウを閉じてもポーリングが続くように、親ウィンドウ上でジョブを回す
+        self.job = run_job(self.master, work, on_progress=self.on_progress, on_done=on_done,
+                           on_error=self.on_error, on_cancel=self.on_cancelled)
+
+    def cancel(self):
+        if self.job:
+            self.job.cancel()
+
+    def on_destroy(self, event):
+        if event.widget is self and self.job:
+            self.job.cancel()
+
+    def _finish(self):
+        """ジョブ終了時の共通処理。ウィンドウが閉じられていればFalseを返す。"""
+        self.job = None
+        if not self.winfo_exists():
+            return False
+        self.run_button.config(state="normal")
+        if self.cancel_button:
+            self.cancel_button.config(state="disabled")
+        return True
+
+    def on_progress(self, done, total, message=""):
+        if self.winfo_exists():
+            self.progressbar.config(maximum=max(total, 1), value=done)
+            self.show_progress_message(message)
+
+    def show_progress_message(self, message):
+        """進捗に付いたメッセージの表示。既定では表示しない"""
+
+    def on_error(self, e):
+        if self._finish():
+            self.status_var.set(f"エラー: {e}")
+
+    def on_cancelled(self):
+        if self._finish():
+            self.status_var.set("中止しました。")
+
+# デザイン設定のバリエーション比較ウィンドウ (設定値 × 見本カードのグリッド)
+class DesignVariantGridWindow(JobWindow):
+    SCALE = 0.6 # グリッドに並べるときのカードの縮小率
+    LABEL_W = 90 # 左端の設定値ラベルの幅
+    HEADER_H = 20 # 上端のカード名ラベルの高さ
+    GAP = 6
+    STEPS = {"font_sizes": 1, "layout_options": 20, "offsets": 4} # 既定の比較値の刻み
+
+    def __init__(self, master, base_config, extra_cards, render_cache):
+        super().__init__(master)
+        self.title("デザイン設定の比較")
+        self.transient(master)
+        self.geometry("900x600")
+        self.base_config = base_config
+        self.extra_cards = extra_cards # 編集中のカードなど、見本の先頭に加えるカード
+        self.render_cache = render_cache # design_preview.VariantRenderCache (ウィンドウを閉じても描画結果を使い回す)
+        self.sample_cards = None
+        self.photos = []
+
+        import design_preview
+        self.variant_keys = list(design_preview.VARIANT_KEYS.items())
+        self.key_var = tk.StringVar(value=self.variant_keys[0][1])
+        self.values_var = tk.StringVar()
+        self.status_var = tk.StringVar(value="比較する項目と値 (カンマ区切り) を指定して「描画」を押してください。")
+
+        self.create_widgets()
+        self.on_key_selected()
+        # 呼び出し元のデザイン設定ウィンドウはモーダルなので、このウィンドウが入力を受け取れるようにする
+        self.grab_set()
+
+    def create_widgets(self):
+        main_frame = tk.Frame(self, padx=10, pady=10)
+        main_frame.pack(fill="both", expand=True)
+
+        setting_frame = tk.Frame(main_frame)
+        setting_frame.pack(fill="x")
+        tk.Label(setting_frame, text="項目:").pack(side="left")
+        key_combo = ttk.Combobox(setting_frame, textvariable=self.key_var, values=[label for _, label in self.variant_keys],
+                                 state="readonly", width=28)
+        key_combo.pack(side="left")
+        key_combo.bind("<<ComboboxSelected>>", self.on_key_selected)
+        tk.Label(setting_frame, text="値:").pack(side="left", padx=(10, 0))
+        values_entry = tk.Entry(setting_frame, textvariable=self.values_var, width=24)
+        values_entry.pack(side="left")
+        values_entry.bind("<Return>", lambda e: self.run())
+        self.run_button = tk.Button(setting_frame, text="描画", command=self.run)
+        self.run_button.pack(side="left", padx=5)
+        self.progressbar = ttk.Progressbar(setting_frame, orient="horizontal", mode="determinate")
+        self.progressbar.pack(side="left", fill="x", expand=True, padx=5)
+
+        grid_frame = tk.Frame(main_frame)
+        grid_frame.pack(fill="both", expand=True, pady=5)
+        self.canvas = tk.Canvas(grid_frame, bg="gray", highlightthickness=0)
+        vscroll = ttk.Scrollbar(grid_frame, orient="vertical", command=self.canvas.yview)
+        hscroll = ttk.Scrollbar(grid_frame, orient="horizontal", command=self.canvas.xview)
+        self.canvas.configure(yscrollcommand=vscroll.set, xscrollcommand=hscroll.set)
+        vscroll.pack(side="right", fill="y")
+        hscroll.pack(side="bottom", fill="x")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        tk.Label(main_frame, textvariable=self.status_var, anchor="w", fg="gray").pack(fill="x")
+
+    def _selected_key(self):
+        for key, label in self.variant_keys:
+            if label == self.key_var.get():
+                return key
+        return self.variant_keys[0][0]
+
+    def on_key_selected(self, event=None):
+        """選んだ項目の現在値を中心にした比較値を入れる"""
+        category, name = self._selected_key()
+        current = self.base_config.get(category, {}).get(name, 0)
+        step = self.STEPS.get(category, 1)
+        self.values_var.set(", ".join(str(current + step * d) for d in (-2, -1, 0, 1, 2)))
+
+    def run(self):
+        try:
+            values = [int(v) for v in self.values_var.get().replace("、", ",").split(",") if v.strip()]
+        except ValueError:
+            messagebox.showwarning("入力エラー", "値は整数をカンマ区切りで入力してください。", parent=self)
+            return
+        if not values:
+            return
+
+        import design_preview
+
+        key = self._selected_key()
+        configs = design_preview.make_variant_configs(self.base_config, key, values)
+        labels = [f"{key[1]}\n= {v}" for v in values]
+
+        def work(job):
+            if self.sample_cards is None:
+                self.sample_cards = design_preview.load_sample_cards()
+            cards = self.extra_cards + self.sample_cards
+            return cards, self.render_cache.render_grid(cards, configs, report=job.report, cancel_check=job.check_cancelled)
+
+        self.start_job(work, on_done=lambda result: self.show_grid(labels, *result), status="描画中...")
+
+    def on_destroy(self, event):
+        super().on_destroy(event)
+        if event.widget is self and self.master.winfo_exists():
+            self.master.grab_set() # モーダルのデザイン設定ウィンドウに入力を戻す
+
+    def show_progress_message(self, message):
+        self.status_var.set(message)
+
+    def show_grid(self, labels, cards, grid):
+        if not self._finish():
+            return
+        from PIL import Image
+        w, h = int(const.CARD_W * self.SCALE), int(const.CARD_H * self.SCALE)
+        self.canvas.delete("all")
+        self.photos = []
+        for col, card in enumerate(cards):
+            x = self.LABEL_W + col * (w + self.GAP)
+            name = card.get('name', '').replace('\n', ' ') or "(編集中のカード)"
+            self.canvas.create_text(x + w / 2, self.HEADER_H / 2, text=f"{card.get('card_type', '')}: {name}",
+                                    fill="white", width=w)
+        for row, (label, images) in enumerate(zip(labels, grid)):
+            y = self.HEADER_H + row * (h + self.GAP)
+            self.canvas.create_text(self.LABEL_W / 2, y + h / 2, text=label, fill="white", width=self.LABEL_W - 4)
+            for col, image in enumerate(images):
+                photo = ImageTk.PhotoImage(image.resize((w, h), Image.LANCZOS))
+                self.photos.append(photo)
+                self.canvas.create_image(self.LABEL_W + col * (w + self.GAP), y, image=photo, anchor="nw")
+        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        self.progressbar.config(value=0)
+        self.status_var.set(f"{len(labels)} 種類の設定 × {len(cards)} 枚を表示しています。")
+
+# カード全体のレイアウトチェック結果ウィンドウ (確認はバックグラウンドで行う)
+class LayoutLintWindow(JobWindow):
+    COLUMNS = (("file", "カード", 220), ("part", "部位", 70), ("pixels", "はみ出し(px)", 80), ("message", "内容", 320))
+
+    def __init__(self, master, config_getter, open_callback=None):
+        super().__init__(master)
+        self.title("レイアウトチェック (全カード)")
+        self.transient(master)
+        self.geometry("720x420")
+        self.config_getter = config_getter # () → 確認に使う描画設定
+        self.open_callback = open_callback # (カードJSONのパス) → 編集画面で開く
+        self.paths = {} # Treeviewの行ID → カードJSONのパス
+        self.status_var = tk.StringVar(value="")
+
+        self.create_widgets()
+        self.run()
+
+    def create_widgets(self):
+        main_frame = tk.Frame(self, padx=10, pady=10)
+        main_frame.pack(fill="both", expand=True)
+
+        button_frame = tk.Frame(main_frame)
+        button_frame.pack(fill="x")
+        self.run_button = tk.Button(button_frame, text="再確認", command=self.run)
+        self.run_button.pack(side="left")
+        self.progressbar = ttk.Progressbar(button_frame, orient="horizontal", mode="determinate")
+        self.progressbar.pack(side="left", fill="x", expand=True, padx=5)
+
+        tree_frame = tk.Frame(main_frame)
+        tree_frame.pack(fill="both", expand=True, pady=5)
+        self.tree = ttk.Treeview(tree_frame, columns=[c[0] for c in self.COLUMNS], show="headings")
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        for column, text, width in self.COLUMNS:
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width, anchor="e" if column == "pixels" else "w")
+        scrollbar.pack(side="right", fill="y")
+        self.tree.pack(fill="both", expand=True)
+        if self.open_callback:
+            self.tree.bind("<Double-1>", self.on_double_click)
+
+        hint = "ダブルクリックでカードを開きます。" if self.open_callback else ""
+        tk.Label(main_frame, textvariable=self.status_var, anchor="w", fg="gray").pack(fill="x")
+        tk.Label(main_frame, text=hint, anchor="w", fg="gray").pack(fill="x")
+
+    def run(self):
+        import layout_lint
+
+        config = self.config_getter()
+        self.start_job(
+            lambda job: layout_lint.lint_catalog(config, report=job.report, cancel_check=job.check_cancelled),
+            on_done=self.show_result, status="確認中...")
+
+    def show_result(self, found):
+        if not self._finish():
+            return
+        self.tree.delete(*self.tree.get_children())
+        self.paths = {}
+        for path, issues in found:
+            rel_path = os.path.relpath(path, const.DATA_DIR)
+            for issue in issues:
+                iid = self.tree.insert("", "end", values=(rel_path, issue['part'], issue['pixels'] or "", issue['message']))
+                self.paths[iid] = path
+        self.status_var.set(f"{len(found)} 枚のカードに問題があります。" if found else "問題はありません。")
+
+    def on_double_click(self, event):
+        iid = self.tree.identify_row(event.y)
+        if iid in self.paths:
+            self.open_callback(self.paths[iid])
+
 # 画像プレビューと保存のためのダイアログ (新規追加)
 class ImagePreviewAndSaveDialog(tk.Toplevel):
     def __init__(self, master, image_obj, default_save_path):
@@ -461,6 +766,38 @@ class NonModalInfo(tk.Toplevel):
         """表示されているメッセージを更新する"""
         self.label.config(text=new_message)
 
+# バックグラウンド処理の進捗表示ウィンドウ (キャンセルボタン付き)
+class JobProgressWindow(tk.Toplevel):
+    def __init__(self, master, title, message, cancel_callback):
+        super().__init__(master)
+        self.title(title)
+        self.transient(master)
+        self.resizable(False, False)
+        self.cancel_callback = cancel_callback
+
+        frame = tk.Frame(self, padx=15, pady=10)
+        frame.pack(fill="both", expand=True)
+        self.label = tk.Label(frame, text=message, anchor="w", justify=tk.LEFT, width=40)
+        self.label.pack(fill="x")
+        self.progressbar = ttk.Progressbar(frame, orient="horizontal", length=300, mode="determinate")
+        self.progressbar.pack(fill="x", pady=8)
+        self.cancel_button = tk.Button(frame, text="キャンセル", command=self.on_cancel)
+        self.cancel_button.pack(anchor="e")
+
+        # ×ボタンで閉じた場合もキャンセル扱いにする
+        self.protocol("WM_DELETE_WINDOW", self.on_cancel)
+
+    def update_progress(self, done, total, message=""):
+        """進捗バーとメッセージを更新する"""
+        self.progressbar.config(maximum=max(total, 1), value=done)
+        if message:
+            self.label.config(text=message)
+
+    def on_cancel(self):
+        self.cancel_button.config(state="disabled")
+        self.label.config(text="キャンセルしています...")
+        self.cancel_callback()
+
 # 特徴選択ウィンドウ (新規追加)
 class ParamSelectorWindow(tk.Toplevel):
     def __init__(self, master, all_params, current_params, save_callback, add_param_callback, delete_param_callback):
@@ -582,4 +919,588 @@ class ParamSelectorWindow(tk.Toplevel):
         selected_params = [p for p, var in self.param_vars.items() if var.get()]
         self.result = sorted(selected_params)
         self.save_callback(self.result)
-        self.destroy()
\ No newline at end of file
+        self.destroy()
+
+# デッキのドロー確率表示ウィンドウ (デッキが変わるたびにrefresh()で再計算する)
+class DrawProbabilityWindow(tk.Toplevel):
+    MAX_TURNS = 10
+    CONDITION_KINDS = ("カード", "特徴", "属性")
+
+    def __init__(self, master, deck_getter, all_params):
+        super().__init__(master)
+        self.title("ドロー確率")
+        self.transient(master)
+        self.deck_getter = deck_getter # () → [(カードデータ, 枚数)] (BOSSを除くデッキ)
+        self.all_params = all_params
+        self.conditions = [] # [{'label', 'predicate', 'k'}]
+        self.card_choices = {} # 表示名 → カードのパス (デッキ内のカード)
+
+        self.hand_size_var = tk.IntVar(value=const.OPENING_HAND_SIZE)
+        self.draws_var = tk.IntVar(value=const.DRAWS_PER_TURN)
+        self.on_play_var = tk.BooleanVar(value=True)
+        self.turns_var = tk.IntVar(value=6)
+        self.kind_var = tk.StringVar(value=self.CONDITION_KINDS[0])
+        self.value_var = tk.StringVar()
+        self.k_var = tk.IntVar(value=1)
+
+        self.create_widgets()
+        for var in (self.hand_size_var, self.draws_var, self.on_play_var, self.turns_var):
+            var.trace_add("write", lambda *args: self.refresh())
+        self.refresh()
+
+    def create_widgets(self):
+        main_frame = tk.Frame(self, padx=10, pady=10)
+        main_frame.pack(fill="both", expand=True)
+
+        # --- 試行条件 ---
+        setting_frame = tk.Frame(main_frame)
+        setting_frame.pack(fill="x")
+        tk.Label(setting_frame, text="初期手札:").pack(side="left")
+        tk.Spinbox(setting_frame, from_=0, to=20, width=4, textvariable=self.hand_size_var).pack(side="left")
+        tk.Label(setting_frame, text="ドロー/ターン:").pack(side="left", padx=(10, 0))
+        tk.Spinbox(setting_frame, from_=0, to=5, width=4, textvariable=self.draws_var).pack(side="left")
+        tk.Label(setting_frame, text="ターン数:").pack(side="left", padx=(10, 0))
+        tk.Spinbox(setting_frame, from_=1, to=self.MAX_TURNS, width=4, textvariable=self.turns_var).pack(side="left")
+        ttk.Checkbutton(setting_frame, text="先攻 (1ターン目はドローなし)", variable=self.on_play_var).pack(side="left", padx=(10, 0))
+
+        # --- 条件の追加 ---
+        condition_frame = tk.Frame(main_frame)
+        condition_frame.pack(fill="x", pady=(10, 5))
+        kind_combo = ttk.Combobox(condition_frame, textvariable=self.kind_var, values=self.CONDITION_KINDS, state="readonly", width=6)
+        kind_combo.pack(side="left")
+        kind_combo.bind("<<ComboboxSelected>>", lambda e: self.update_value_choices())
+        self.value_combo = ttk.Combobox(condition_frame, textvariable=self.value_var, state="readonly", width=24)
+        self.value_combo.pack(side="left", padx=5)
+        tk.Spinbox(condition_frame, from_=1, to=10, width=3, textvariable=self.k_var).pack(side="left")
+        tk.Label(condition_frame, text="枚以上").pack(side="left")
+        tk.Button(condition_frame, text="追加", command=self.add_condition).pack(side="left", padx=5)
+        tk.Button(condition_frame, text="削除", command=self.remove_selected_condition).pack(side="left")
+
+        # --- 結果表 (ターンごとの確率) ---
+        turn_columns = [f"t{turn}" for turn in range(1, self.MAX_TURNS + 1)]
+        self.tree = ttk.Treeview(main_frame, columns=["cond", "count"] + turn_columns, show="headings", height=8)
+        self.tree.heading("cond", text="条件")
+        self.tree.heading("count", text="枚数")
+        self.tree.column("cond", width=180)
+        self.tree.column("count", width=45, anchor="center")
+        for turn, column in enumerate(turn_columns, 1):
+            self.tree.heading(column, text=f"{turn}T")
+            self.tree.column(column, width=55, anchor="e")
+        self.tree.pack(fill="both", expand=True)
+
+        self.summary_var = tk.StringVar()
+        tk.Label(main_frame, textvariable=self.summary_var, anchor="w", fg="gray").pack(fill="x", pady=(5, 0))
+        self.update_value_choices()
+
+    def update_value_choices(self):
+        """条件の種類に応じて選択肢を切り替える"""
+        kind = self.kind_var.get()
+        if kind == "カード":
+            values = list(self.card_choices)
+        elif kind == "特徴":
+            values = list(self.all_params)
+        else:
+            values = list(const.COLORS)
+        self.value_combo.config(values=values)
+        if self.value_var.get() not in values:
+            self.value_var.set(values[0] if values else "")
+
+    def add_condition(self):
+        kind, value = self.kind_var.get(), self.value_var.get()
+        if not value:
+            return
+        try:
+            k = max(1, int(self.k_var.get()))
+        except (tk.TclError, ValueError):
+            return
+        if kind == "カード":
+            path = self.card_choices.get(value)
+            predicate = lambda card, path=path: card.get('__filepath') == path
+        elif kind == "特徴":
+            predicate = lambda card, value=value: value in (card.get('param') or [])
+        else:
+            predicate = lambda card, value=value: (card.get('color') or {}).get(value, 0) > 0
+        self.conditions.append({'label': f"{kind}: {value} ({k}枚以上)", 'predicate': predicate, 'k': k})
+        self.refresh()
+
+    def remove_selected_condition(self):
+        selection = self.tree.selection()
+        if not selection or selection[0] == "all":
+            return
+        del self.conditions[int(selection[0])]
+        self.refresh()
+
+    def refresh(self):
+        """現在のデッキと条件で確率表を再計算する"""
+        try:
+            hand_size, draws = int(self.hand_size_var.get()), int(self.draws_var.get())
+            turns = min(max(int(self.turns_var.get()), 1), self.MAX_TURNS)
+        except (tk.TclError, ValueError):
+            return # 入力途中の値は無視する
+        on_play = self.on_play_var.get()
+
+        deck_cards = self.deck_getter()
+        self.card_choices = {}
+        for card, _ in deck_cards:
+            label = card.get('name', '').replace('\n', ' ')
+            if label in self.card_choices: # 同名カード(BOSSとキャラクター等)はタイプを付けて区別する
+                label = f"{label} ({card.get('card_type', '')})"
+            self.card_choices[label] = card.get('__filepath')
+        self.update_value_choices()
+
+        population, cells = deckstats.build_cells(deck_cards, [c['predicate'] for c in self.conditions])
+        samples = [deckstats.cards_seen(turn, hand_size, draws, on_play) for turn in range(1, turns + 1)]
+        self.tree.configure(displaycolumns=["cond", "count"] + [f"t{turn}" for turn in range(1, turns + 1)])
+
+        rows = []
+        for i, condition in enumerate(self.conditions):
+            successes = sum(count for mask, count in cells if mask >> i & 1)
+            probs = [deckstats.prob_at_least(population, successes, sample, condition['k']) for sample in samples]
+            rows.append((str(i), condition['label'], successes, probs))
+        if len(self.conditions) > 1:
+            requirements = tuple(c['k'] for c in self.conditions)
+            probs = [deckstats.prob_all(population, cells, requirements, sample) for sample in samples]
+            rows.append(("all", "すべて同時に満たす", "", probs))
+
+        # 行は作り直さず、値だけを更新する
+        existing = set(self.tree.get_children())
+        for iid, label, count, probs in rows:
+            values = [label, count] + [f"{p * 100:.1f}%" for p in probs]
+            if iid in existing:
+                self.tree.item(iid, values=values)
+                existing.discard(iid)
+            else:
+                self.tree.insert("", "end", iid=iid, values=values)
+        for iid in existing:
+            self.tree.delete(iid)
+        if self.tree.exists("all"):
+            self.tree.move("all", "", "end")
+
+        self.summary_var.set(f"山札 {population} 枚 / {turns}ターン目までに {samples[-1]} 枚を引く")
+
+# 1人回しシミュレーションウィンドウ (計算はバックグラウンドで行う)
+class GoldfishWindow(JobWindow):
+    GAME_CHOICES = ("10000", "100000", "1000000")
+    COLUMNS = (("turn", "ターン", 50), ("mana", "平均マナ", 70), ("curve_hit", "カーブ達成", 80),
+               ("color_screw", "色事故", 70), ("castable_cost", "使える最大コスト", 110), ("missed_charge", "マナ置けず", 80))
+
+    def __init__(self, master, deck_getter):
+        super().__init__(master)
+        self.title("1人回しシミュレーション")
+        self.transient(master)
+        self.deck_getter = deck_getter # () → [(カードデータ, 枚数)] (BOSSを除くデッキ)
+
+        self.games_var = tk.StringVar(value=self.GAME_CHOICES[1])
+        self.turns_var = tk.IntVar(value=8)
+        self.hand_size_var = tk.IntVar(value=const.OPENING_HAND_SIZE)
+        self.draws_var = tk.IntVar(value=const.DRAWS_PER_TURN)
+        self.on_play_var = tk.BooleanVar(value=True)
+        self.status_var = tk.StringVar(value="デッキの内容で試行します。土地を優先して毎ターン1枚をマナに置きます。")
+
+        self.create_widgets()
+
+    def create_widgets(self):
+        main_frame = tk.Frame(self, padx=10, pady=10)
+        main_frame.pack(fill="both", expand=True)
+
+        setting_frame = tk.Frame(main_frame)
+        setting_frame.pack(fill="x")
+        tk.Label(setting_frame, text="試行回数:").pack(side="left")
+        ttk.Combobox(setting_frame, textvariable=self.games_var, values=self.GAME_CHOICES, width=9).pack(side="left")
+        tk.Label(setting_frame, text="ターン数:").pack(side="left", padx=(10, 0))
+        tk.Spinbox(setting_frame, from_=1, to=20, width=4, textvariable=self.turns_var).pack(side="left")
+        tk.Label(setting_frame, text="初期手札:").pack(side="left", padx=(10, 0))
+        tk.Spinbox(setting_frame, from_=0, to=20, width=4, textvariable=self.hand_size_var).pack(side="left")
+        tk.Label(setting_frame, text="ドロー/ターン:").pack(side="left", padx=(10, 0))
+        tk.Spinbox(setting_frame, from_=0, to=5, width=4, textvariable=self.draws_var).pack(side="left")
+        ttk.Checkbutton(setting_frame, text="先攻", variable=self.on_play_var).pack(side="left", padx=(10, 0))
+
+        button_frame = tk.Frame(main_frame)
+        button_frame.pack(fill="x", pady=5)
+        self.run_button = tk.Button(button_frame, text="実行", command=self.run)
+        self.run_button.pack(side="left")
+        self.cancel_button = tk.Button(button_frame, text="中止", command=self.cancel, state="disabled")
+        self.cancel_button.pack(side="left", padx=5)
+        self.progressbar = ttk.Progressbar(button_frame, orient="horizontal", mode="determinate")
+        self.progressbar.pack(side="left", fill="x", expand=True, padx=5)
+
+        self.tree = ttk.Treeview(main_frame, columns=[c[0] for c in self.COLUMNS], show="headings", height=10)
+        for column, text, width in self.COLUMNS:
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width, anchor="e")
+        self.tree.pack(fill="both", expand=True)
+        tk.Label(main_frame, textvariable=self.status_var, anchor="w", fg="gray", wraplength=500, justify="left").pack(fill="x", pady=(5, 0))
+
+    def run(self):
+        try:
+            games = int(self.games_var.get())
+            turns, hand_size, draws = int(self.turns_var.get()), int(self.hand_size_var.get()), int(self.draws_var.get())
+        except (tk.TclError, ValueError):
+            messagebox.showwarning("入力エラー", "数値を入力してください。", parent=self)
+            return
+        deck_cards = self.deck_getter()
+        if not deck_cards or games <= 0:
+            messagebox.showinfo("情報", "デッキにカードがありません。", parent=self)
+            return
+        on_play = self.on_play_var.get()
+
+        # 遅延インポート: NumPyの読込はシミュレーションを使うときだけにする
+        import goldfish
+
+        self.progressbar.config(maximum=games, value=0)
+        self.start_job(
+            lambda job: goldfish.simulate(deck_cards, games, turns, hand_size, draws, on_play,
+                                          report=job.report, cancel_check=job.check_cancelled),
+            on_done=self.show_result, status=f"{games:,} 回試行中...")
+
+    def show_result(self, result):
+        if not self._finish():
+            return
+        self.tree.delete(*self.tree.get_children())
+        for turn in range(len(result['mana'])):
+            self.tree.insert("", "end", values=(
+                turn + 1,
+                f"{result['mana'][turn]:.2f}",
+                f"{result['curve_hit'][turn] * 100:.1f}%",
+                f"{result['color_screw'][turn] * 100:.1f}%",
+                f"{result['castable_cost'][turn]:.2f}",
+                f"{result['missed_charge'][turn] * 100:.1f}%",
+            ))
+        self.status_var.set(f"{result['games']:,} 回の試行結果")
+
+# デッキ自動構築ウィンドウ (探索はバックグラウンドのプロセスプールで行う)
+class OptimizerWindow(JobWindow):
+    ITERATION_CHOICES = ("100000", "300000", "1000000")
+    DEFAULT_CURVE = (4, 10, 10, 8, 5, 3) # 40枚デッキでのコスト帯 1～6+ の目標枚数
+
+    def __init__(self, master, pool_getter, deck_getter, all_params, apply_callback):
+        super().__init__(master)
+        self.title("デッキ自動構築")
+        self.transient(master)
+        self.pool_getter = pool_getter # () → 候補のカードデータのリスト (BOSSを除く)
+        self.deck_getter = deck_getter # () → 現在のデッキ [(カードデータ, 枚数)]
+        self.all_params = all_params
+        self.apply_callback = apply_callback # [(カードデータ, 枚数)] をデッキに反映する
+        self.result_cards = []
+        self.param_targets = {}
+
+        self.deck_size_var = tk.IntVar(value=40)
+        self.iterations_var = tk.StringVar(value=self.ITERATION_CHOICES[1])
+        self.restarts_var = tk.IntVar(value=min(8, (os.cpu_count() or 1) * 2))
+        self.color_vars = {c: tk.IntVar(value=0) for c in const.COLORS}
+        self.use_curve_var = tk.BooleanVar(value=True)
+        self.curve_vars = [tk.IntVar(value=n) for n in self.DEFAULT_CURVE]
+        self.param_var = tk.StringVar()
+        self.param_min_var = tk.IntVar(value=4)
+        self.start_from_deck_var = tk.BooleanVar(value=True)
+        self.status_var = tk.StringVar()
+
+        self.create_widgets()
+        self.status_var.set(f"候補: 検索結果の {len(self.pool_getter())} 種類のカード")
+
+    def create_widgets(self):
+        main_frame = tk.Frame(self, padx=10, pady=10)
+        main_frame.pack(fill="both", expand=True)
+
+        row = tk.Frame(main_frame)
+        row.pack(fill="x")
+        tk.Label(row, text="デッキ枚数:").pack(side="left")
+        tk.Spinbox(row, from_=1, to=100, width=4, textvariable=self.deck_size_var).pack(side="left")
+        tk.Label(row, text="反復回数/探索:").pack(side="left", padx=(10, 0))
+        ttk.Combobox(row, textvariable=self.iterations_var, values=self.ITERATION_CHOICES, width=9).pack(side="left")
+        tk.Label(row, text="探索数:").pack(side="left", padx=(10, 0))
+        tk.Spinbox(row, from_=1, to=64, width=4, textvariable=self.restarts_var).pack(side="left")
+        ttk.Checkbutton(row, text="現在のデッキから開始", variable=self.start_from_deck_var).pack(side="left", padx=(10, 0))
+
+        row = tk.Frame(main_frame)
+        row.pack(fill="x", pady=(5, 0))
+        tk.Label(row, text="属性の割合(%):").pack(side="left")
+        for color in const.COLORS:
+            tk.Label(row, text=color).pack(side="left", padx=(5, 0))
+            tk.Spinbox(row, from_=0, to=100, increment=5, width=4, textvariable=self.color_vars[color]).pack(side="left")
+        tk.Label(row, text="(すべて0なら指定なし)", fg="gray").pack(side="left", padx=5)
+
+        row = tk.Frame(main_frame)
+        row.pack(fill="x", pady=(5, 0))
+        ttk.Checkbutton(row, text="コスト帯の目標枚数:", variable=self.use_curve_var).pack(side="left")
+        for i, var in enumerate(self.curve_vars):
+            label = f"{i + 1}+" if i == len(self.curve_vars) - 1 else str(i + 1)
+            tk.Label(row, text=label).pack(side="left", padx=(5, 0))
+            tk.Spinbox(row, from_=0, to=40, width=3, textvariable=var).pack(side="left")
+
+        row = tk.Frame(main_frame)
+        row.pack(fill="x", pady=(5, 0))
+        tk.Label(row, text="必須の特徴:").pack(side="left")
+        ttk.Combobox(row, textvariable=self.param_var, values=self.all_params, state="readonly", width=14).pack(side="left")
+        tk.Spinbox(row, from_=1, to=40, width=3, textvariable=self.param_min_var).pack(side="left", padx=(5, 0))
+        tk.Label(row, text="枚以上").pack(side="left")
+        tk.Button(row, text="追加", command=self.add_param_target).pack(side="left", padx=5)
+        tk.Button(row, text="クリア", command=self.clear_param_targets).pack(side="left")
+        self.param_label = tk.Label(row, text="", anchor="w")
+        self.param_label.pack(side="left", padx=5)
+
+        button_frame = tk.Frame(main_frame)
+        button_frame.pack(fill="x", pady=5)
+        self.run_button = tk.Button(button_frame, text="探索開始", command=self.run)
+        self.run_button.pack(side="left")
+        self.cancel_button = tk.Button(button_frame, text="中止", command=self.cancel, state="disabled")
+        self.cancel_button.pack(side="left", padx=5)
+        self.apply_button = tk.Button(button_frame, text="デッキに反映", command=self.apply, state="disabled")
+        self.apply_button.pack(side="right")
+        self.progressbar = ttk.Progressbar(button_frame, orient="horizontal", mode="determinate")
+        self.progressbar.pack(side="left", fill="x", expand=True, padx=5)
+
+        self.tree = ttk.Treeview(main_frame, columns=("qty", "cost", "color", "type", "name"), show="headings", height=12)
+        for column, text, width in (("qty", "Qty", 40), ("cost", "コスト", 50), ("color", "属性", 60), ("type", "タイプ", 80), ("name", "カード名", 180)):
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width, anchor="w" if column == "name" else "center")
+        self.tree.pack(fill="both", expand=True)
+        tk.Label(main_frame, textvariable=self.status_var, anchor="w", fg="gray").pack(fill="x", pady=(5, 0))
+
+    def add_param_target(self):
+        param = self.param_var.get()
+        try:
+            minimum = int(self.param_min_var.get())
+        except (tk.TclError, ValueError):
+            return
+        if param:
+            self.param_targets[param] = minimum
+            self.param_label.config(text="  ".join(f"{p}≥{n}" for p, n in self.param_targets.items()))
+
+    def clear_param_targets(self):
+        self.param_targets = {}
+        self.param_label.config(text="")
+
+    def run(self):
+        try:
+            deck_size = int(self.deck_size_var.get())
+            iterations, restarts = int(self.iterations_var.get()), max(1, int(self.restarts_var.get()))
+            color_percent = {c: int(var.get()) for c, var in self.color_vars.items()}
+            curve = [int(var.get()) for var in self.curve_vars] if self.use_curve_var.get() else None
+        except (tk.TclError, ValueError):
+            messagebox.showwarning("入力エラー", "数値を入力してください。", parent=self)
+            return
+        pool = self.pool_getter()
+        if not pool:
+            messagebox.showinfo("情報", "候補のカードがありません。検索結果を確認してください。", parent=self)
+            return
+
+        # 遅延インポート: 探索を使うときだけ読み込む
+        import optimizer
+
+        color_targets = {c: p / 100 for c, p in color_percent.items()} if any(color_percent.values()) else None
+        if curve:
+            curve = [n * deck_size / 40 for n in curve] # 目標は40枚基準で指定し、デッキ枚数に合わせて拡縮する
+        problem = optimizer.DeckProblem(pool, deck_size, color_targets, curve, dict(self.param_targets))
+
+        initial_counts = None
+        if self.start_from_deck_var.get():
+            pool_index = {id(card): i for i, card in enumerate(pool)}
+            counts = [0] * len(pool)
+            deck_cards = self.deck_getter()
+            for card, qty in deck_cards:
+                if id(card) in pool_index:
+                    counts[pool_index[id(card)]] = qty
+            if sum(counts) == deck_size and sum(qty for _, qty in deck_cards) == deck_size:
+                initial_counts = counts
+
+        self.progressbar.config(maximum=restarts, value=0)
+        self.start_job(
+            lambda job: optimizer.optimize(problem, restarts, iterations, initial_counts,
+                                           report=job.report, cancel_check=job.check_cancelled),
+            on_done=lambda result: self.show_result(pool, result),
+            status=f"{restarts} 回の探索 × {iterations:,} 回の入れ替えを実行中...")
+
+    def show_result(self, pool, result):
+        if not self._finish():
+            return
+        score, counts = result
+        self.result_cards = [(card, qty) for card, qty in zip(pool, counts) if qty > 0]
+        self.result_cards.sort(key=lambda x: (x[0].get('cost', 0), x[0].get('name', '')))
+        self.tree.delete(*self.tree.get_children())
+        for card, qty in self.result_cards:
+            active_colors = [k for k, v in (card.get('color') or {}).items() if v > 0]
+            self.tree.insert("", "end", values=(qty, card.get('cost', ''), "／".join(active_colors) or "無",
+                                                card.get('card_type', ''), card.get('name', '')))
+        self.apply_button.config(state="normal")
+        self.status_var.set(f"評価値: {score:.4f} (小さいほど目標に近い)")
+
+    def apply(self):
+        if self.result_cards:
+            self.apply_callback(self.result_cards)
+
+# デッキファイルの一括集計ウィンドウ
+class DeckArchiveWindow(JobWindow):
+    MAX_PAIR_ROWS = 500 # 同時採用タブに表示する組の数 (CSVにはすべて出力する)
+
+    def __init__(self, master, catalog):
+        super().__init__(master)
+        self.title("デッキ一括集計")
+        self.transient(master)
+        self.geometry("720x520")
+        self.catalog = catalog
+        self.result = None
+        self.status_var = tk.StringVar(value="集計するデッキファイル(.ucgdeck)のフォルダを選択してください。")
+
+        self.create_widgets()
+
+    def create_widgets(self):
+        main_frame = tk.Frame(self, padx=10, pady=10)
+        main_frame.pack(fill="both", expand=True)
+
+        button_frame = tk.Frame(main_frame)
+        button_frame.pack(fill="x")
+        self.run_button = tk.Button(button_frame, text="フォルダを選択して集計", command=self.run)
+        self.run_button.pack(side="left")
+        self.cancel_button = tk.Button(button_frame, text="中止", command=self.cancel, state="disabled")
+        self.cancel_button.pack(side="left", padx=5)
+        self.export_button = tk.Button(button_frame, text="CSV出力", command=self.export, state="disabled")
+        self.export_button.pack(side="right")
+        self.progressbar = ttk.Progressbar(button_frame, orient="horizontal", mode="determinate")
+        self.progressbar.pack(side="left", fill="x", expand=True, padx=5)
+
+        notebook = ttk.Notebook(main_frame)
+        notebook.pack(fill="both", expand=True, pady=5)
+        self.card_tree = self._create_tab(notebook, "カード", (("name", "カード名", 180), ("type", "タイプ", 80),
+                                          ("inclusion", "採用率", 70), ("avg", "平均枚数", 70), ("decks", "採用デッキ数", 90)))
+        self.pair_tree = self._create_tab(notebook, "同時採用", (("a", "カードA", 180), ("b", "カードB", 180),
+                                          ("decks", "デッキ数", 70), ("rate", "割合", 70)))
+        self.color_tree = self._create_tab(notebook, "属性の組み合わせ", (("a", "属性A", 70), ("b", "属性B", 70),
+                                           ("decks", "デッキ数", 70), ("rate", "割合", 70)))
+        self.boss_tree = self._create_tab(notebook, "BOSS", (("name", "BOSS", 180), ("decks", "デッキ数", 70), ("rate", "割合", 70)))
+
+        tk.Label(main_frame, textvariable=self.status_var, anchor="w", fg="gray", justify="left", wraplength=680).pack(fill="x")
+
+    def _create_tab(self, notebook, title, columns):
+        frame = tk.Frame(notebook)
+        notebook.add(frame, text=title)
+        tree = ttk.Treeview(frame, columns=[c[0] for c in columns], show="headings")
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        for column, text, width in columns:
+            tree.heading(column, text=text)
+            tree.column(column, width=width, anchor="w" if width >= 180 else "center")
+        scrollbar.pack(side="right", fill="y")
+        tree.pack(fill="both", expand=True)
+        return tree
+
+    def run(self):
+        directory = filedialog.askdirectory(title="デッキファイルのフォルダを選択", parent=self)
+        if not directory:
+            return
+
+        # 遅延インポート: 集計を使うときだけNumPy等を読み込む
+        import deckarchive
+
+        self.export_button.config(state="disabled")
+        self.start_job(
+            lambda job: deckarchive.analyze_deck_archive(directory, self.catalog, report=job.report, cancel_check=job.check_cancelled),
+            on_done=self.show_result, status="集計中...")
+
+    def show_progress_message(self, message):
+        if message:
+            self.status_var.set(message)
+
+    def show_result(self, result):
+        if not self._finish():
+            return
+        self.result = result
+        for tree in (self.card_tree, self.pair_tree, self.color_tree, self.boss_tree):
+            tree.delete(*tree.get_children())
+        for s in result['cards']:
+            self.card_tree.insert("", "end", values=(s['card'].get('name', ''), s['card'].get('card_type', ''),
+                                                     f"{s['inclusion'] * 100:.1f}%", f"{s['avg_copies']:.2f}", s['decks']))
+        for a, b, n, rate in result['pairs'][:self.MAX_PAIR_ROWS]:
+            self.pair_tree.insert("", "end", values=(a.get('name', ''), b.get('name', ''), n, f"{rate * 100:.1f}%"))
+        for a, b, n, rate in result['color_pairs']:
+            self.color_tree.insert("", "end", values=(a, b, n, f"{rate * 100:.1f}%"))
+        for boss, n, rate in result['bosses']:
+            self.boss_tree.insert("", "end", values=(boss.get('name', ''), n, f"{rate * 100:.1f}%"))
+
+        status = f"{result['deck_count']} 件のデッキを集計しました。"
+        if result['failed']:
+            status += f" 読込失敗: {len(result['failed'])} 件。"
+        if result['unresolved']:
+            status += f" 見つからないカード: {len(result['unresolved'])} 種類。"
+        self.status_var.set(status)
+        self.export_button.config(state="normal")
+
+    def export(self):
+        if not self.result:
+            return
+        output_dir = filedialog.askdirectory(title="CSVの出力先フォルダを選択", initialdir=self.result['directory'], parent=self)
+        if not output_dir:
+            return
+        import deckarchive
+        try:
+            written = deckarchive.export_csv(self.result, output_dir)
+        except Exception as e:
+            messagebox.showerror("保存エラー", f"CSVの出力中にエラーが発生しました:\n{e}", parent=self)
+            return
+        NonModalInfo(self, "保存完了", f"{len(written)} 件のCSVファイルを出力しました。")
+
+# テキスト形式のデッキリストの読込・書き出しウィンドウ
+class DecklistTextWindow(tk.Toplevel):
+    def __init__(self, master, catalog, export_getter, apply_callback):
+        super().__init__(master)
+        self.title("デッキリスト (テキスト)")
+        self.transient(master)
+        self.geometry("420x520")
+        self.catalog = catalog
+        self.export_getter = export_getter # () → 現在のデッキのテキスト
+        self.apply_callback = apply_callback # (BOSSのカードデータ, [(カードデータ, 枚数)]) をデッキに反映する
+
+        self.create_widgets()
+        self.text.insert("1.0", self.export_getter())
+
+    def create_widgets(self):
+        main_frame = tk.Frame(self, padx=10, pady=10)
+        main_frame.pack(fill="both", expand=True)
+
+        tk.Label(main_frame, text="1行に「枚数 カード名」、BOSSは「BOSS: カード名」と書きます。", anchor="w").pack(fill="x")
+        text_frame = tk.Frame(main_frame)
+        text_frame.pack(fill="both", expand=True, pady=5)
+        self.text = tk.Text(text_frame, wrap="none", undo=True)
+        scrollbar = ttk.Scrollbar(text_frame, orient="vertical", command=self.text.yview)
+        self.text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.text.pack(side="left", fill="both", expand=True)
+
+        button_frame = tk.Frame(main_frame)
+        button_frame.pack(fill="x")
+        tk.Button(button_frame, text="貼り付け", command=self.paste_from_clipboard).pack(side="left")
+        tk.Button(button_frame, text="コピー", command=self.copy_to_clipboard).pack(side="left", padx=5)
+        tk.Button(button_frame, text="現在のデッキ", command=self.show_current_deck).pack(side="left")
+        tk.Button(button_frame, text="デッキに読込", command=self.import_deck).pack(side="right")
+
+    def paste_from_clipboard(self):
+        try:
+            clipboard = self.clipboard_get()
+        except tk.TclError:
+            messagebox.showinfo("情報", "クリップボードにテキストがありません。", parent=self)
+            return
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", clipboard)
+
+    def copy_to_clipboard(self):
+        self.clipboard_clear()
+        self.clipboard_append(self.text.get("1.0", "end-1c"))
+        NonModalInfo(self, "コピー", "デッキリストをクリップボードにコピーしました。")
+
+    def show_current_deck(self):
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", self.export_getter())
+
+    def import_deck(self):
+        import decklist
+        result = decklist.parse_decklist(self.text.get("1.0", "end-1c"), self.catalog)
+        if not result.deck_cards and result.boss_card is None:
+            messagebox.showwarning("読込エラー", "\n".join(result.errors) or "カードが指定されていません。", parent=self)
+            return
+
+        # 見つからない行・推定で解決した行はまとめて1回だけ確認する
+        if result.errors or result.warnings:
+            report = "\n".join(result.errors + result.warnings)
+            if not messagebox.askyesno("確認", f"{report}\n\nこの内容でデッキに読み込みますか？", parent=self):
+                return
+        self.apply_callback(result.boss_card, result.deck_cards)
@@ -0,0 +1,181 @@
+"""
+1人回し(ゴールドフィッシュ)によるマナカーブ・色事故のシミュレーション。
+
+モデル (相手なし・カードは使わずに手札に残す):
+- 先攻/後攻の設定に従ってドローし、毎ターン手札から1枚をマナとして置く。
+  置くカードは土地を優先し、土地がなければ手札で最もコストの高いカードを選ぶ。
+- 使えるマナは置いたカードの枚数。属性ごとの発生源は、置いたカードのうちその属性を持つ枚数。
+- カードはコストがマナ以下で、各属性の必要数(colorの値)を発生源が満たしていれば使える。
+
+集計する値 (ターンごと):
+- curve_hit: マナをちょうど使い切るコストのカードを使える割合
+- color_screw: マナは足りるカードがあるのに、属性が足りずにどれも使えない割合
+- castable_cost: 使えるカードの最大コストの平均 (使えるカードがなければ0)
+- missed_charge: 手札が空でマナを置けなかった割合
+
+ゲームはチャンクに分けてプロセスプールで並列に処理する。各チャンクはNumPyがあれば配列でまとめて、
+なければ1ゲームずつ処理する。
+"""
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import constants as const
+
+try:
+    import numpy as np
+except ImportError: # NumPyがない環境では純Pythonの実装を使う
+    np = None
+
+METRICS = ("mana", "curve_hit", "color_screw", "castable_cost", "missed_charge")
+CHUNK_GAMES = 20000 # 1回の配列処理(またはプロセスへの1依頼)で回すゲーム数
+
+
+def build_deck_arrays(deck_cards):
+    """
+    [(カードデータ, 枚数)] から、山札1枚ごとの (コスト, 属性の必要数, 土地か) のリストを作る。
+    """
+    costs, pips, lands = [], [], []
+    for card, qty in deck_cards:
+        cost = card.get('cost', 0)
+        cost = cost if isinstance(cost, int) else 0
+        color = card.get('color') or {}
+        card_pips = tuple(int(color.get(c, 0) or 0) for c in const.COLORS)
+        is_land = card.get('card_type') == const.CARD_TYPE_TERRITORY
+        for _ in range(qty):
+            costs.append(cost)
+            pips.append(card_pips)
+            lands.append(is_land)
+    return costs, pips, lands
+
+
+def simulate(deck_cards, games, turns, hand_size=const.OPENING_HAND_SIZE, draws_per_turn=const.DRAWS_PER_TURN,
+             on_play=True, seed=None, report=None, cancel_check=None):
+    """
+    シミュレーションを実行し、{指標名: [ターンごとの平均値]} と 'games' を持つ辞書を返す。
+    reportは (完了ゲーム数, 総ゲーム数) で、cancel_checkはチャンクごとに呼ばれる。
+    """
+    deck = build_deck_arrays(deck_cards)
+    if not deck[0]:
+        raise ValueError("デッキにカードがありません。")
+    settings = (turns, hand_size, draws_per_turn, on_play)
+    chunks = [min(CHUNK_GAMES, games - start) for start in range(0, games, CHUNK_GAMES)]
+    seeds = random.Random(seed).sample(range(2 ** 31), len(chunks))
+
+    totals = {m: [0.0] * turns for m in METRICS}
+    done = 0
+
+    def add(chunk_sums, chunk_games):
+        nonlocal done
+        for m in METRICS:
+            totals[m] = [t + s for t, s in zip(totals[m], chunk_sums[m])]
+        done += chunk_games
+        if report:
+            report(done, games)
+
+    simulate_chunk = _simulate_chunk_numpy if np is not None else _simulate_chunk_python
+    if len(chunks) == 1:
+        # 小さな試行はプロセス起動の方が高くつくのでその場で実行する
+        add(simulate_chunk(deck, chunks[0], settings, seeds[0]), chunks[0])
+    else:
+        with ProcessPoolExecutor(max_workers=min(len(chunks), os.cpu_count() or 1)) as pool:
+            futures = [pool.submit(simulate_chunk, deck, n, settings, s) for n, s in zip(chunks, seeds)]
+            try:
+                for future, chunk_games in zip(futures, chunks):
+                    if cancel_check:
+                        cancel_check()
+                    add(future.result(), chunk_games)
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    result = {m: [t / games for t in totals[m]] for m in METRICS}
+    result['games'] = games
+    return result
+
+
+def _simulate_chunk_numpy(deck, games, settings, seed):
+    """games回分のゲームを配列でまとめて処理し、指標ごとのターン別合計値を返す"""
+    turns, hand_size, draws_per_turn, on_play = settings
+    costs = np.array(deck[0], dtype=np.int16)
+    pips = np.array(deck[1], dtype=np.int8)
+    lands = np.array(deck[2], dtype=bool)
+    deck_size = len(costs)
+    seen_by_turn = [min(deck_size, hand_size + draws_per_turn * max(t - 1 if on_play else t, 0)) for t in range(1, turns + 1)]
+    depth = max(seen_by_turn)
+
+    # 各行が1ゲームの山札の並び。使うのは上からdepth枚だけ
+    rng = np.random.default_rng(seed)
+    order = rng.permuted(np.tile(np.arange(deck_size), (games, 1)), axis=1)[:, :depth]
+    card_cost = costs[order] # (ゲーム, 枚)
+    card_pips = pips[order] # (ゲーム, 枚, 属性)
+    card_colored = card_pips > 0 # マナに置いたときに発生源になる属性
+    # 土地を最優先、次にコストの高いカードからマナに置く
+    priority = np.where(lands[order], 1000, 0) + card_cost
+
+    charged = np.zeros((games, depth), dtype=bool)
+    sources = np.zeros((games, len(const.COLORS)), dtype=np.int8)
+    mana = np.zeros(games, dtype=np.int16)
+    rows = np.arange(games)
+    sums = {m: [] for m in METRICS}
+
+    for seen in seen_by_turn:
+        in_hand = (np.arange(depth) < seen) & ~charged
+        can_charge = in_hand.any(axis=1)
+        choice = np.where(in_hand, priority, -1).argmax(axis=1)
+        charged[rows[can_charge], choice[can_charge]] = True
+        in_hand[rows[can_charge], choice[can_charge]] = False
+        sources += card_colored[rows, choice] & can_charge[:, None]
+        mana += can_charge
+
+        affordable = in_hand & (card_cost <= mana[:, None])
+        castable = affordable & (card_pips <= sources[:, None, :]).all(axis=2)
+        any_castable = castable.any(axis=1)
+
+        sums["mana"].append(float(mana.sum(dtype=np.int64)))
+        sums["curve_hit"].append(float((castable & (card_cost == mana[:, None])).any(axis=1).sum()))
+        sums["color_screw"].append(float((affordable.any(axis=1) & ~any_castable).sum()))
+        sums["castable_cost"].append(float(np.where(castable, card_cost, 0).max(axis=1).sum(dtype=np.int64)))
+        sums["missed_charge"].append(float((~can_charge).sum()))
+    return sums
+
+
+def _simulate_chunk_python(deck, games, settings, seed):
+    """NumPyがない場合の実装。プロセスプールのワーカーで実行される。"""
+    turns, hand_size, draws_per_turn, on_play = settings
+    costs, pips, lands = deck
+    deck_size = len(costs)
+    priority = [(1000 if land else 0) + cost for cost, land in zip(costs, lands)]
+    colored = [[i for i, p in enumerate(card_pips) if p > 0] for card_pips in pips]
+    rng = random.Random(seed)
+    sums = {m: [0.0] * turns for m in METRICS}
+    order = list(range(deck_size))
+
+    for _ in range(games):
+        rng.shuffle(order)
+        hand = []
+        drawn = 0
+        mana = 0
+        sources = [0] * len(const.COLORS)
+        for t in range(turns):
+            seen = min(deck_size, hand_size + draws_per_turn * max(t if on_play else t + 1, 0))
+            hand.extend(order[drawn:seen])
+            drawn = max(drawn, seen)
+            if hand:
+                choice = max(hand, key=priority.__getitem__)
+                hand.remove(choice)
+                mana += 1
+                for c in colored[choice]:
+                    sources[c] += 1
+            else:
+                sums["missed_charge"][t] += 1
+
+            affordable = [i for i in hand if costs[i] <= mana]
+            castable = [i for i in affordable if all(p <= s for p, s in zip(pips[i], sources))]
+            sums["mana"][t] += mana
+            if any(costs[i] == mana for i in castable):
+                sums["curve_hit"][t] += 1
+            if affordable and not castable:
+                sums["color_screw"][t] += 1
+            sums["castable_cost"][t] += max((costs[i] for i in castable), default=0)
+    return sums
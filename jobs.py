@@ -0,0 +1,159 @@
+import queue
+import threading
+import traceback
+
+
+class JobCancelled(Exception):
+    """ジョブがキャンセルされたことを示す例外"""
+
+
+class Job:
+    """
+    ワーカースレッドで実行中のジョブ。
+    ワーカー側はreport()で進捗を送り、check_cancelled()でキャンセルを確認する。
+    """
+    def __init__(self):
+        self.messages = queue.Queue() # ワーカー → Tkスレッドへの通知
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """キャンセルを要求する (ワーカーは次のcheck_cancelled()で中断する)"""
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def report(self, done, total, message=""):
+        """進捗を通知する (どのスレッドから呼んでもよい)"""
+        self.messages.put(("progress", done, total, message))
+
+
+def run_job(master, work, on_progress=None, on_done=None, on_error=None, on_cancel=None, poll_interval=50):
+    """
+    work(job) をワーカースレッドで実行し、進捗と結果をafter()のポーリングでTkスレッドのコールバックに渡す。
+    コールバックはすべてTkスレッドから呼ばれるので、ウィジェットを直接操作してよい。
+
+    Returns:
+        Job: キャンセル要求に使うジョブオブジェクト
+    """
+    job = Job()
+
+    def target():
+        try:
+            result = work(job)
+        except JobCancelled:
+            job.messages.put(("cancelled",))
+        except Exception as e:
+            traceback.print_exc()
+            job.messages.put(("error", e))
+        else:
+            job.messages.put(("done", result))
+
+    def poll():
+        last_progress = None
+        while True:
+            try:
+                message = job.messages.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                last_progress = message[1:] # 溜まった進捗は最新のものだけ反映する
+                continue
+            if last_progress and on_progress:
+                on_progress(*last_progress)
+            callback = {"done": on_done, "error": on_error, "cancelled": on_cancel}[message[0]]
+            if callback:
+                callback(*message[1:])
+            return
+        if last_progress and on_progress:
+            on_progress(*last_progress)
+        master.after(poll_interval, poll)
+
+    threading.Thread(target=target, daemon=True).start()
+    master.after(poll_interval, poll)
+    return job
+
+
+class LatestOnlyWorker:
+    """
+    依頼を1本のワーカースレッドで処理する。未着手の依頼は最新の1件だけを残し、古いものは実行せずに捨てる。
+    結果は最新の依頼のものだけを、after()のポーリングでTkスレッドのコールバックに渡す。
+    submit()とdiscard()はTkスレッドから呼ぶこと。
+    """
+    def __init__(self, master, on_result, on_error=None, poll_interval=30):
+        self.master = master
+        self.on_result = on_result
+        self.on_error = on_error
+        self.poll_interval = poll_interval
+
+        self._cond = threading.Condition()
+        self._pending = None # 未着手の依頼 (token, func, args)
+        self._results = queue.Queue()
+        self._token = 0 # 最後に受け付けた依頼の番号
+        self._delivered = 0 # 結果を渡し終えた(または破棄した)依頼の番号
+        self._polling = False
+
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def submit(self, func, *args):
+        """func(*args) の実行を依頼する。未着手の古い依頼は置き換えられる。"""
+        with self._cond:
+            self._token += 1
+            self._pending = (self._token, func, args)
+            self._cond.notify()
+        if not self._polling:
+            self._polling = True
+            self.master.after(self.poll_interval, self._poll)
+        return self._token
+
+    @property
+    def busy(self):
+        """結果をまだ渡していない依頼があるか"""
+        return self._delivered < self._token
+
+    def discard(self):
+        """未着手の依頼を取り消し、実行中の依頼の結果も捨てる"""
+        with self._cond:
+            self._token += 1
+            self._pending = None
+        self._delivered = self._token
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                token, func, args = self._pending
+                self._pending = None
+            try:
+                self._results.put((token, True, func(*args)))
+            except Exception as e:
+                traceback.print_exc()
+                self._results.put((token, False, e))
+
+    def _poll(self):
+        latest = None
+        while True:
+            try:
+                item = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == self._token:
+                latest = item # 古い依頼の結果は使わない
+        if latest is not None:
+            self._delivered = latest[0]
+            ok, value = latest[1], latest[2]
+            if ok:
+                self.on_result(value)
+            elif self.on_error:
+                self.on_error(value)
+
+        if self._delivered < self._token:
+            self.master.after(self.poll_interval, self._poll)
+        else:
+            self._polling = False
@@ -0,0 +1,114 @@
+"""
+カードのレイアウトのはみ出しを確認する (描画はせず、レイアウトの計算だけを行う)。
+
+確認する内容:
+- カード名の幅がテンプレートの最大幅 (name.max_width) を超えていないか / 3行目以降が表示されずに消えていないか
+- 効果テキストの最後の行がフッター(カードタイプ)の上端を越えていないか
+- 効果テキストが右の枠線を越えていないか
+- 特徴の文字列が左端(またはPOW)に重なっていないか
+
+datas/ 全体の確認はプロセスプールで並列に行う。単体で実行すると結果を表示する:
+    python layout_lint.py
+"""
+import json
+import os
+import sys
+
+import constants as const
+import render_pool
+import utils
+
+PARAM_POW_GAP = 4 # POWと特徴の間に最低限必要な余白 (px)
+PARALLEL_MIN_FILES = 32 # これより少ないファイル数はプールを使わずにその場で確認する
+
+
+def lint_card(card, config, renderer=None):
+    """
+    1枚のカードデータ(辞書)を確認し、問題のリストを返す。
+    問題は {'part': 部位, 'pixels': はみ出し量, 'message': 説明} の辞書。
+    """
+    if renderer is None:
+        renderer = render_pool.worker_renderer()
+
+    name_lines = [line.strip() for line in card.get("name", "").split('\n') if line.strip()]
+    m = renderer.measure_card(card, card.get("card_type", ""), name_lines, config)
+
+    issues = []
+    def add(part, pixels, message):
+        issues.append({'part': part, 'pixels': int(pixels), 'message': message})
+
+    max_name_width = m["name_max_width"]
+    for i, width in enumerate(m["name_widths"], 1):
+        if width > max_name_width:
+            add("カード名", width - max_name_width, f"カード名の{i}行目が最大幅を {width - max_name_width}px 超えています。")
+    if m["name_hidden_lines"]:
+        add("カード名", 0, f"カード名の3行目以降 ({m['name_hidden_lines']}行) は表示されません。")
+
+    if m["effects_bottom"] is not None and m["effects_bottom"] > m["footer_top"]:
+        over = m["effects_bottom"] - m["footer_top"]
+        add("効果", over, f"効果テキストがフッターに {over}px はみ出しています。")
+    right_limit = m["effects_right_limit"]
+    if m["effects_right"] is not None and m["effects_right"] > right_limit:
+        over = m["effects_right"] - right_limit
+        add("効果", over, f"効果テキストが右の枠線を {over}px 越えています。")
+
+    if m["param_left"] is not None:
+        left_limit = m["pow_right"] + PARAM_POW_GAP if m["pow_right"] is not None else m["param_min_left"]
+        if m["param_left"] < left_limit:
+            over = left_limit - m["param_left"]
+            target = "POW" if m["pow_right"] is not None else "左端"
+            add("特徴", over, f"特徴が{target}に {over}px 重なっています。")
+    return issues
+
+
+def _lint_files(filepaths, config):
+    """ファイルのリストを確認し、[(パス, 問題のリスト)] を返す。プロセスプールのワーカーで実行される。"""
+    results = []
+    for filepath in filepaths:
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                card = json.load(f)
+            issues = lint_card(card, config)
+        except Exception as e:
+            issues = [{'part': "読込", 'pixels': 0, 'message': f"確認できませんでした: {e}"}]
+        results.append((filepath, issues))
+    return results
+
+
+def find_card_files(data_dir=const.DATA_DIR):
+    paths = []
+    for root, _, files in os.walk(data_dir):
+        paths.extend(os.path.join(root, f) for f in files if f.endswith(".json"))
+    return sorted(paths)
+
+
+def lint_catalog(config, data_dir=const.DATA_DIR, report=None, cancel_check=None):
+    """
+    datas/ 内のすべてのカードを確認し、問題のあったカードだけを [(パス, 問題のリスト)] で返す。
+    reportは (確認済み件数, 総件数, メッセージ) で、cancel_checkはチャンクごとに呼ばれる。
+    """
+    paths = find_card_files(data_dir)
+    total = len(paths)
+    found = []
+    done = 0
+    for chunk, results in render_pool.map_chunks(_lint_files, paths, PARALLEL_MIN_FILES, config):
+        if cancel_check:
+            cancel_check()
+        found.extend((path, issues) for path, issues in results if issues)
+        done += len(chunk)
+        if report:
+            report(done, total, f"確認中... ({done}/{total})")
+    return found
+
+
+def format_issues(issues):
+    return "\n".join(f"・{issue['message']}" for issue in issues)
+
+
+if __name__ == '__main__':
+    found = lint_catalog(utils.load_config())
+    for path, issues in found:
+        print(os.path.relpath(path, const.DATA_DIR))
+        print(format_issues(issues))
+    print(f"{len(found)} 枚のカードに問題があります。" if found else "問題はありません。")
+    sys.exit(1 if found else 0)
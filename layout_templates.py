@@ -0,0 +1,124 @@
+"""
+カードタイプごとのレイアウトテンプレート (templates.json) を読み込み、描画に使うレイアウトプランにコンパイルする。
+
+templates.json の "templates" には、カードタイプ名 (該当がなければ "base") ごとに各領域の
+位置・フォント・スタイルを書く。"extends" で別のテンプレートを引き継ぎ、領域を null にするとその領域は描画しない。
+領域の項目は次のように解決する:
+- "font" / "○○_font": 文字列なら設定の font_sizes の値、数値ならそのサイズ
+- "offset_○○": 設定の offsets の値を項目 "○○" に加算する
+- {"option": キー, "default": 値}: 設定の layout_options の値
+
+コンパイル結果は (カードタイプ, 設定) ごとにキャッシュし、カードごとにテンプレートを解釈し直さない。
+templates.json が更新された場合は次の描画で読み込み直す。
+"""
+import json
+import os
+
+import constants as const
+
+DEFAULT_TEMPLATE = "base" # カードタイプに対応するテンプレートがない場合に使う
+REGION_NAMES = ("frame", "art", "name", "cost", "spell_mana", "pow", "param", "effects", "footer")
+PLAN_CACHE_SIZE = 64 # コンパイル済みプランのキャッシュ件数の上限
+
+_loaded = None # (templates.jsonの更新時刻, 継承を解決したテンプレート, マナの色, 既定の色)
+_plan_cache = {} # (カードタイプ, 設定のキー) → LayoutPlan
+
+
+class Region:
+    """コンパイル済みの領域。テンプレートの各項目を (フォント・オフセットを解決した値で) 属性として持つ"""
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+
+class LayoutPlan:
+    """1つのカードタイプ・設定についての、描画に使う座標・フォントサイズ・スタイル"""
+    def __init__(self, card_type_name, regions, mana_colors, default_mana_color):
+        self.card_type_name = card_type_name
+        for name in REGION_NAMES:
+            setattr(self, name, regions.get(name)) # 描画しない領域は None
+        self.mana_colors = mana_colors
+        self.default_mana_color = default_mana_color
+
+
+def _merge(base, override):
+    merged = dict(base)
+    for name, spec in override.items():
+        if name == "extends":
+            continue
+        if isinstance(spec, dict) and isinstance(merged.get(name), dict):
+            merged[name] = {**merged[name], **spec}
+        else:
+            merged[name] = spec
+    return merged
+
+
+def _resolve(name, raw, resolving=()):
+    """"extends" を辿って親テンプレートの内容を引き継いだテンプレートを返す"""
+    if name in resolving:
+        raise ValueError(f"テンプレート '{name}' の継承が循環しています。")
+    if name not in raw:
+        raise ValueError(f"テンプレート '{name}' が見つかりません。")
+    spec = raw[name]
+    parent = spec.get("extends")
+    if not parent:
+        return _merge({}, spec)
+    return _merge(_resolve(parent, raw, resolving + (name,)), spec)
+
+
+def load_templates(path=const.TEMPLATES_FILE):
+    """templates.json を読み込み、(継承を解決したテンプレート, マナの色, 既定の色) を返す"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    raw = data.get("templates", {})
+    templates = {name: _resolve(name, raw) for name in raw}
+    if DEFAULT_TEMPLATE not in templates:
+        raise ValueError(f"テンプレート '{DEFAULT_TEMPLATE}' がありません。")
+    for name, template in templates.items():
+        unknown = set(template) - set(REGION_NAMES)
+        if unknown:
+            raise ValueError(f"テンプレート '{name}' に不明な領域があります: {', '.join(sorted(unknown))}")
+    mana_colors = {color: tuple(rgb) for color, rgb in data.get("mana_colors", {}).items()}
+    return templates, mana_colors, tuple(data.get("default_mana_color", (128, 128, 128)))
+
+
+def _current_templates():
+    """読み込み済みのテンプレート。templates.json が更新されていれば読み込み直す"""
+    global _loaded
+    mtime = os.path.getmtime(const.TEMPLATES_FILE)
+    if _loaded is None or _loaded[0] != mtime:
+        _loaded = (mtime,) + load_templates()
+        _plan_cache.clear()
+    return _loaded[1:]
+
+
+def _compile_region(spec, config):
+    values = {}
+    offsets = []
+    for key, value in spec.items():
+        if key.startswith("offset_"):
+            offsets.append((key[len("offset_"):], value))
+        elif isinstance(value, dict) and "option" in value:
+            values[key] = config.get("layout_options", {}).get(value["option"], value.get("default"))
+        elif key == "font" or key.endswith("_font"):
+            values[key] = config["font_sizes"][value] if isinstance(value, str) else value
+        else:
+            values[key] = value
+    for target, offset_key in offsets:
+        values[target] = values.get(target, 0) + config.get("offsets", {}).get(offset_key, 0)
+    return Region(values)
+
+
+def compile_plan(card_type_name, config):
+    """カードタイプと描画設定からレイアウトプランを作る。同じ組み合わせはキャッシュを返す"""
+    templates, mana_colors, default_mana_color = _current_templates()
+    config_key = json.dumps({k: config.get(k) for k in ("offsets", "font_sizes", "layout_options")}, sort_keys=True)
+    key = (card_type_name, config_key)
+    plan = _plan_cache.get(key)
+    if plan is None:
+        template = templates.get(card_type_name, templates[DEFAULT_TEMPLATE])
+        regions = {name: _compile_region(spec, config) for name, spec in template.items() if spec is not None}
+        plan = LayoutPlan(card_type_name, regions, mana_colors, default_mana_color)
+        if len(_plan_cache) >= PLAN_CACHE_SIZE:
+            _plan_cache.clear()
+        _plan_cache[key] = plan
+    return plan
@@ -0,0 +1,103 @@
+"""
+マナのアイコン (色で塗った円 + 数値) のスプライト。
+
+アイコンは (サイズ, 数値のフォント, 色の組, 枠線の太さ) ごとに、すべての色 × 数値 (なし, 1〜MAX_ATLAS_VALUE) を
+1枚の画像 (アトラス) にまとめて一度だけ描画し、カードにはそこから切り出したスプライトをアルファ付きで貼り付ける。
+効果テキスト中の {赤} や {赤2} のようなトークンもこのアイコンで描画する。
+"""
+import re
+import threading
+
+from PIL import Image, ImageDraw
+
+MAX_ATLAS_VALUE = 9 # アトラスに前もって描いておく数値の最大値 (これを超える数値は必要になったときに描く)
+ATLAS_CACHE_SIZE = 32 # 保持するアトラスの数の上限
+
+_atlases = {}
+_atlas_lock = threading.Lock()
+_token_patterns = {}
+
+
+class ManaAtlas:
+    """1つのサイズのマナアイコンを、すべての色 × 数値についてまとめて描いた画像"""
+    def __init__(self, size, font, colors, default_color, outline_width):
+        self.size = size
+        self.font = font
+        self.colors = dict(colors)
+        self.default_color = default_color
+        self.outline_width = outline_width
+        self.cell = size + 1 # 円の外接矩形 (x0, y0, x0 + size, y0 + size) は size + 1 画素になる
+        self._sprites = {}
+
+        values = [None] + list(range(1, MAX_ATLAS_VALUE + 1))
+        self.sheet = Image.new("RGBA", (self.cell * len(values), self.cell * max(len(self.colors), 1)), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(self.sheet)
+        self._boxes = {}
+        for row, color in enumerate(self.colors):
+            for col, value in enumerate(values):
+                x0, y0 = col * self.cell, row * self.cell
+                self._draw_icon(draw, x0, y0, self.colors[color], value)
+                self._boxes[(color, value)] = (x0, y0, x0 + self.cell, y0 + self.cell)
+
+    def _draw_icon(self, draw, x0, y0, rgb, value):
+        size = self.size
+        draw.ellipse((x0, y0, x0 + size, y0 + size), fill=rgb, outline="black", width=self.outline_width)
+        if value is None:
+            return
+        text = str(value)
+        bbox = draw.textbbox((0, 0), text, font=self.font)
+        cw, ch = bbox[2] - bbox[0], bbox[3] - bbox[1]
+        draw.text((x0 + size/2 - cw/2, y0 + size/2 - ch/2), text, font=self.font, fill="black")
+
+    def icon(self, color, value=None):
+        """(色, 数値) のスプライト (RGBA)。数値がNoneの場合は数値なしの円"""
+        key = (color, value)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            box = self._boxes.get(key)
+            if box is not None:
+                sprite = self.sheet.crop(box)
+            else: # アトラスにない色・数値は個別に描く (フォントを複数スレッドで同時に使わないようロックする)
+                sprite = Image.new("RGBA", (self.cell, self.cell), (0, 0, 0, 0))
+                with _atlas_lock:
+                    self._draw_icon(ImageDraw.Draw(sprite), 0, 0, self.colors.get(color, self.default_color), value)
+            self._sprites[key] = sprite
+        return sprite
+
+
+def get_atlas(size, font, colors, default_color=(128, 128, 128), outline_width=1):
+    """サイズ・フォント・色の組に対応するアトラス。初めての組み合わせのときだけ描画する"""
+    key = (size, getattr(font, "path", None), getattr(font, "size", None), getattr(font, "layout_engine", None),
+           tuple(colors.items()), tuple(default_color), outline_width)
+    atlas = _atlases.get(key)
+    if atlas is None:
+        with _atlas_lock:
+            atlas = _atlases.get(key)
+            if atlas is None:
+                if len(_atlases) >= ATLAS_CACHE_SIZE:
+                    _atlases.clear()
+                atlas = _atlases[key] = ManaAtlas(size, font, colors, default_color, outline_width)
+    return atlas
+
+
+def split_tokens(text, colors):
+    """
+    テキストを文字列と (色, 数値) のトークンに分けたリストを返す。
+    トークンは {赤} (数値なし) や {赤2} の形式で、colorsにない色の {…} はそのまま文字列として扱う。
+    """
+    key = tuple(colors)
+    if "{" not in text or not key:
+        return [text]
+    pattern = _token_patterns.get(key)
+    if pattern is None:
+        pattern = _token_patterns[key] = re.compile(r"\{(" + "|".join(map(re.escape, key)) + r")(\d*)\}")
+    pieces = []
+    pos = 0
+    for m in pattern.finditer(text):
+        if m.start() > pos:
+            pieces.append(text[pos:m.start()])
+        pieces.append((m.group(1), int(m.group(2)) if m.group(2) else None))
+        pos = m.end()
+    if pos < len(text):
+        pieces.append(text[pos:])
+    return pieces
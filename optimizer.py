@@ -0,0 +1,220 @@
+"""
+カードプールからデッキを探索するオプティマイザ (焼きなまし法による局所探索)。
+
+デッキはプールのカードごとの枚数ベクトルで表し、1枚抜いて1枚入れる入れ替えを候補として評価する。
+評価値は属性・コスト帯・特徴の集計値だけから計算するので、入れ替え1回の評価は
+2枚分の差分を足し引きするだけで済む (デッキ全体を数え直さない)。
+独立した探索(リスタート)をプロセスプールで並列に実行し、最も評価の良いデッキを返す。
+
+評価値 (小さいほど良い):
+- 属性の割合と目標割合の差の二乗和 (目標を指定した場合のみ)
+- コスト帯ごとの枚数と目標枚数の差の二乗和 (デッキ枚数で正規化)
+- 各ターンまでにそのターンで使えるコストのカードを1枚以上引けない確率の和 (超幾何分布)
+- 必須特徴の不足枚数の二乗
+"""
+import math
+import multiprocessing
+import os
+import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import constants as const
+import deckstats
+
+MAX_COST_BUCKET = 6 # コスト6以上は同じコスト帯にまとめる
+COST_BUCKETS = tuple(range(1, MAX_COST_BUCKET + 1)) # 1 ～ 6+ (コスト0以下は1に含める)
+
+COLOR_WEIGHT = 20.0
+CURVE_WEIGHT = 1.0
+PLAY_WEIGHT = 1.0
+PARAM_WEIGHT = 5.0
+
+STOP_CHECK_INTERVAL = 5000 # 焼きなましで中止の要求を確認する間隔 (反復回数)
+CANCEL_POLL_SECONDS = 0.2 # 探索の完了を待つ間に中止を確認する間隔 (秒)
+
+
+def _cost_bucket(card):
+    cost = card.get('cost', 0)
+    cost = cost if isinstance(cost, int) else 0
+    return min(max(cost, 1), MAX_COST_BUCKET) - 1
+
+
+class DeckProblem:
+    """
+    探索条件をまとめたもの。プロセスプールに渡すため、カードデータではなく特徴量だけを持つ。
+
+    Args:
+        pool_cards (list): 候補のカードデータ (BOSSは含めない)
+        deck_size (int): デッキ枚数
+        color_targets (dict): {属性: 目標割合(0～1)}。空なら属性は評価しない
+        curve_targets (list): コスト帯(1～6+)ごとの目標枚数。Noneなら評価しない
+        param_targets (dict): {特徴: 最低枚数}
+        turns, hand_size, draws_per_turn, on_play: 使えるカードの確率を計算する条件
+    """
+    def __init__(self, pool_cards, deck_size, color_targets=None, curve_targets=None, param_targets=None,
+                 turns=5, hand_size=const.OPENING_HAND_SIZE, draws_per_turn=const.DRAWS_PER_TURN, on_play=True,
+                 max_copies=const.MAX_COPIES):
+        self.deck_size = deck_size
+        self.max_copies = max_copies
+        self.color_targets = tuple((color_targets or {}).get(c, 0.0) for c in const.COLORS) if color_targets else None
+        self.curve_targets = tuple(curve_targets) if curve_targets else None
+        self.param_names = tuple(param_targets or {})
+        self.param_minimums = tuple((param_targets or {}).values())
+        self.samples = tuple(deckstats.cards_seen(t, hand_size, draws_per_turn, on_play) for t in range(1, turns + 1))
+
+        # カードごとの特徴: (属性の有無のタプル, コスト帯, 特徴の有無のタプル)
+        self.features = []
+        for card in pool_cards:
+            color = card.get('color') or {}
+            params = card.get('param') or []
+            self.features.append((
+                tuple(1 if color.get(c, 0) > 0 else 0 for c in const.COLORS),
+                _cost_bucket(card),
+                tuple(1 if p in params else 0 for p in self.param_names),
+            ))
+
+    def __len__(self):
+        return len(self.features)
+
+
+class DeckState:
+    """枚数ベクトルと集計値を持ち、入れ替え1回分の評価値を差分で計算する"""
+    def __init__(self, problem, counts):
+        self.problem = problem
+        self.counts = list(counts)
+        self.colors = [0] * len(const.COLORS)
+        self.curve = [0] * len(COST_BUCKETS)
+        self.params = [0] * len(problem.param_names)
+        for idx, qty in enumerate(self.counts):
+            if qty:
+                self._add(idx, qty, self.colors, self.curve, self.params)
+        self.score = self.evaluate(self.colors, self.curve, self.params)
+
+    def _add(self, idx, qty, colors, curve, params):
+        card_colors, bucket, card_params = self.problem.features[idx]
+        for i, has in enumerate(card_colors):
+            if has:
+                colors[i] += qty
+        curve[bucket] += qty
+        for i, has in enumerate(card_params):
+            if has:
+                params[i] += qty
+
+    def evaluate(self, colors, curve, params):
+        """集計値から評価値を計算する (小さいほど良い)"""
+        problem = self.problem
+        size = problem.deck_size
+        score = 0.0
+        if problem.color_targets:
+            score += COLOR_WEIGHT * sum((n / size - target) ** 2 for n, target in zip(colors, problem.color_targets))
+        if problem.curve_targets:
+            score += CURVE_WEIGHT * sum((n - target) ** 2 for n, target in zip(curve, problem.curve_targets)) / size
+        # tターン目までに、コストt以下のカードを1枚以上引けない確率 (キャッシュ済みの超幾何分布)
+        playable = 0
+        for turn, sample in enumerate(problem.samples):
+            if turn < len(curve):
+                playable += curve[turn]
+            score += PLAY_WEIGHT * (1.0 - deckstats.prob_at_least(size, playable, sample, 1))
+        for n, minimum in zip(params, problem.param_minimums):
+            if n < minimum:
+                score += PARAM_WEIGHT * (minimum - n) ** 2
+        return score
+
+    def swap_score(self, out_idx, in_idx):
+        """out_idxを1枚抜いてin_idxを1枚入れた場合の評価値を返す (状態は変えない)"""
+        colors, curve, params = self.colors[:], self.curve[:], self.params[:]
+        self._add(out_idx, -1, colors, curve, params)
+        self._add(in_idx, 1, colors, curve, params)
+        return self.evaluate(colors, curve, params)
+
+    def apply_swap(self, out_idx, in_idx, score):
+        self.counts[out_idx] -= 1
+        self.counts[in_idx] += 1
+        self._add(out_idx, -1, self.colors, self.curve, self.params)
+        self._add(in_idx, 1, self.colors, self.curve, self.params)
+        self.score = score
+
+
+def random_counts(problem, rng):
+    """枚数上限を守ってランダムにデッキを作る"""
+    counts = [0] * len(problem)
+    slots = [idx for idx in range(len(problem)) for _ in range(problem.max_copies)]
+    for idx in rng.sample(slots, problem.deck_size):
+        counts[idx] += 1
+    return counts
+
+
+def anneal(problem, initial_counts, iterations, seed, stop_event=None):
+    """
+    焼きなまし法で1回分の探索を行い、(最良の評価値, 最良の枚数ベクトル) を返す。
+    プロセスプールのワーカーで実行される。stop_eventがセットされたら、その時点の最良の結果で打ち切る。
+    """
+    rng = random.Random(seed)
+    state = DeckState(problem, initial_counts or random_counts(problem, rng))
+    best_score, best_counts = state.score, state.counts[:]
+    n = len(problem)
+    max_copies = problem.max_copies
+    start_temp, end_temp = 0.5, 0.001
+
+    for step in range(iterations):
+        if stop_event is not None and step % STOP_CHECK_INTERVAL == 0 and stop_event.is_set():
+            break
+        temperature = start_temp * (end_temp / start_temp) ** (step / iterations)
+        in_idx = rng.randrange(n)
+        if state.counts[in_idx] >= max_copies:
+            continue
+        out_idx = rng.randrange(n)
+        if out_idx == in_idx or state.counts[out_idx] == 0:
+            continue
+        new_score = state.swap_score(out_idx, in_idx)
+        delta = new_score - state.score
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            state.apply_swap(out_idx, in_idx, new_score)
+            if new_score < best_score:
+                best_score, best_counts = new_score, state.counts[:]
+    return best_score, best_counts
+
+
+def optimize(problem, restarts, iterations, initial_counts=None, seed=None, report=None, cancel_check=None):
+    """
+    独立した探索をrestarts回、プロセスプールで並列に実行し、(最良の評価値, 最良の枚数ベクトル) を返す。
+    initial_countsを指定した場合は、1回目の探索をそのデッキから始める。
+    """
+    if len(problem) * problem.max_copies < problem.deck_size:
+        raise ValueError("カードプールが少なすぎて、指定の枚数のデッキを作れません。")
+    seeds = random.Random(seed).sample(range(2 ** 31), restarts)
+    starts = [initial_counts] + [None] * (restarts - 1)
+
+    best = None
+    done = 0
+    # 中止したときに実行中の探索も止められるよう、ワーカーと共有するイベントを渡す
+    manager = multiprocessing.Manager()
+    stop_event = manager.Event()
+    pool = ProcessPoolExecutor(max_workers=min(restarts, os.cpu_count() or 1))
+    try:
+        pending = {pool.submit(anneal, problem, start, iterations, s, stop_event) for start, s in zip(starts, seeds)}
+        while pending:
+            finished, pending = wait(pending, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            if cancel_check:
+                cancel_check()
+            for future in finished:
+                result = future.result()
+                if best is None or result[0] < best[0]:
+                    best = result
+                done += 1
+                if report:
+                    report(done, restarts)
+    except BaseException:
+        # 実行中の探索にも中止を伝え、その終了は待たずに戻る (後片付けは別スレッドで行う)
+        stop_event.set()
+        threading.Thread(target=_close_pool, args=(pool, manager, True), daemon=True).start()
+        raise
+    _close_pool(pool, manager)
+    return best
+
+
+def _close_pool(pool, manager, cancel_futures=False):
+    """ワーカーがすべて終わるのを待ってから、イベントを共有しているマネージャーを止める"""
+    pool.shutdown(cancel_futures=cancel_futures)
+    manager.shutdown()
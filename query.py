@@ -0,0 +1,170 @@
+"""
+デッキツール検索バー用の簡易クエリ言語。
+
+例: type:キャラクター color:赤|青 cost>=3 pow<=2 param:紅魔館 effect.place:墓地 "妖精トークン"
+
+- フィールド:値   カテゴリ項目の一致 (値は前方一致、| 区切りでOR)
+- cost>=3 など    数値項目の比較 (演算子は : = != < <= > >=)
+- 語句 / "語句"   名前・タイプ・特徴・効果テキストの部分一致
+- 先頭に - を付けるとその条件を否定する
+条件はすべてANDで結合される。
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+import utils
+from catalog import INDEX_FIELDS # インデックスのある項目はカタログと共通
+
+# フィールド名 (別名) → 正式名
+FIELD_ALIASES = {
+    "type": "type", "タイプ": "type",
+    "color": "color", "属性": "color",
+    "param": "param", "特徴": "param",
+    "effect.place": "effect.place", "place": "effect.place", "場所": "effect.place",
+    "effect.type": "effect.type", "効果": "effect.type",
+    "cost": "cost", "コスト": "cost",
+    "pow": "pow",
+    "name": "name", "名前": "name",
+    "text": "text",
+}
+NUMERIC_FIELDS = ("cost", "pow")
+TEXT_FIELDS = ("name", "text")
+
+_TOKEN_RE = re.compile(
+    r'(?P<neg>-)?'
+    r'(?:(?P<field>[^\s:<>=!"|-][^\s:<>=!"]*)(?P<op>>=|<=|!=|=|<|>|:))?'
+    r'(?:"(?P<quoted>[^"]*)"?|(?P<word>\S*))'
+)
+_COMPARATORS = {
+    ":": lambda a, b: a == b, "=": lambda a, b: a == b, "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b, "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b, ">=": lambda a, b: a >= b,
+}
+
+
+class QueryError(ValueError):
+    """クエリの構文エラー"""
+
+
+class _IndexTerm:
+    """カテゴリインデックスで候補を絞り込む条件"""
+    def __init__(self, field, values, negate):
+        self.field, self.values, self.negate = field, values, negate
+
+    def candidates(self, catalog):
+        sets = [catalog.lookup(self.field, v) for v in self.values]
+        return sets[0] if len(sets) == 1 else set().union(*sets)
+
+
+class _RangeTerm:
+    """数値項目の比較条件 (添字ごとの配列を参照するだけなので安価)"""
+    cost = 1
+    def __init__(self, field, op, value, negate):
+        self.field, self.negate = field, negate
+        self.op, self.value = op, value
+        self._compare = _COMPARATORS[op]
+
+    def make_test(self, catalog):
+        values = catalog.costs if self.field == "cost" else catalog.pows
+        compare, target, negate = self._compare, self.value, self.negate
+        def test(idx):
+            v = values[idx]
+            # 数値でないカード(POWなし等)は比較条件に一致しない
+            return (v is not None and compare(v, target)) != negate
+        return test
+
+
+class _TextTerm:
+    """正規化済みキーに対する部分一致条件"""
+    cost = 2
+    def __init__(self, field, needle, negate):
+        self.field, self.needle, self.negate = field, needle, negate
+
+    def make_test(self, catalog):
+        keys = catalog.name_keys if self.field == "name" else catalog.search_keys
+        needle, negate = self.needle, self.negate
+        return lambda idx: (needle in keys[idx]) != negate
+
+
+class QueryPlan:
+    """コンパイル済みの検索条件。同じプランを何度でもカタログに対して実行できる。"""
+    def __init__(self, index_terms, filter_terms):
+        self.index_terms = index_terms
+        # 安価な条件を先に、同じ種類なら長い(=絞り込みが強い)語句を先に評価する
+        self.filter_terms = sorted(filter_terms, key=lambda t: (t.cost, -len(getattr(t, "needle", ""))))
+
+    def targets_type(self, type_name):
+        """否定でないtype条件が指定のカードタイプを対象にしているか"""
+        key = utils.normalize_search_text(type_name)
+        return any(key.startswith(v) for t in self.index_terms
+                   if t.field == "type" and not t.negate for v in t.values)
+
+    def run(self, catalog, candidates=None):
+        """条件に一致するカードの添字リストを昇順で返す"""
+        positive = [t.candidates(catalog) for t in self.index_terms if not t.negate]
+        positive.sort(key=len) # 最も絞り込みの強いインデックスから積集合を取る
+        result = None if candidates is None else set(candidates)
+        for ids in positive:
+            result = set(ids) if result is None else result & ids
+            if not result:
+                return []
+        for term in self.index_terms:
+            if term.negate:
+                if result is None:
+                    result = set(range(len(catalog)))
+                result -= term.candidates(catalog)
+
+        indices = sorted(result) if result is not None else range(len(catalog))
+        tests = [t.make_test(catalog) for t in self.filter_terms]
+        if not tests:
+            return list(indices)
+        return [i for i in indices if all(test(i) for test in tests)]
+
+
+def _parse_term(match):
+    negate = bool(match.group("neg"))
+    field, op = match.group("field"), match.group("op")
+    raw_value = match.group("quoted") if match.group("quoted") is not None else match.group("word")
+    canonical = FIELD_ALIASES.get(field.lower()) if field else None
+
+    if canonical is None:
+        # フィールド指定なし (または未知のフィールド) はトークン全体を語句として扱う
+        text = match.group(0).lstrip("-") if negate else match.group(0)
+        needle = utils.normalize_search_text(text)
+        return _TextTerm("text", needle, negate) if needle else None
+
+    if canonical in NUMERIC_FIELDS:
+        try:
+            value = int(raw_value)
+        except ValueError:
+            raise QueryError(f"{field}{op} には数値を指定してください: '{raw_value}'")
+        return _RangeTerm(canonical, op, value, negate)
+
+    if op not in (":", "="):
+        raise QueryError(f"'{field}' には比較演算子 '{op}' は使えません")
+    if canonical in TEXT_FIELDS:
+        needle = utils.normalize_search_text(raw_value)
+        return _TextTerm(canonical, needle, negate) if needle else None
+
+    if canonical not in INDEX_FIELDS: # FIELD_ALIASES にカタログのインデックスにない項目を足した場合
+        raise QueryError(f"'{field}' はインデックスのない項目です")
+    values = [v for v in (utils.normalize_search_text(v) for v in raw_value.split("|")) if v]
+    if not values:
+        raise QueryError(f"'{field}{op}' の値が空です")
+    return _IndexTerm(canonical, values, negate)
+
+
+@lru_cache(maxsize=64)
+def compile_query(query_text):
+    """クエリ文字列を解析してQueryPlanを返す (同じ文字列はキャッシュを再利用)"""
+    text = unicodedata.normalize("NFKC", query_text or "") # 全角の演算子やコロンも受け付ける
+    index_terms, filter_terms = [], []
+    for match in _TOKEN_RE.finditer(text):
+        if not match.group(0).strip():
+            continue
+        term = _parse_term(match)
+        if term is None:
+            continue
+        (index_terms if isinstance(term, _IndexTerm) else filter_terms).append(term)
+    return QueryPlan(index_terms, filter_terms)
@@ -0,0 +1,50 @@
+"""
+カードの描画・計測をプロセスプールで並列に行うための共通処理。
+
+- レンダラーはプロセスごとに1つ作って使い回す (worker_renderer)
+- 件数が少ないときはプロセス起動の方が高くつくので、プールを使わずにその場で実行する
+- 進捗の表示と中止ができるよう、結果はチャンクごとに順に返す
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from renderer import CardRenderer
+
+CHUNKS_PER_WORKER = 4 # ワーカーごとに数回に分けて渡し、進捗を細かく返せるようにする
+
+_worker_renderer = None # プロセスごとのレンダラー
+
+
+def worker_renderer():
+    """このプロセスで使い回すCardRenderer"""
+    global _worker_renderer
+    if _worker_renderer is None:
+        _worker_renderer = CardRenderer()
+    return _worker_renderer
+
+
+def map_chunks(fn, items, min_parallel, *args):
+    """
+    itemsをチャンクに分けて fn(チャンクのリスト, *args) を実行し、(チャンク, 戻り値) を順に返すジェネレータ。
+    itemsが min_parallel 件未満かCPUが1つの場合は、その場で1件ずつ実行する。
+    fnはワーカープロセスで実行されるので、モジュールのトップレベルの関数にすること。
+    途中で例外が起きたりジェネレータを閉じたりした場合は、まだ始まっていないチャンクを取り消す。
+    """
+    items = list(items)
+    workers = os.cpu_count() or 1
+    if len(items) < min_parallel or workers == 1:
+        for item in items:
+            yield [item], fn([item], *args)
+        return
+
+    size = max(1, -(-len(items) // (workers * CHUNKS_PER_WORKER)))
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(chunks)))
+    try:
+        futures = [pool.submit(fn, chunk, *args) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            yield chunk, future.result()
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
@@ -0,0 +1,278 @@
+"""
+レンダラーの出力が変わっていないかを確認する回帰チェック。
+
+datas/ 内のすべてのカードを固定の設定・フォントで描画し、保存済みの正解画像(ゴールデン)と比較する。
+通常の描画と、入力中のプレビュー用の簡易描画 (draft) はそれぞれ別の正解画像と比較する。
+- まず画素のハッシュを比較し、一致すれば合格
+- 一致しない場合は、ぼかした輝度の差で見た目の差を調べ、差がなければ「微差」(合格) とする
+- 見た目にも差がある場合は、正解 | 今回 | 差分 を並べた画像を regression/diffs に書き出す
+
+前回の実行から、カードのJSON (とイラスト)・レンダラーのソース・フォント・正解画像のどれも変わっていない
+カードは描画を省略する。描画はプロセスプールで並列に行う。
+
+    python render_regression.py            # 確認 (問題があれば終了コード1)
+    python render_regression.py --update   # 今回の出力を正解として保存する
+    python render_regression.py --all      # 省略せずにすべて描画する
+
+正解画像は描画に使うフォントに依存する。リポジトリの正解画像 (regression/goldens, goldens.json) は
+同梱の fonts/HGRMB.TTC で作成したもので、使ったフォントは goldens.json の "font" に記録している。
+別のフォントで確認する場合 (--font を指定した場合や fonts フォルダに ipaexm.ttf を置いた場合) は、
+先にそのフォントで --update して正解画像を作り直すこと。
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+import PIL
+from PIL import Image, ImageChops, ImageFilter, features
+
+import art_store
+import constants as const
+import render_pool
+import utils
+
+REGRESSION_DIR = os.path.join(const.APP_DIR, "regression")
+GOLDEN_DIR = os.path.join(REGRESSION_DIR, "goldens")
+MANIFEST_FILE = os.path.join(REGRESSION_DIR, "goldens.json")
+DIFF_DIR = os.path.join(REGRESSION_DIR, "diffs")
+STATE_FILE = os.path.join(REGRESSION_DIR, ".last_run.json") # 差分実行用の前回の結果
+SOURCE_FILES = ("renderer.py", "layout_templates.py", "mana_icons.py", "art_store.py", "templates.json", "constants.py", "classtype.py") # 出力に影響するソース
+
+PERCEPTUAL_BLUR = 1 # 見た目の差を調べるときのぼかし半径 (アンチエイリアスの揺れを無視する)
+PERCEPTUAL_THRESHOLD = 24 # ぼかした輝度の差がこれを超える画素を「見た目の差」とする
+PARALLEL_MIN_CARDS = 16 # これより少ない描画はプールを使わずにその場で行う
+DRAFT_KEY_SUFFIX = "#draft" # 簡易描画の正解のキー (カードID + これ)
+
+
+def default_font_path():
+    """固定で使うフォント。同梱のipaexm.ttfがなければfontsフォルダの最初のフォントを使う"""
+    bundled = os.path.join(const.DEFAULT_FONT_DIR, "ipaexm.ttf")
+    if os.path.exists(bundled):
+        return bundled
+    if os.path.isdir(const.DEFAULT_FONT_DIR):
+        for filename in sorted(os.listdir(const.DEFAULT_FONT_DIR)):
+            if filename.lower().endswith((".ttf", ".ttc", ".otf")):
+                return os.path.join(const.DEFAULT_FONT_DIR, filename)
+    return bundled
+
+
+def regression_config(font_path):
+    """config.jsonに左右されない、デフォルト値だけの描画設定"""
+    config = utils.default_config()
+    config["font_path"] = font_path
+    return config
+
+
+def _sha1_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def environment_key(config):
+    """出力に影響する環境 (設定・フォント・Pillow/FreeType・レンダラーのソース) のハッシュ"""
+    parts = [json.dumps(config, sort_keys=True), PIL.__version__, str(features.version("freetype2"))]
+    font_path = config["font_path"]
+    parts.append(_sha1_file(font_path) if os.path.exists(font_path) else "no-font")
+    parts.extend(_sha1_file(os.path.join(const.APP_DIR, name)) for name in SOURCE_FILES)
+    return hashlib.sha1("\n".join(parts).encode('utf-8')).hexdigest()
+
+
+def image_hash(image):
+    return hashlib.sha256(f"{image.mode}{image.size}".encode('ascii') + image.tobytes()).hexdigest()
+
+
+def golden_filename(card_id):
+    # カードIDには ":" や日本語が含まれるので、ファイル名にはハッシュを使う
+    return hashlib.sha1(card_id.encode('utf-8')).hexdigest()[:16] + ".png"
+
+
+def perceptual_diff(expected, actual):
+    """
+    ぼかした輝度同士の差を調べ、(見た目に差がある画素数, 差分を強調した画像) を返す。
+    サイズが違う場合は全画素を差とする。
+    """
+    if expected.size != actual.size:
+        return expected.size[0] * expected.size[1], None
+    raw = ImageChops.difference(expected.convert("RGB"), actual.convert("RGB")).convert("L")
+    blurred = ImageChops.difference(expected.convert("L").filter(ImageFilter.GaussianBlur(PERCEPTUAL_BLUR)),
+                                    actual.convert("L").filter(ImageFilter.GaussianBlur(PERCEPTUAL_BLUR)))
+    changed = sum(blurred.histogram()[PERCEPTUAL_THRESHOLD + 1:])
+    # 今回の画像を薄くして、差のある画素を赤で重ねる
+    highlight = Image.blend(actual.convert("RGB"), Image.new("RGB", actual.size, (255, 255, 255)), 0.7)
+    highlight.paste((255, 0, 0), (0, 0), raw.point(lambda v: 255 if v else 0))
+    return changed, highlight
+
+
+def _write_diff_image(key, expected, actual, highlight):
+    os.makedirs(DIFF_DIR, exist_ok=True)
+    w = max(expected.size[0], actual.size[0])
+    h = max(expected.size[1], actual.size[1])
+    sheet = Image.new("RGB", (w * 3, h), (128, 128, 128))
+    sheet.paste(expected.convert("RGB"), (0, 0))
+    sheet.paste(actual.convert("RGB"), (w, 0))
+    if highlight is not None:
+        sheet.paste(highlight, (w * 2, 0))
+    path = os.path.join(DIFF_DIR, golden_filename(key))
+    sheet.save(path)
+    return path
+
+
+def golden_key(card_id, draft):
+    """正解画像のキー。入力中のプレビュー用の簡易描画 (draft) は通常の描画とは別に正解を持つ"""
+    return card_id + DRAFT_KEY_SUFFIX if draft else card_id
+
+
+def _compare(key, image, golden_hash, update):
+    """描画結果を正解と比較し、(キー, 状態, 今回のハッシュ, 詳細) を返す"""
+    current_hash = image_hash(image)
+    golden_path = os.path.join(GOLDEN_DIR, golden_filename(key))
+    if update:
+        if current_hash != golden_hash or not os.path.exists(golden_path):
+            image.save(golden_path)
+            return key, "updated", current_hash, ""
+        return key, "ok", current_hash, ""
+    if golden_hash is None or not os.path.exists(golden_path):
+        return key, "new", current_hash, "正解画像がありません"
+    if current_hash == golden_hash:
+        return key, "ok", current_hash, ""
+    with Image.open(golden_path) as f:
+        expected = f.convert("RGB")
+    changed, highlight = perceptual_diff(expected, image)
+    if changed == 0:
+        return key, "close", current_hash, "見た目の差はありません (画素は不一致)"
+    diff_path = _write_diff_image(key, expected, image, highlight)
+    return key, "fail", current_hash, f"{changed} 画素に差があります: {diff_path}"
+
+
+def _check_cards(tasks, config, update):
+    """
+    カードを通常の描画と簡易描画 (draft) の両方で描画して、それぞれの正解と比較する。プロセスプールのワーカーで実行される。
+    tasksは [(カードデータ, [(正解のキー, draftか, 正解のハッシュ)])]。結果は [(正解のキー, 状態, 今回のハッシュ, 詳細)]。
+    状態は "ok" / "close" / "fail" / "new" / "updated" / "error"。
+    """
+    renderer = render_pool.worker_renderer()
+    results = []
+    for card, tiers in tasks:
+        name_lines = [line.strip() for line in card.get("name", "").split('\n') if line.strip()]
+        for key, draft, golden_hash in tiers:
+            try:
+                image = renderer.draw_single_card(card, card.get("card_type", ""), name_lines, config, draft=draft)
+                results.append(_compare(key, image, golden_hash, update))
+            except Exception as e:
+                results.append((key, "error", None, str(e)))
+                continue
+            if results[-1][1] != "fail":
+                # 前回の失敗で書き出した差分画像が残っていれば消す
+                stale = os.path.join(DIFF_DIR, golden_filename(key))
+                if os.path.exists(stale):
+                    os.remove(stale)
+    return results
+
+
+def _load_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def _save_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def load_cards(data_dir=const.DATA_DIR):
+    """[(カードID, カードデータ, JSONの内容のハッシュ)] を返す"""
+    cards = []
+    for root, _, files in os.walk(data_dir):
+        for filename in sorted(files):
+            if not filename.endswith(".json"):
+                continue
+            filepath = os.path.join(root, filename)
+            with open(filepath, 'rb') as f:
+                raw = f.read()
+            card = json.loads(raw.decode('utf-8'))
+            if card.get('art'): # イラストの画像の更新も変更として扱う
+                raw += str(art_store.source_signature(card['art'])).encode('utf-8')
+            cards.append((utils.make_card_id(card, filepath), card, hashlib.sha1(raw).hexdigest()))
+    return sorted(cards, key=lambda c: c[0])
+
+
+def run(font_path=None, update=False, check_all=False, data_dir=const.DATA_DIR, report=print):
+    """回帰チェックを実行し、{状態: [(正解のキー, 詳細)]} を返す"""
+    config = regression_config(font_path or default_font_path())
+    env = environment_key(config)
+    manifest = _load_json(MANIFEST_FILE, {})
+    goldens = manifest.get("cards", {})
+    if manifest.get("environment") and manifest.get("pillow") != PIL.__version__:
+        report(f"注意: 正解画像は Pillow {manifest.get('pillow')} で作成されています (現在 {PIL.__version__})。")
+    if manifest.get("font") and manifest.get("font") != os.path.basename(config["font_path"]):
+        report(f"注意: 正解画像はフォント {manifest.get('font')} で作成されています (現在 {os.path.basename(config['font_path'])})。")
+    state = _load_json(STATE_FILE, {})
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+
+    # 前回合格してから何も変わっていないカードは描画しない
+    def run_key(card_hash, golden_hash):
+        return hashlib.sha1(f"{env}:{card_hash}:{golden_hash}".encode('utf-8')).hexdigest()
+
+    tasks, card_hashes, skipped = [], {}, 0
+    for card_id, card, card_hash in load_cards(data_dir):
+        tiers = []
+        for draft in (False, True):
+            key = golden_key(card_id, draft)
+            card_hashes[key] = card_hash
+            golden_hash = goldens.get(key)
+            if not (check_all or update) and state.get(key) == run_key(card_hash, golden_hash):
+                skipped += 1
+                continue
+            tiers.append((key, draft, golden_hash))
+        if tiers:
+            tasks.append((card, tiers))
+
+    results = [r for _, chunk_results in render_pool.map_chunks(_check_cards, tasks, PARALLEL_MIN_CARDS, config, update)
+               for r in chunk_results]
+
+    summary = {}
+    for key, status, current_hash, detail in results:
+        summary.setdefault(status, []).append((key, detail))
+        if update and current_hash is not None:
+            goldens[key] = current_hash
+        if status in ("ok", "close", "updated"):
+            # 合格したものは、カード・環境・正解画像のどれかが変わるまで次回省略する
+            state[key] = run_key(card_hashes[key], goldens.get(key))
+        else:
+            state.pop(key, None)
+
+    if update:
+        # 削除されたカードの正解は残さない
+        goldens = {key: h for key, h in goldens.items() if key in card_hashes}
+        manifest = {"environment": env, "pillow": PIL.__version__, "font": os.path.basename(config["font_path"]),
+                    "cards": goldens}
+        _save_json(MANIFEST_FILE, manifest)
+    _save_json(STATE_FILE, state)
+    summary["skipped"] = [(None, "")] * skipped
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="カード描画の回帰チェック")
+    parser.add_argument("--update", action="store_true", help="今回の出力を正解画像として保存する")
+    parser.add_argument("--all", action="store_true", help="前回から変更のないカードも描画する")
+    parser.add_argument("--font", help="描画に使うフォントファイル (既定: fontsフォルダのフォント)")
+    args = parser.parse_args(argv)
+
+    summary = run(font_path=args.font, update=args.update, check_all=args.all)
+    for status in ("fail", "new", "error", "close"):
+        for key, detail in summary.get(status, []):
+            print(f"[{status}] {key}: {detail}")
+    counts = ", ".join(f"{status}: {len(items)}" for status, items in sorted(summary.items()) if items)
+    print(counts or "確認するカードがありません。")
+    return 1 if any(summary.get(s) for s in ("fail", "new", "error")) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,40 @@
 from PIL import Image, ImageDraw, ImageFont
 import os
+import threading
 import classtype as ctp
 import constants as const
+import art_store
+import layout_templates
+import mana_icons
 
 DEFAULT_FONT = "arial.ttf" # フォールバック用
-LINE_SPACING = 3
+WRAP_CACHE_SIZE = 2048 # 折り返し結果のキャッシュ件数の上限
+LINE_MASK_CACHE_SIZE = 1024 # 下書き描画で使い回す、1行分の文字画像のキャッシュ件数の上限
+BBOX_CACHE_SIZE = 4096 # 1行分のテキストのbboxのキャッシュ件数の上限
+
+# フォントはスレッドごとにキャッシュする (FreeTypeのフォントを複数スレッドで共有しないため)
+_thread_local = threading.local()
+
+def get_font(size, config_font_path=None, draft=False):
+    """
+    フォントを取得する。同じ (パス, サイズ) のフォントは読み込み済みのものを使い回す。
+    draft=Trueの場合は、文字の組版を簡略化したフォント (Layout.BASIC) を返す。
+    """
+    fonts = getattr(_thread_local, "fonts", None)
+    if fonts is None:
+        fonts = _thread_local.fonts = {}
+    key = (config_font_path, size, draft)
+    font = fonts.get(key)
+    if font is None:
+        font = fonts[key] = _load_font(size, config_font_path, ImageFont.Layout.BASIC if draft else None)
+    return font
 
 # --- フォント読み込みロジック ---
-def get_font(size, config_font_path=None):
+def _load_font(size, config_font_path=None, layout_engine=None):
     # 1. config.jsonで指定されたパスを試す (最優先)
     if config_font_path and os.path.exists(config_font_path):
         try:
-            return ImageFont.truetype(config_font_path, size)
+            return ImageFont.truetype(config_font_path, size, layout_engine=layout_engine)
         except:
             print(f"Warning: Failed to load font from config path: {config_font_path}")
             pass
@@ -20,22 +43,43 @@ def get_font(size, config_font_path=None):
     default_bundled_font = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "ipaexm.ttf")
     if os.path.exists(default_bundled_font):
         try:
-            return ImageFont.truetype(default_bundled_font, size)
+            return ImageFont.truetype(default_bundled_font, size, layout_engine=layout_engine)
         except:
             print(f"Warning: Failed to load bundled default font: {default_bundled_font}")
     
     # 3. 最終フォールバック (Arialまたはデフォルト)
     try:
-        return ImageFont.truetype(DEFAULT_FONT, size)
+        return ImageFont.truetype(DEFAULT_FONT, size, layout_engine=layout_engine)
     except:
         return ImageFont.load_default()
 
 
 class CardRenderer:
-    """カード画像の描画に関するすべてのロジックを担うクラス"""
-    def draw_single_card(self, data, card_type_name, name_lines, config):
-        image = Image.new("RGB", (const.CARD_W, const.CARD_H), (255, 255, 255))
+    """
+    カード画像の描画に関するすべてのロジックを担うクラス。
+    座標・フォント・スタイルはカードタイプごとのテンプレート (templates.json) をコンパイルしたレイアウトプランから取る。
+    """
+    def __init__(self, art=None):
+        self.art = art # イラストのキャッシュ (ArtStore)。Noneの場合はプロセスで共有するものを使う
+        self._wrap_cache = {} # (テキスト, フォント, 最大幅) → 折り返した行のリスト
+        self._line_mask_cache = {} # (テキスト, フォント) → 文字のマスク画像
+        self._bbox_cache = {} # (テキスト, フォント) → (0, 0)基準のbbox
+        self._advance_cache = {} # フォント → {文字: 送り幅} (自動縮小の見積もり用)
+
+    def draw_single_card(self, data, card_type_name, name_lines, config, target=None, draft=False):
+        """
+        カード画像を描画して返す。targetにカードサイズのRGB画像を渡すと、
+        新しい画像を確保せずにその画像を白で塗りつぶして描き込む。
+        draft=Trueの場合は、入力中のプレビュー用にアンチエイリアスなし・簡易組版で軽く描画する。
+        """
+        if target is None:
+            image = Image.new("RGB", (const.CARD_W, const.CARD_H), (255, 255, 255))
+        else:
+            image = target
+            image.paste((255, 255, 255), (0, 0) + image.size)
         draw = ImageDraw.Draw(image)
+        if draft:
+            draw.fontmode = "1" # アンチエイリアスなし
         
         # データの種類を判定 (オブジェクトか辞書か)
         is_object = not isinstance(data, dict)
@@ -47,74 +91,149 @@ class CardRenderer:
             return data.get(key, default)
         
         def _get_font(size):
-            return get_font(size, config.get("font_path"))
+            return get_font(size, config.get("font_path"), draft)
+
+        plan = layout_templates.compile_plan(card_type_name, config)
 
-        # --- 各パーツの描画 ---
-        self._draw_base_frame(draw)
-        self._draw_name(draw, name_lines, _get_font, config)
-        self._draw_cost(draw, _get_prop, _get_font, config)
-        self._draw_spell_mana(draw, card_type_name, _get_prop, _get_font, config)
-        self._draw_pow_and_param(draw, _get_prop, _get_font, config)
-        self._draw_effects(draw, _get_prop, _get_font, config, is_object)
-        self._draw_footer(draw, card_type_name, _get_prop, _get_font, config)
+        # --- 各パーツの描画 (テンプレートにない領域は描画しない) ---
+        self._draw_base_frame(draw, plan)
+        self._draw_art(image, _get_prop, plan)
+        self._draw_name(draw, name_lines, _get_font, plan)
+        self._draw_cost(draw, _get_prop, _get_font, plan)
+        self._draw_spell_mana(image, _get_prop, _get_font, plan)
+        self._draw_pow_and_param(draw, _get_prop, _get_font, plan)
+        self._draw_effects(draw, _get_prop, _get_font, plan, is_object, image, draft)
+        self._draw_footer(draw, card_type_name, _get_prop, _get_font, plan)
             
         return image
 
-    def _draw_base_frame(self, draw):
+    def measure_card(self, data, card_type_name, name_lines, config):
+        """
+        描画はせずにレイアウトだけを計算し、はみ出しの確認に使う寸法を辞書で返す。
+        (座標は draw_single_card と同じ計算で求める)
+        """
+        draw = ImageDraw.Draw(Image.new("1", (1, 1)))
+        is_object = not isinstance(data, dict)
+
+        def _get_prop(key, default=None):
+            if is_object:
+                return getattr(data, key, default)
+            return data.get(key, default)
+
+        def _get_font(size):
+            return get_font(size, config.get("font_path"))
+
+        plan = layout_templates.compile_plan(card_type_name, config)
+
+        # カード名: 描画される行ごとの幅
+        name_widths = []
+        if name_lines and plan.name:
+            if len(name_lines) >= 2:
+                font = _get_font(plan.name.multi_line_font)
+                drawn = name_lines[:plan.name.max_lines]
+            else:
+                font = _get_font(plan.name.font)
+                drawn = name_lines[:1]
+            for line in drawn:
+                bbox = self._text_bbox(draw, line, font)
+                name_widths.append(bbox[2] - bbox[0])
+
+        # POWと特徴: 左右の端
+        pow_val = _get_prop("pow", "")
+        pow_right = None
+        if pow_val and plan.pow:
+            pow_right = plan.pow.x + self._text_bbox(draw, f"POW {pow_val}", _get_font(plan.pow.font))[2]
+        param_list = _get_prop("param", [])
+        param_left = None
+        if param_list and param_list[0] and plan.param:
+            p_text = " ".join(param_list) if isinstance(param_list, list) else str(param_list)
+            bbox = self._text_bbox(draw, p_text, _get_font(plan.param.font))
+            param_left = const.CARD_W - (bbox[2] - bbox[0]) - plan.param.right + bbox[0]
+
+        # 効果テキスト: 最も下・最も右の端
+        effects = self._fit_effects(draw, card_type_name, _get_prop, _get_font, plan, is_object)
+        effects_bottom = max((y + bbox[3] for _, y, _, _, bbox in effects), default=None)
+        effects_right = max((x + bbox[2] for x, _, _, _, bbox in effects), default=None)
+        footer_top = self._footer_top(draw, card_type_name, _get_font, plan)
+
+        frame = plan.frame
+        return {
+            "name_widths": name_widths,
+            "name_hidden_lines": max(len(name_lines) - plan.name.max_lines, 0) if plan.name else 0,
+            "name_max_width": plan.name.max_width if plan.name else const.CARD_W,
+            "pow_right": pow_right,
+            "param_left": param_left,
+            "param_min_left": plan.param.right if plan.param else 0, # 特徴は右端と同じだけ左端から離す
+            "effects_bottom": effects_bottom,
+            "effects_right": effects_right,
+            "effects_right_limit": const.CARD_W - frame.padding - frame.border_width,
+            "footer_top": footer_top,
+        }
+
+    def _draw_base_frame(self, draw, plan):
         """カードの基本枠と中央線を描画"""
-        draw.rectangle((const.LAYOUT["PADDING"], const.LAYOUT["PADDING"], const.CARD_W - const.LAYOUT["PADDING"] - 1, const.CARD_H - const.LAYOUT["PADDING"] - 1), outline="black", width=const.LAYOUT["BORDER_WIDTH"])
-        # イラスト描画エリアの枠線（デバッグ用、必要ならコメントアウト）
-        # draw.rectangle((10, 50, 290, 230), outline="gray")
-        draw.line((const.LAYOUT["PADDING"], const.LAYOUT["MID_LINE_Y"], const.CARD_W - const.LAYOUT["PADDING"], const.LAYOUT["MID_LINE_Y"]), fill="black", width=2)
+        frame = plan.frame
+        p = frame.padding
+        draw.rectangle((p, p, const.CARD_W - p - 1, const.CARD_H - p - 1), outline="black", width=frame.border_width)
+        draw.line((p, frame.mid_line_y, const.CARD_W - p, frame.mid_line_y), fill="black", width=frame.mid_line_width)
+
+    def _draw_art(self, image, prop_getter, plan):
+        """イラストを描画 (切り抜き・縮小済みの画像を貼り付けるだけ)"""
+        art = prop_getter("art", "")
+        region = plan.art
+        if not art or region is None: return
+        store = self.art or art_store.get_default_store()
+        art_image = store.get(art, (region.width, region.height))
+        if art_image is not None:
+            image.paste(art_image, (region.x, region.y))
 
-    def _draw_name(self, draw, name_lines, font_getter, config):
+    def _draw_name(self, draw, name_lines, font_getter, plan):
         """カード名を描画"""
-        if not name_lines: return
-        
-        offset_y = config["offsets"]["name_y"]
+        region = plan.name
+        if not name_lines or region is None: return
         
         if len(name_lines) >= 2:
-            font = font_getter(config["font_sizes"]["name_2line"])
-            y_start = const.LAYOUT["NAME_AREA_Y"] + offset_y
+            font = font_getter(region.multi_line_font)
             bbox = draw.textbbox((0, 0), "A", font=font)
-            line_height = (bbox[3] - bbox[1]) * 1.2 # フォントの高さに少しマージンを追加
+            line_height = (bbox[3] - bbox[1]) * region.line_height # フォントの高さに少しマージンを追加
 
-            for i, line_text in enumerate(name_lines[:2]):
-                y_pos = y_start + (i * line_height)
+            for i, line_text in enumerate(name_lines[:region.max_lines]):
+                y_pos = region.y + (i * line_height)
                 bbox = draw.textbbox((0, 0), line_text, font=font)
                 w = bbox[2] - bbox[0] 
-                x_pos = (const.CARD_W - w) / 2
+                x_pos = region.x + (region.width - w) / 2
                 draw.text((x_pos, y_pos), line_text, font=font, fill="black")
         else:
             text_to_draw = name_lines[0]
-            font_size_1line = config["font_sizes"]["name_1line"]
-            font = font_getter(font_size_1line) # 常に設定されたサイズを使用
+            font = font_getter(region.font) # 常に設定されたサイズを使用
             
             bbox = draw.textbbox((0, 0), text_to_draw, font=font)
             w = bbox[2] - bbox[0]
-            x_pos = (const.CARD_W - w) / 2 + config["offsets"]["name_x"] # Xオフセットを追加
-            y_pos = const.LAYOUT["NAME_AREA_Y"] + offset_y # Yオフセット
-            draw.text((x_pos, y_pos), text_to_draw, font=font, fill="black")
+            x_pos = region.x + (region.width - w) / 2 + region.single_line_x # 1行の場合のみXオフセットを使う
+            draw.text((x_pos, region.y), text_to_draw, font=font, fill="black")
 
-    def _draw_cost(self, draw, prop_getter, font_getter, config):
+    def _draw_cost(self, draw, prop_getter, font_getter, plan):
         """コスト円と数値を描画"""
+        region = plan.cost
+        if region is None: return
         cost_val = str(prop_getter("cost", 0))
         if cost_val == "0" or cost_val == "": return
 
-        offset_x = config["offsets"]["cost_num_x"]
-        offset_x = 0 # 削除されたため0をハードコード
-        offset_y = config["offsets"]["cost_num_y"]
-        cx, cy, r = const.LAYOUT["COST_CIRCLE_CX"], const.LAYOUT["COST_CIRCLE_CY"], const.LAYOUT["COST_CIRCLE_R"]
-        draw.ellipse((cx - r, cy - r, cx + r, cy + r), outline="black", width=2)
+        cx, cy, r = region.cx, region.cy, region.r
+        draw.ellipse((cx - r, cy - r, cx + r, cy + r), outline="black", width=region.outline_width)
         
-        font_num = font_getter(config["font_sizes"]["cost"])
+        font_num = font_getter(region.font)
         bbox = draw.textbbox((0, 0), cost_val, font=font_num)
         cw, ch = bbox[2] - bbox[0], bbox[3] - bbox[1]
-        draw.text((cx - cw/2 + offset_x, cy - ch/2 + offset_y), cost_val, font=font_num, fill="black")
+        draw.text((cx - cw/2, cy - ch/2 + region.text_dy), cost_val, font=font_num, fill="black")
 
-    def _draw_spell_mana(self, draw, card_type_name, prop_getter, font_getter, config):
-        """スペルカードのマナコストを描画"""
-        if card_type_name != const.CARD_TYPE_SPELLCARD: return
+    def _draw_spell_mana(self, image, prop_getter, font_getter, plan):
+        """
+        マナコストを色ごとのアイコンで描画 (テンプレートに spell_mana があるカードタイプのみ)。
+        アイコンはアトラスから切り出したスプライトを貼り付ける。
+        """
+        region = plan.spell_mana
+        if region is None: return
 
         color_data = prop_getter("color", {})
         if not isinstance(color_data, dict): color_data = {}
@@ -122,57 +241,50 @@ class CardRenderer:
         active_mana = {k: v for k, v in color_data.items() if v > 0}
         if not active_mana: return
 
-        COLOR_RGB = {"赤": (255, 0, 0), "青": (0, 0, 255), "緑": (0, 200, 0), "黄": (255, 255, 0), "紫": (150, 0, 150)}
-        current_y = const.LAYOUT["SPELL_MANA_START_Y"]
-        font_mana = font_getter(12) # これは固定でも良いか
+        current_y = region.y
+        size = region.size
+        atlas = mana_icons.get_atlas(size, font_getter(region.font), plan.mana_colors, plan.default_mana_color, region.outline_width)
 
         for color in const.COLORS:
             value = active_mana.get(color)
             if value:
-                size = const.LAYOUT["SPELL_MANA_SIZE"]
-                x0 = const.LAYOUT["COST_CIRCLE_CX"] - size / 2
-                y0 = current_y
-                fill_color = COLOR_RGB.get(color, (128, 128, 128))
-                draw.ellipse((x0, y0, x0 + size, y0 + size), fill=fill_color, outline="black", width=1)
-
-                mana_text = str(value)
-                bbox = draw.textbbox((0, 0), mana_text, font=font_mana)
-                cw, ch = bbox[2] - bbox[0], bbox[3] - bbox[1]
-                draw.text((x0 + size/2 - cw/2, y0 + size/2 - ch/2), mana_text, font=font_mana, fill="black")
-                
-                current_y += size + const.LAYOUT["SPELL_MANA_PADDING"]
-
-    def _draw_pow_and_param(self, draw, prop_getter, font_getter, config):
-        """パワーと特徴を描画"""
+                sprite = atlas.icon(color, value)
+                image.paste(sprite, (int(region.cx - size / 2), int(current_y)), sprite)
+                current_y += size + region.padding
+
+    def _draw_pow_and_param(self, draw, prop_getter, font_getter, plan):
+        """パワーと特徴を描画 (overdrawの回数だけ重ねて描き、文字を濃くする)"""
         pow_val = prop_getter("pow", "")
         param_list = prop_getter("param", [])
-        font_p = font_getter(config["font_sizes"]["pow_param"])
-        offset_pow_x, offset_pow_y = config["offsets"]["pow_x"], config["offsets"]["pow_y"]
-        offset_param_x, offset_param_y = config["offsets"]["param_x"], config["offsets"]["param_y"]
-        offset_pow_x, offset_pow_y = 0, config["offsets"]["pow_y"] # Xオフセットは削除
-        offset_param_x, offset_param_y = 0, config["offsets"]["param_y"] # Xオフセットは削除
-        y_pos_pow = const.LAYOUT["MID_LINE_Y"] + const.LAYOUT["POW_PARAM_Y_OFFSET"] + offset_pow_y
-        y_pos_param = const.LAYOUT["MID_LINE_Y"] + const.LAYOUT["POW_PARAM_Y_OFFSET"] + offset_param_y
-
-        if pow_val:
-            draw.text((const.LAYOUT["FOOTER_X_PADDING"] + offset_pow_x, y_pos_pow), f"POW {pow_val}", font=font_p, fill="black")
-            draw.text((const.LAYOUT["FOOTER_X_PADDING"], y_pos_pow), f"POW {pow_val}", font=font_p, fill="black")
-
-        if param_list and param_list[0]:
+
+        if pow_val and plan.pow:
+            font_p = font_getter(plan.pow.font)
+            for _ in range(plan.pow.overdraw):
+                draw.text((plan.pow.x, plan.pow.y), f"POW {pow_val}", font=font_p, fill="black")
+
+        if param_list and param_list[0] and plan.param:
+            font_p = font_getter(plan.param.font)
             p_text = " ".join(param_list) if isinstance(param_list, list) else str(param_list)
             bbox = draw.textbbox((0, 0), p_text, font=font_p)
             pw = bbox[2] - bbox[0]
-            draw.text((const.CARD_W - pw - const.LAYOUT["FOOTER_X_PADDING"] + offset_param_x, y_pos_param), p_text, font=font_p, fill="black")
-            draw.text((const.CARD_W - pw - const.LAYOUT["FOOTER_X_PADDING"], y_pos_param), p_text, font=font_p, fill="black")
+            for _ in range(plan.param.overdraw):
+                draw.text((const.CARD_W - pw - plan.param.right, plan.param.y), p_text, font=font_p, fill="black")
 
     def _wrap_text_by_width(self, draw, text, font, max_width):
         """
         指定されたピクセル幅に基づいてテキストを折り返す。
-        textwrap.wrapの代替。
+        textwrap.wrapの代替。変更のないテキストは前回の結果を使い回す。
         """
-        lines = []
         if not text:
             return []
+        key = (text, getattr(font, "path", None), getattr(font, "size", None), getattr(font, "layout_engine", None), max_width)
+        cached = self._wrap_cache.get(key)
+        if cached is not None:
+            return cached
+        if len(self._wrap_cache) >= WRAP_CACHE_SIZE:
+            self._wrap_cache.clear()
+
+        lines = []
 
         current_line = ""
         for char in text:
@@ -191,24 +303,208 @@ class CardRenderer:
                 lines.append(current_line)
                 current_line = char
         lines.append(current_line)  # 最後の行を追加
+        self._wrap_cache[key] = lines
         return lines
 
-    def _draw_effects(self, draw, prop_getter, font_getter, config, is_object):
-        """効果テキストを描画"""
+    def _font_key(self, font):
+        return (getattr(font, "path", None), getattr(font, "size", None), getattr(font, "layout_engine", None), id(font))
+
+    def _text_bbox(self, draw, text, font):
+        """1行のテキストの(0, 0)基準のbbox。同じテキスト・フォントは前回の結果を使い回す。"""
+        key = (text, self._font_key(font))
+        bbox = self._bbox_cache.get(key)
+        if bbox is None:
+            if len(self._bbox_cache) >= BBOX_CACHE_SIZE:
+                self._bbox_cache.clear()
+            bbox = self._bbox_cache[key] = draw.textbbox((0, 0), text, font=font)
+        return bbox
+
+    def _draw_text_line(self, draw, image, xy, text, font, bbox, draft):
+        """
+        1行のテキストを黒で描画する。
+        draftの場合は、行ごとに文字をマスク画像にした結果をキャッシュし、変更のない行は貼り付けるだけにする。
+        """
+        if not draft:
+            draw.text(xy, text, font=font, fill="black")
+            return
+        if bbox[2] <= bbox[0] or bbox[3] <= bbox[1]:
+            return # 空行
+
+        key = (text, self._font_key(font), draw.fontmode)
+        mask = self._line_mask_cache.get(key)
+        if mask is None:
+            if len(self._line_mask_cache) >= LINE_MASK_CACHE_SIZE:
+                self._line_mask_cache.clear()
+            mask = Image.new("L", (bbox[2] - bbox[0], bbox[3] - bbox[1]), 0)
+            mask_draw = ImageDraw.Draw(mask)
+            mask_draw.fontmode = draw.fontmode
+            mask_draw.text((-bbox[0], -bbox[1]), text, font=font, fill=255)
+            self._line_mask_cache[key] = mask
+        image.paste((0, 0, 0), (int(xy[0]) + bbox[0], int(xy[1]) + bbox[1]), mask)
+
+    def _footer_top(self, draw, card_type_name, font_getter, plan):
+        """フッター(カードタイプ)の文字の上端のY座標 (フッターがない場合はカードの下端)"""
+        if plan.footer is None:
+            return const.CARD_H - plan.frame.padding - plan.frame.border_width
+        font_foot = font_getter(plan.footer.font)
+        return plan.footer.y + self._text_bbox(draw, card_type_name or "BOSS", font_foot)[1]
+
+    def _draw_effects(self, draw, prop_getter, font_getter, plan, is_object, image=None, draft=False):
+        """効果テキストを描画 (マナのトークンはアトラスのアイコンを貼り付ける)"""
+        for x, y, text, font, bbox in self._fit_effects(draw, plan.card_type_name, prop_getter, font_getter, plan, is_object):
+            if isinstance(text, str):
+                self._draw_text_line(draw, image, (x, y), text, font, bbox, draft)
+            else: # マナのトークンの場合、fontにはアトラスが入っている
+                sprite = font.icon(*text)
+                image.paste(sprite, (int(x) + bbox[0], int(y) + bbox[1]), sprite)
+
+    def _fit_effects(self, draw, card_type_name, prop_getter, font_getter, plan, is_object):
+        """
+        効果テキストを配置する。layout_options の effects_auto_fit が有効な場合は、フッターに
+        はみ出さない最大のサイズ (設定のサイズが上限) までヘッダーと本文のフォントを小さくする。
+        候補サイズの判定は文字ごとの送り幅のキャッシュを使った見積もりで二分探索し、
+        決めたサイズで正確に配置し直して確認する。
+        """
+        items = self._layout_effects(draw, prop_getter, font_getter, plan, is_object)
+        region = plan.effects
+        if not items or not region.auto_fit:
+            return items
+        bottom_limit = self._footer_top(draw, card_type_name, font_getter, plan)
+        def fits(layout):
+            return max(y + bbox[3] for _, y, _, _, bbox in layout) <= bottom_limit
+        if fits(items):
+            return items
+
+        head_size, body_size = region.header_font, region.body_font
+        min_size = region.min_font_size
+        def sizes(shrink): # 本文とヘッダーを同じだけ小さくする
+            return max(head_size - shrink, min(min_size, head_size)), max(body_size - shrink, min(min_size, body_size))
+        max_shrink = max(body_size - min_size, head_size - min_size, 0)
+
+        # 見積もりで「収まる最小の縮小幅」を二分探索する
+        lo, hi = 1, max_shrink
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if fits(self._layout_effects(draw, prop_getter, font_getter, plan, is_object, sizes(mid), self._wrap_text_estimated)):
+                hi = mid
+            else:
+                lo = mid + 1
+        # 正確な折り返しで確認し、見積もりより行が増えて収まらなければさらに縮小する
+        for shrink in range(lo, max_shrink + 1):
+            items = self._layout_effects(draw, prop_getter, font_getter, plan, is_object, sizes(shrink))
+            if fits(items):
+                break
+        return items
+
+    def _wrap_text_estimated(self, draw, text, font, max_width):
+        """文字ごとの送り幅の合計で行幅を見積もって折り返す (カーニングは無視する)"""
+        if not text:
+            return []
+        advances = self._advance_cache.setdefault(self._font_key(font), {})
+        lines = []
+        current_line, width = "", 0.0
+        for char in text:
+            advance = advances.get(char)
+            if advance is None:
+                advance = advances[char] = font.getlength(char)
+            if width + advance <= max_width:
+                current_line += char
+                width += advance
+            else:
+                lines.append(current_line)
+                current_line, width = char, advance
+        lines.append(current_line)
+        return lines
+
+    def _inline_icon(self, draw, font, font_getter, plan):
+        """
+        テキストの中に置くマナアイコンの (アトラス, 送り幅, bbox)。
+        アイコンの大きさは、そのフォントの全角文字の高さに合わせる。
+        """
+        bbox = self._text_bbox(draw, "あ", font)
+        size = max(bbox[3] - bbox[1] - 1, 4)
+        atlas = mana_icons.get_atlas(size, font_getter(max(6, size * 2 // 3)), plan.mana_colors, plan.default_mana_color)
+        return atlas, size + 1 + plan.effects.mana_icon_gap, (0, bbox[1], size + 1, bbox[1] + size + 1)
+
+    def _wrap_pieces(self, draw, pieces, font, max_width, icon_width):
+        """
+        文字列とマナのトークンが混ざった段落を折り返し、行ごとの pieces のリストを返す。
+        行幅は文字列の部分の textlength とアイコンの送り幅の合計で測る。
+        """
+        key = (tuple(pieces), self._font_key(font), max_width, icon_width)
+        cached = self._wrap_cache.get(key)
+        if cached is not None:
+            return cached
+        if len(self._wrap_cache) >= WRAP_CACHE_SIZE:
+            self._wrap_cache.clear()
+
+        lines = []
+        line, line_width, run = [], 0.0, "" # 行に確定した部品, その幅, 確定していない文字列
+        for piece in pieces:
+            for unit in (piece if isinstance(piece, str) else [piece]):
+                if isinstance(unit, str):
+                    width = line_width + draw.textlength(run + unit, font=font)
+                else:
+                    width = line_width + draw.textlength(run, font=font) + icon_width
+                if width > max_width and (line or run):
+                    lines.append(line + [run] if run else line)
+                    line, line_width, run = [], 0.0, ""
+                if isinstance(unit, str):
+                    run += unit
+                else:
+                    if run:
+                        line.append(run)
+                        line_width += draw.textlength(run, font=font)
+                        run = ""
+                    line.append(unit)
+                    line_width += icon_width
+        lines.append(line + [run] if run else line)
+        self._wrap_cache[key] = lines
+        return lines
+
+    def _place_pieces(self, draw, items, x, y, pieces, font, font_getter, plan):
+        """文字列とマナのトークンを1行に並べて items に追加し、行の高さを返す"""
+        if len(pieces) == 1 and isinstance(pieces[0], str):
+            bbox = self._text_bbox(draw, pieces[0], font)
+            items.append((x, y, pieces[0], font, bbox))
+            return bbox[3] - bbox[1]
+
+        atlas, icon_width, icon_bbox = self._inline_icon(draw, font, font_getter, plan)
+        top, bottom = None, None
+        for piece in pieces:
+            if isinstance(piece, str):
+                bbox = self._text_bbox(draw, piece, font)
+                items.append((x, y, piece, font, bbox))
+                x += draw.textlength(piece, font=font)
+            else:
+                bbox = icon_bbox
+                items.append((x, y, piece, atlas, bbox))
+                x += icon_width
+            top = bbox[1] if top is None else min(top, bbox[1])
+            bottom = bbox[3] if bottom is None else max(bottom, bbox[3])
+        return bottom - top if pieces else 0
+
+    def _layout_effects(self, draw, prop_getter, font_getter, plan, is_object, sizes=None, wrap=None):
+        """
+        効果テキストの各行の配置を計算し、[(x, y, テキスト, フォント, bbox)] を返す (描画はしない)。
+        マナのアイコンは (x, y, (色, 数値), アトラス, bbox) として返す。
+        sizesに (ヘッダー, 本文) のフォントサイズを渡すと設定のサイズの代わりに使う。
+        """
+        items = []
+        region = plan.effects
         effe_list = prop_getter("effe", [])
-        if not effe_list: return
+        if not effe_list or region is None: return items
+        wrap = wrap or self._wrap_text_by_width
         
         # --- 描画設定 ---
-        offset_x = config["offsets"]["effects_x"]
-        offset_x = 0 # 削除されたため0をハードコード
-        offset_y = config["offsets"]["effects_y"]
-        font_head = font_getter(config["font_sizes"]["effects_header"])
-        font_body = font_getter(config["font_sizes"]["effects_body"])
-        max_width = config["layout_options"].get("effects_max_width_px", 250)
+        head_size, body_size = sizes or (region.header_font, region.body_font)
+        font_head = font_getter(head_size)
+        font_body = font_getter(body_size)
+        max_width = region.max_width
         
         # --- 動的なY座標管理 ---
-        current_y = const.LAYOUT["MID_LINE_Y"] + const.LAYOUT["EFFECT_AREA_Y_START"] + offset_y
-        effect_spacing = 8 # 各効果ブロック間の余白
+        current_y = region.y
+        x = region.x
         
         for eff in effe_list: # 効果の数だけループ (制限を撤廃)
             if is_object:
@@ -224,15 +520,17 @@ class CardRenderer:
             if eff_type and eff_type != "": header_parts.append(eff_type)
             if eff_place and eff_place != "": header_parts.append(eff_place)
             
-            mana_list = [f"{c}{v}" for c, v in mana_data.items() if v > 0] if isinstance(mana_data, dict) else []
-            if mana_list: header_parts.append(" ".join(mana_list))
+            mana_tokens = [(c, v) for c, v in mana_data.items() if v > 0] if isinstance(mana_data, dict) else []
+            if mana_tokens and region.header_mana_icons: # マナはアイコンで並べる
+                header = [region.header_separator.join(header_parts) + region.header_separator] if header_parts else []
+                header += mana_tokens
+            else:
+                if mana_tokens: header_parts.append(region.mana_separator.join(f"{c}{v}" for c, v in mana_tokens))
+                header = [region.header_separator.join(header_parts)] if header_parts else []
 
-            if header_parts:
-                header_text = "｜".join(header_parts)
-                bbox = draw.textbbox((0, 0), header_text, font=font_head)
-                header_height = bbox[3] - bbox[1]
-                draw.text((const.LAYOUT["FOOTER_X_PADDING"] + offset_x, current_y), header_text, font=font_head, fill="black")
-                current_y += header_height + LINE_SPACING # ヘッダーの高さと少しの余白を加算
+            if header:
+                header_height = self._place_pieces(draw, items, x, current_y, header, font_head, font_getter, plan)
+                current_y += header_height + region.line_spacing # ヘッダーの高さと少しの余白を加算
 
             # --- 効果テキストの描画 (行数制限なし) ---
             if eff_text:
@@ -240,34 +538,37 @@ class CardRenderer:
                 # textwrap.wrapの代わりに新しい関数を使用
                 # まずは改行コードで分割
                 paragraphs = eff_text.split('\n')
-                wrapped_lines = [line for p in paragraphs for line in self._wrap_text_by_width(draw, p, font_body, max_width)]
-                for line in wrapped_lines: # 折り返された全ての行を描画
-                    bbox = draw.textbbox((0, 0), line, font=font_body)
-                    line_height = bbox[3] - bbox[1]
-                    draw.text((const.LAYOUT["FOOTER_X_PADDING"] + offset_x, current_y), line, font=font_body, fill="black")
-                    current_y += line_height + LINE_SPACING # 描画した行の高さと行間を加算
+                wrapped_lines = []
+                for p in paragraphs:
+                    pieces = mana_icons.split_tokens(p, plan.mana_colors)
+                    if len(pieces) == 1 and isinstance(pieces[0], str):
+                        wrapped_lines.extend([line] for line in wrap(draw, p, font_body, max_width))
+                    else: # {赤} などのトークンを含む段落はアイコンの幅も含めて折り返す
+                        icon_width = self._inline_icon(draw, font_body, font_getter, plan)[1]
+                        wrapped_lines.extend(self._wrap_pieces(draw, pieces, font_body, max_width, icon_width))
+                for line in wrapped_lines: # 折り返された全ての行を配置
+                    line_height = self._place_pieces(draw, items, x, current_y, line, font_body, font_getter, plan)
+                    current_y += line_height + region.line_spacing # 配置した行の高さと行間を加算
 
-            current_y += effect_spacing # 次の効果ブロックとの間に余白を追加
+            current_y += region.block_spacing # 次の効果ブロックとの間に余白を追加
+        return items
 
-    def _draw_footer(self, draw, card_type_name, prop_getter, font_getter, config):
+    def _draw_footer(self, draw, card_type_name, prop_getter, font_getter, plan):
         """カードタイプと属性を描画"""
-        font_foot = font_getter(config["font_sizes"]["footer"])
-        offset_type_x, offset_type_y = config["offsets"]["footer_type_x"], config["offsets"]["footer_y"]
-        offset_color_x, offset_color_y = config["offsets"]["footer_color_x"], config["offsets"]["footer_y"]
-        offset_type_x, offset_type_y = 0, config["offsets"]["footer_y"] # Xオフセットは削除
-        offset_color_x, offset_color_y = 0, config["offsets"]["footer_y"] # Xオフセットは削除
-        y_pos_type = const.CARD_H + const.LAYOUT["FOOTER_Y_OFFSET"] + offset_type_y
-        y_pos_color = const.CARD_H + const.LAYOUT["FOOTER_Y_OFFSET"] + offset_color_y
+        region = plan.footer
+        if region is None: return
+        font_foot = font_getter(region.font)
         
         # カードタイプ
-        draw.text((const.LAYOUT["FOOTER_X_PADDING"] + offset_type_x, y_pos_type), card_type_name, font=font_foot, fill="black")
+        draw.text((region.x, region.y), card_type_name, font=font_foot, fill="black")
 
         # 属性
+        if not region.show_color: return
         color_data = prop_getter("color", {})
         if not isinstance(color_data, dict): color_data = {}
         if color_data:
             active_colors = [k for k, v in color_data.items() if v > 0]
-            c_text = "／".join(active_colors) if active_colors else "無"
+            c_text = region.color_separator.join(active_colors) if active_colors else region.no_color_text
             bbox = draw.textbbox((0, 0), c_text, font=font_foot)
             cw = bbox[2] - bbox[0] 
-            draw.text((const.CARD_W - cw - const.LAYOUT["FOOTER_X_PADDING"] + offset_color_x, y_pos_color), c_text, font=font_foot, fill="black")
\ No newline at end of file
+            draw.text((const.CARD_W - cw - region.right, region.y), c_text, font=font_foot, fill="black")
\ No newline at end of file
@@ -0,0 +1,55 @@
+import pytest
+
+from catalog import CardCatalog
+from decklist import parse_decklist
+
+
+def _make_catalog():
+    catalog = CardCatalog()
+    catalog.add_cards([
+        {'name': "大妖精", 'card_type': "キャラクター", '__filepath': "datas/TEST/大妖精.json"},
+        {'name': "チルノ", 'card_type': "キャラクター", '__filepath': "datas/TEST/チルノ.json"},
+        {'name': "レミリア・スカーレット", 'card_type': "BOSS", '__filepath': "datas/TEST/レミリア.json"},
+    ])
+    return catalog
+
+
+def _quantities(result):
+    return {card['name']: qty for card, qty in result.deck_cards}
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("4 大妖精", 4),
+    ("4x大妖精", 4),
+    ("4x 大妖精", 4),
+    ("4 x 大妖精", 4),
+    ("2×大妖精", 2),
+    ("2X大妖精", 2),
+    ("大妖精x2", 2),
+    ("大妖精 x2", 2),
+    ("大妖精 × 3", 3),
+    ("大妖精", 1),
+])
+def test_quantity_forms(line, expected):
+    result = parse_decklist(line, _make_catalog())
+    assert result.errors == []
+    assert _quantities(result) == {"大妖精": expected}
+
+
+def test_boss_and_comments():
+    text = "BOSS: レミリア・スカーレット\n# コメント\n\n3x チルノ\n大妖精x2\n"
+    result = parse_decklist(text, _make_catalog())
+    assert result.boss_card['name'] == "レミリア・スカーレット"
+    assert _quantities(result) == {"チルノ": 3, "大妖精": 2}
+
+
+def test_quantities_are_added_and_capped():
+    result = parse_decklist("3 大妖精\n大妖精x2", _make_catalog())
+    assert _quantities(result) == {"大妖精": 4}
+    assert len(result.warnings) == 1
+
+
+def test_unknown_card_is_error():
+    result = parse_decklist("2x 存在しないカード", _make_catalog())
+    assert result.deck_cards == []
+    assert len(result.errors) == 1
@@ -0,0 +1,20 @@
+import pytest
+
+from catalog import INDEX_FIELDS
+from query import FIELD_ALIASES, NUMERIC_FIELDS, TEXT_FIELDS, QueryError, compile_query
+
+
+def test_field_aliases_target_known_fields():
+    known = set(INDEX_FIELDS) | set(NUMERIC_FIELDS) | set(TEXT_FIELDS)
+    assert set(FIELD_ALIASES.values()) <= known
+
+
+@pytest.mark.parametrize("alias", sorted(FIELD_ALIASES))
+def test_every_alias_compiles(alias):
+    value = "1" if FIELD_ALIASES[alias] in NUMERIC_FIELDS else "赤"
+    compile_query(f"{alias}:{value}")
+
+
+def test_comparison_on_index_field_is_error():
+    with pytest.raises(QueryError):
+        compile_query("type>=1")
@@ -0,0 +1,143 @@
+import os
+import json
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageTk
+
+import art_store
+import constants as const
+import utils
+
+THUMBNAIL_SIZE = (56, 82) # カード(223x325)とほぼ同じ縦横比
+RENDERER_SOURCES = ("renderer.py", "layout_templates.py", "mana_icons.py", "classtype.py", "constants.py") # 描画結果に影響するソース
+
+
+def renderer_signature():
+    """レンダラーのソースのハッシュ。レンダラーが更新されたら描画したサムネイルを作り直す"""
+    digest = hashlib.sha1()
+    for name in RENDERER_SOURCES:
+        try:
+            with open(os.path.join(const.APP_DIR, name), 'rb') as f:
+                digest.update(f.read())
+        except OSError: # ソースのない環境 (実行ファイルにまとめた場合など)
+            digest.update(name.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ThumbnailService:
+    """
+    カードのサムネイルをワーカースレッドで生成し、ディスクにキャッシュするクラス。
+    cardフォルダに画像があればそれを縮小し、なければレンダラーで描画してから縮小する。
+    PhotoImageの作成はTkのスレッドでのみ行うため、完成したサムネイルはpoll()で受け取る。
+    """
+    def __init__(self, renderer, config, size=THUMBNAIL_SIZE, memory_limit=512):
+        self.renderer = renderer
+        self.config = config
+        self.size = size
+        self.memory_limit = memory_limit
+        self.cache_dir = os.path.join(const.THUMBNAIL_DIR, f"{size[0]}x{size[1]}")
+        self._config_key = json.dumps(config, sort_keys=True, ensure_ascii=False)
+        self._renderer_key = renderer_signature()
+
+        self._photos = OrderedDict() # path → PhotoImage (LRU、Tkスレッドからのみ触る)
+        self._requests = queue.LifoQueue() # 新しい依頼(=今見えている行)から処理する
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = set() # 依頼済みで未完了のパス
+        self._wanted = set() # 現在表示中の行のパス。表示外になった依頼は生成しない
+
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def get(self, card):
+        """メモリキャッシュにあるサムネイル(PhotoImage)を返す。なければ生成を依頼してNoneを返す。"""
+        path = card.get('__filepath')
+        photo = self._photos.get(path)
+        if photo is not None:
+            self._photos.move_to_end(path)
+            return photo
+        with self._lock:
+            if path in self._pending:
+                return None
+            self._pending.add(path)
+        self._requests.put(card)
+        return None
+
+    def set_wanted(self, paths):
+        """現在表示中のカードのパスを通知する"""
+        with self._lock:
+            self._wanted = set(paths)
+
+    def poll(self):
+        """生成が完了したサムネイルをPhotoImageに変換し、そのパスのリストを返す (Tkスレッドから呼ぶ)"""
+        ready = []
+        while True:
+            try:
+                path, pil_img = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if pil_img is not None:
+                self._photos[path] = ImageTk.PhotoImage(pil_img)
+                if len(self._photos) > self.memory_limit:
+                    self._photos.popitem(last=False)
+                ready.append(path)
+        return ready
+
+    def _worker(self):
+        while True:
+            card = self._requests.get()
+            path = card.get('__filepath')
+            with self._lock:
+                skip = path not in self._wanted
+                if skip:
+                    self._pending.discard(path) # 再表示されたときに改めて依頼される
+            if skip:
+                continue
+            try:
+                pil_img = self._load_or_create(card)
+            except Exception as e:
+                print(f"サムネイルの生成に失敗しました ({card.get('name', '')}): {e}")
+                pil_img = None
+            with self._lock:
+                self._pending.discard(path)
+            self._results.put((path, pil_img))
+
+    def _cache_key(self, card, source_path):
+        """サムネイルの元になるデータからキャッシュファイル名を決める"""
+        if source_path:
+            stat = os.stat(source_path)
+            source = f"png|{source_path}|{stat.st_mtime_ns}|{stat.st_size}"
+        else:
+            data = {k: v for k, v in card.items() if not k.startswith('_')}
+            source = "render|" + json.dumps(data, sort_keys=True, ensure_ascii=False) + self._config_key
+            # テンプレートやレンダラーが更新されたら描画し直す
+            source += f"|{os.path.getmtime(const.TEMPLATES_FILE)}|{self._renderer_key}"
+            if card.get('art'): # イラストの画像が更新されたら描画し直す
+                source += f"|{art_store.source_signature(card['art'])}"
+        return hashlib.sha1(source.encode("utf-8")).hexdigest() + ".png"
+
+    def _load_or_create(self, card):
+        image_path = os.path.join(const.PICTURES_DIR, utils.get_image_filename_for_card(card))
+        source_path = image_path if os.path.exists(image_path) else None
+        cache_path = os.path.join(self.cache_dir, self._cache_key(card, source_path))
+
+        if os.path.exists(cache_path):
+            with Image.open(cache_path) as cached:
+                return cached.convert("RGB")
+
+        if source_path:
+            with Image.open(source_path) as src:
+                src.draft("RGB", self.size) # JPEGの場合は縮小デコードされる
+                full = src.convert("RGB")
+        else:
+            name_lines = [line.strip() for line in card.get("name", "").split('\n') if line.strip()]
+            full = self.renderer.draw_single_card(card, card.get("card_type", ""), name_lines, self.config)
+        thumb = full.resize(self.size, Image.BILINEAR, reducing_gap=2.0)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        thumb.save(tmp_path, format="PNG")
+        os.replace(tmp_path, cache_path) # 書きかけのファイルを読まないように置き換える
+        return thumb
@@ -1,7 +1,10 @@
 import tkinter as tk
+import os
 import sys
-from tkinter import ttk
-from PIL import ImageTk
+import threading
+from tkinter import ttk, filedialog
+from PIL import Image, ImageTk
+import art_store
 import classtype as ctp
 import constants as const
 from dialogs import ParamSelectorWindow
@@ -11,13 +14,28 @@ class CardPreview(tk.Canvas):
         super().__init__(master, width=const.CARD_W, height=const.CARD_H, bg="gray", highlightthickness=0)
         self.image = None # 初期状態はNone
         self.tk_img = None
+        self.image_item = None
+        # レンダラーが毎回描き込む描画先。ワーカースレッドが描画中はロックを持つ
+        self.surface = Image.new("RGB", (const.CARD_W, const.CARD_H), (255, 255, 255))
+        self.surface_lock = threading.Lock()
         self.create_text(const.CARD_W / 2, const.CARD_H / 2, text="Card Preview", fill="white")
 
     def draw_card(self, image):
-        self.delete("all") # 既存の描画内容（テキスト含む）を削除
+        # PhotoImageとキャンバスの画像アイテムは使い回し、中身だけをpasteで差し替える
+        if self.tk_img is None or (self.tk_img.width(), self.tk_img.height()) != image.size:
+            self.delete("all") # 初回 (またはサイズ変更時) だけ作り直す
+            self.tk_img = ImageTk.PhotoImage("RGB", image.size)
+            self.image_item = self.create_image(0, 0, image=self.tk_img, anchor=tk.NW)
         self.image = image
-        self.tk_img = ImageTk.PhotoImage(self.image)
-        self.create_image(0, 0, image=self.tk_img, anchor=tk.NW)
+
+        if image is not self.surface:
+            self.tk_img.paste(image)
+        elif self.surface_lock.acquire(blocking=False):
+            try:
+                self.tk_img.paste(image)
+            finally:
+                self.surface_lock.release()
+        # ロックが取れない = 次の描画が進行中なので、その結果の表示を待つ
 
 
 # 1つの効果入力UIを担うフレーム
@@ -25,7 +43,7 @@ class SingleEffectInput(tk.LabelFrame):
     def __init__(self, master, eff_num, update_callback, remove_callback):
         # --- デバウンス用タイマーID ---
         self._debounce_job = None
-        self.DEBOUNCE_DELAY = 250 # 250ms
+        self.DEBOUNCE_DELAY = 50 # 50ms (入力中は下書きのプレビューを描画する)
 
         super().__init__(master, text=f"効果 #{eff_num}", padx=5, pady=5)
         self.update_callback = update_callback
@@ -128,7 +146,7 @@ class InputPanel(tk.Frame):
         self.update_callback = update_callback
         # --- デバウンス用タイマーID ---
         self._debounce_job = None
-        self.DEBOUNCE_DELAY = 250 # 250ms
+        self.DEBOUNCE_DELAY = 50 # 50ms (入力中は下書きのプレビューを描画する)
         self.save_as_callback = save_as_callback
         self.overwrite_save_callback = overwrite_save_callback
         self.generate_image_callback = generate_image_callback
@@ -146,6 +164,7 @@ class InputPanel(tk.Frame):
             "cost": tk.StringVar(), 
             "pow": tk.StringVar(),
             "param": tk.StringVar(),
+            "art": tk.StringVar(),
         }
         # 属性/マナコストは数値 (0-10) で管理
         self.vars_color = {c: tk.IntVar(value=0) for c in const.COLORS}
@@ -198,7 +217,7 @@ class InputPanel(tk.Frame):
         tk.Button(name_frame, text="🖼️ 中央揃えで画像化", command=self.generate_centered_name_image_callback, bg="#cceeff").pack(side="right", padx=5)
 
         self.name_text_widget = tk.Text(self.base_info_frame, height=2)
-        self.name_text_widget.bind("<KeyRelease>", self.on_input_changed)
+        self.name_text_widget.bind("<KeyRelease>", self.on_name_change) # 入力中もカード名をプレビューに反映
         self.name_text_widget.bind("<ButtonRelease-1>", self.on_name_change)
         self.name_text_widget.bind("<FocusOut>", self.on_name_change)
         self.name_text_widget.pack(fill="x")
@@ -209,6 +228,15 @@ class InputPanel(tk.Frame):
         w_cost = tk.Entry(self.base_info_frame, textvariable=self.vars["cost"])
         w_cost.bind("<KeyRelease>", self.on_input_changed)
         w_cost.pack(fill="x")
+
+        # イラスト (artフォルダからの相対パス)
+        tk.Label(self.base_info_frame, text="イラスト (Art):").pack(anchor="w")
+        art_frame = tk.Frame(self.base_info_frame)
+        art_frame.pack(fill="x")
+        w_art = tk.Entry(art_frame, textvariable=self.vars["art"])
+        w_art.bind("<KeyRelease>", self.on_input_changed)
+        w_art.pack(side="left", fill="x", expand=True)
+        tk.Button(art_frame, text="参照...", command=self.browse_art).pack(side="left", padx=(5,0))
         
         # Pow, Param, Color...
         self.w_pow_l = tk.Label(self.base_info_frame, text="パワー (POW):")
@@ -310,6 +338,7 @@ class InputPanel(tk.Frame):
         self.vars["cost"].set("0")
         self.vars["pow"].set("")
         self.vars["param"].set("")
+        self.vars["art"].set("")
 
         # 3. 属性マナコストをリセット (0に設定)
         for col in const.COLORS:
@@ -336,6 +365,16 @@ class InputPanel(tk.Frame):
             self.after_cancel(self._debounce_job)
         # 新しいタイマーを設定
         self._debounce_job = self.after(self.DEBOUNCE_DELAY, self.on_input_change)
+
+    def browse_art(self):
+        """イラストの画像ファイルを選択する (artフォルダ内のファイルは相対パスで保存する)"""
+        initial_dir = const.ART_DIR if os.path.isdir(const.ART_DIR) else const.APP_DIR
+        patterns = " ".join("*" + ext for ext in art_store.ART_EXTENSIONS)
+        path = filedialog.askopenfilename(title="イラストを選択", initialdir=initial_dir,
+                                          filetypes=[("画像ファイル", patterns), ("すべてのファイル", "*.*")])
+        if path:
+            self.vars["art"].set(art_store.to_art_reference(path))
+            self.on_input_changed()
         
     def on_type_change(self, event=None):
         selection = self.type_combo.get()
@@ -378,6 +417,7 @@ class InputPanel(tk.Frame):
         
         # 1. 基本情報更新
         c.name = self.vars["name"].get()
+        c.art = self.vars["art"].get().strip()
         
         if hasattr(c, "cost"):
             val = self.vars["cost"].get()
@@ -447,6 +487,9 @@ class InputPanel(tk.Frame):
         
         pow_val = data.get("pow", "")
         self.vars["pow"].set(str(pow_val)) # 数値でも文字列に変換
+
+        art = data.get("art", "")
+        self.vars["art"].set(art if isinstance(art, str) else "")
         
         param_list = data.get("param", [])
         # 内部データとUI表示の両方を更新
@@ -487,7 +530,7 @@ class InputPanel(tk.Frame):
         c = self.current_card
         color_data = getattr(c, 'color', {})
         
-        return {
+        data = {
             "card_type": self.card_type_name,
             "name": c.name,
             "cost": getattr(c, 'cost', 0),
@@ -503,4 +546,7 @@ class InputPanel(tk.Frame):
                 } 
                 for e in c.effe if e.text or any(e.mana.values())
             ]
-        }
\ No newline at end of file
+        }
+        if getattr(c, 'art', ""): # イラストのないカードのJSONには項目を追加しない
+            data["art"] = c.art
+        return data
\ No newline at end of file
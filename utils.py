@@ -1,14 +1,53 @@
 import os
+import re
 import json
+import unicodedata
 import constants as const
 
 from tkinter import filedialog, messagebox
 from PIL import Image
-def load_config():
+
+# --- 検索キー正規化用のテーブル (モジュール読込時に一度だけ構築) ---
+# ひらがな(ぁ～ゖ)をカタカナ(ァ～ヶ)に寄せる
+_HIRA_TO_KATA = {code: code + 0x60 for code in range(0x3041, 0x3097)}
+# 記号・句読点・空白・括弧類をまとめて除去する
+_STRIP_PATTERN = re.compile(r"[\W_]+")
+
+def normalize_search_text(text):
     """
-    config.jsonを読み込み、デフォルト値で補完して返す共通関数。
+    検索用に文字列を正規化する。
+    NFKC(全角/半角の統一) → 小文字化 → ひらがなをカタカナに統一 → 記号・空白の除去 の順で処理する。
+    カード読込時(インデックス作成)と検索クエリの両方で同じ関数を使うこと。
     """
-    default_config = {
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return _STRIP_PATTERN.sub("", text.translate(_HIRA_TO_KATA))
+
+def get_card_set_code(filepath):
+    """カードJSONのパスから収録セットのコード (datas直下のフォルダ名。例: bb01) を返す"""
+    if not filepath:
+        return ""
+    try:
+        rel_path = os.path.relpath(filepath, const.DATA_DIR)
+    except ValueError: # Windowsで別ドライブの場合
+        return ""
+    parts = rel_path.replace("\\", "/").split("/")
+    return parts[0] if len(parts) > 1 and parts[0] != ".." else ""
+
+def make_card_id(card_data, filepath=None):
+    """
+    どの環境でも同じになるカードIDを返す。形式は "セットコード:カードタイプ:カード名"。
+    BOSSとキャラクターで同名のカードがあるため、カードタイプも含める。
+    カード名は全角/半角を統一し、改行などの空白を除いたものを使う。
+    """
+    set_code = get_card_set_code(filepath or card_data.get('__filepath', ''))
+    name = re.sub(r"\s+", "", unicodedata.normalize("NFKC", card_data.get('name', '')))
+    return f"{set_code}:{card_data.get('card_type', '')}:{name}"
+
+def default_config():
+    """描画設定のデフォルト値 (呼ぶたびに新しい辞書を返す)"""
+    return {
         "font_path": os.path.join(const.APP_DIR, "fonts", "ipaexm.ttf"),
         "offsets": {
             "name_x": 0, "name_y": 0, "cost_num_x": 0, "cost_num_y": 0,
@@ -20,17 +59,25 @@ def load_config():
             "effects_header": 13, "effects_body": 11, "footer": 15
         },
         "layout_options": {
-            "effects_max_width_px": 250
+            "effects_max_width_px": 250,
+            "effects_auto_fit": 0, # 1: 効果テキストがはみ出すカードだけフォントを自動で縮小する
+            "effects_min_font_size": 7, # 自動縮小の最小フォントサイズ
         }
     }
 
+def load_config():
+    """
+    config.jsonを読み込み、デフォルト値で補完して返す共通関数。
+    """
+    default_config_data = default_config()
+
     try:
         with open(const.CONFIG_FILE, 'r', encoding='utf-8') as f:
             loaded_config = json.load(f)
         
         # デフォルト値を基準に、読み込んだ設定で上書き・補完する
-        config = default_config
-        for category, items in default_config.items():
+        config = default_config_data
+        for category, items in default_config_data.items():
             if category in loaded_config:
                 if isinstance(items, dict):
                     for key, default_val in items.items():
@@ -39,7 +86,7 @@ def load_config():
                     config[category] = loaded_config[category]
         return config
     except (FileNotFoundError, json.JSONDecodeError):
-        return default_config
+        return default_config_data
 
 def get_image_filename_for_card(card_data, extension=".png"):
     """
@@ -51,68 +98,47 @@ def get_image_filename_for_card(card_data, extension=".png"):
         filename = f"BOSS_{card_name_safe}{extension}"
     return filename
 
-def create_and_save_print_layouts(master, image_objects, initial_filename_base="Card_Layout_3x3", initial_dir=None):
+PRINT_GRID_W, PRINT_GRID_H = 3, 3
+PRINT_MARGIN = 10 # カード間の余白
+
+def compose_print_pages(image_objects, cancel_check=None):
     """
-    PIL.Imageオブジェクトのリストから3x3の印刷レイアウト画像を生成し、ユーザーに保存させる共通関数。
-    
-    Args:
-        master (tk.Widget): tkinterの親ウィジェット。ダイアログの表示に使用。
-        image_objects (list): 印刷するPIL.Imageオブジェクトのリスト。
-        initial_filename_base (str): 保存ダイアログの初期ファイル名のベース部分。
-        initial_dir (str, optional): 保存ダイアログの初期ディレクトリ。Defaults to PICTURES_DIR.
+    PIL.Imageオブジェクトのリストから3x3の印刷レイアウト画像(ページ)のリストを生成する。
+    ダイアログを使わないのでワーカースレッドからも呼べる。cancel_checkはページごとに呼ばれる。
     """
-    # dialogsは関数内でのみインポートし、循環参照のリスクを避ける
-    from dialogs import NonModalInfo
-
-    GRID_W, GRID_H = 3, 3
-    MARGIN = 10 # カード間の余白
     CARD_WIDTH, CARD_HEIGHT = const.CARD_W, const.CARD_H
-
-    # initial_dirが指定されていない場合は、UCG_CreaterのデフォルトであるPICTURES_DIRを使用
-    save_dir = initial_dir if initial_dir is not None else const.PICTURES_DIR
+    per_page = PRINT_GRID_W * PRINT_GRID_H
 
     # 最終的なレイアウト画像のサイズを計算
-    final_w = GRID_W * CARD_WIDTH + (GRID_W + 1) * MARGIN
-    final_h = GRID_H * CARD_HEIGHT + (GRID_H + 1) * MARGIN
+    final_w = PRINT_GRID_W * CARD_WIDTH + (PRINT_GRID_W + 1) * PRINT_MARGIN
+    final_h = PRINT_GRID_H * CARD_HEIGHT + (PRINT_GRID_H + 1) * PRINT_MARGIN
 
-    page_num = 1
-    total_pages = (len(image_objects) + (GRID_W * GRID_H - 1)) // (GRID_W * GRID_H)
+    resized_cache = {} # 同じ画像オブジェクト(同じカードの複数枚)は一度だけ縮小する
+    pages = []
+    for i in range(0, len(image_objects), per_page):
+        if cancel_check:
+            cancel_check()
+        chunk = image_objects[i:i + per_page]
 
-    for i in range(0, len(image_objects), GRID_W * GRID_H):
-        chunk = image_objects[i:i + (GRID_W * GRID_H)]
-        
         page = Image.new('RGB', (final_w, final_h), (200, 200, 200))
 
         for j, card_img in enumerate(chunk):
-            resized_card_img = card_img.resize((CARD_WIDTH, CARD_HEIGHT))
-            row, col = j // GRID_W, j % GRID_W
-            x = col * CARD_WIDTH + (col + 1) * MARGIN
-            y = row * CARD_HEIGHT + (row + 1) * MARGIN
+            resized_card_img = resized_cache.get(id(card_img))
+            if resized_card_img is None:
+                resized_card_img = resized_cache[id(card_img)] = card_img.resize((CARD_WIDTH, CARD_HEIGHT))
+            row, col = j // PRINT_GRID_W, j % PRINT_GRID_W
+            x = col * CARD_WIDTH + (col + 1) * PRINT_MARGIN
+            y = row * CARD_HEIGHT + (row + 1) * PRINT_MARGIN
             page.paste(resized_card_img, (x, y))
+        pages.append(page)
+    return pages
 
-        initial_file = f"{initial_filename_base}.png"
-        if total_pages > 1:
-            initial_file = f"{initial_filename_base}({page_num}).png"
-
-        try:
-            save_path = filedialog.asksaveasfilename(
-                initialdir=save_dir,
-                title=f"プリントレイアウトを保存 ({page_num}/{total_pages})",
-                defaultextension=".png",
-                filetypes=(("PNGファイル", "*.png"),),
-                initialfile=initial_file
-            )
-            if not save_path:
-                NonModalInfo(master, "キャンセル", "処理を中断しました。")
-                return
-            page.save(save_path)
-            page_num += 1
-        except Exception as e:
-            messagebox.showerror("保存エラー", f"画像の保存中にエラーが発生しました:\n{e}", parent=master)
-            return
-
-    if page_num > 1:
-        NonModalInfo(master, "保存完了", f"{page_num - 1} 枚の画像を保存しました。")
+def get_print_page_paths(save_path, total_pages):
+    """保存先のパスから各ページの保存パスを作る (複数ページなら 名前(1).png, 名前(2).png ...)"""
+    if total_pages <= 1:
+        return [save_path]
+    base, ext = os.path.splitext(save_path)
+    return [f"{base}({page_num}){ext}" for page_num in range(1, total_pages + 1)]
 
 def create_and_save_print_layouts(master, image_objects, initial_filename_base="Card_Layout_3x3", initial_dir=None):
     """
@@ -127,32 +153,14 @@ def create_and_save_print_layouts(master, image_objects, initial_filename_base="
     # dialogsは関数内でのみインポートし、循環参照のリスクを避ける
     from dialogs import NonModalInfo
 
-    GRID_W, GRID_H = 3, 3
-    MARGIN = 10 # カード間の余白
-    CARD_WIDTH, CARD_HEIGHT = const.CARD_W, const.CARD_H
-
     # initial_dirが指定されていない場合は、UCG_CreaterのデフォルトであるPICTURES_DIRを使用
     save_dir = initial_dir if initial_dir is not None else const.PICTURES_DIR
 
-    # 最終的なレイアウト画像のサイズを計算
-    final_w = GRID_W * CARD_WIDTH + (GRID_W + 1) * MARGIN
-    final_h = GRID_H * CARD_HEIGHT + (GRID_H + 1) * MARGIN
-
+    pages = compose_print_pages(image_objects)
+    total_pages = len(pages)
     page_num = 1
-    total_pages = (len(image_objects) + (GRID_W * GRID_H - 1)) // (GRID_W * GRID_H)
-
-    for i in range(0, len(image_objects), GRID_W * GRID_H):
-        chunk = image_objects[i:i + (GRID_W * GRID_H)]
-        
-        page = Image.new('RGB', (final_w, final_h), (200, 200, 200))
-
-        for j, card_img in enumerate(chunk):
-            resized_card_img = card_img.resize((CARD_WIDTH, CARD_HEIGHT))
-            row, col = j // GRID_W, j % GRID_W
-            x = col * CARD_WIDTH + (col + 1) * MARGIN
-            y = row * CARD_HEIGHT + (row + 1) * MARGIN
-            page.paste(resized_card_img, (x, y))
 
+    for page in pages:
         initial_file = f"{initial_filename_base}.png"
         if total_pages > 1:
             initial_file = f"{initial_filename_base}({page_num}).png"
@@ -175,4 +183,4 @@ def create_and_save_print_layouts(master, image_objects, initial_filename_base="
             return
 
     if page_num > 1:
-        NonModalInfo(master, "保存完了", f"{page_num - 1} 枚の画像を保存しました。")
\ No newline at end of file
+        NonModalInfo(master, "保存完了", f"{page_num - 1} 枚の画像を保存しました。")